@@ -1,8 +1,24 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import time
-from datetime import datetime, timedelta
+
+from scanner.bars import BarCache
+from scanner.compact import compact_universe, memory_report
+from scanner.core import RESULT_COLUMNS, condition_label, confluence, enrich_results, iter_scan, order_by_combo, resolve_combos
+from scanner.fetch import get_downloader, summarize_report
+from scanner.history import DIFF_STATUSES, HISTORY_DIR, ResultsHistory, record_results
+from scanner.mapped import PANEL_DIR, PanelReader, publish_panel
+from scanner.render import PAGE_SIZES, render_page, results_table_html
+from scanner.setups import setups_by_timeframe
+from scanner.snapshot import SnapshotScheduler, build_snapshot, latest_version, load_snapshot, scheduler_options_from_env, snapshot_age
+from scanner.store import refresh_store
+from scanner.telemetry import STAGES, Telemetry
+from scanner.universe import FILTER_COLUMNS, SYMBOLS_CSV, SymbolIndex, compiled_path, compiled_symbol_index, file_signature
 
 # =========================
 # CONFIGURAÇÃO DA PÁGINA
@@ -51,304 +67,111 @@ tr:nth-child(even) { background-color: #1b1f24 !important; }
 """, unsafe_allow_html=True)
 
 # =========================
-# FUNÇÕES DE SCAN
+# DADOS (cache do Streamlit sobre o núcleo em scanner/)
 # =========================
-def fix_candle(open_p, high_p, low_p, close_p):
-    """Corrige inconsistências nos dados de candlestick"""
-    valid_flag = "OK"
-    if open_p > high_p:
-        high_p = open_p
-        valid_flag = "Adjusted"
-    if open_p < low_p:
-        low_p = open_p
-        valid_flag = "Adjusted"
-    if close_p > high_p:
-        high_p = close_p
-        valid_flag = "Adjusted"
-    if close_p < low_p:
-        low_p = close_p
-        valid_flag = "Adjusted"
-    return open_p, high_p, low_p, close_p, valid_flag
-
-
-def normalize_dataframe(df):
-    """Normaliza o DataFrame com nomes de colunas padronizados"""
-    if df is None or df.empty:
-        return None
-    
-    # Cria uma cópia para não modificar o original
-    df_normalized = df.copy()
-    
-    # Normaliza os nomes das colunas
-    df_normalized.columns = [str(col).lower().replace(' ', '_') for col in df_normalized.columns]
-    
-    # Mapeia possíveis variações de nomes de colunas
-    column_mapping = {
-        'adj_close': 'close',
-        'adjclose': 'close',
-        'adj close': 'close'
-    }
-    
-    for old_name, new_name in column_mapping.items():
-        if old_name in df_normalized.columns and new_name not in df_normalized.columns:
-            df_normalized[new_name] = df_normalized[old_name]
-    
-    # Verifica se temos as colunas essenciais
-    required_columns = ['open', 'high', 'low', 'close']
-    missing_columns = [col for col in required_columns if col not in df_normalized.columns]
-    
-    if missing_columns:
-        st.error(f"Colunas faltando: {missing_columns}")
-        return None
-    
-    return df_normalized
-
+# Scan em lotes: os primeiros hits aparecem depois de um lote, não do universo inteiro
+SCAN_BATCH_SIZE = 200
+SCAN_FETCH_CHUNK = 50  # lotes de download dentro de cada lote do scan (baixados em paralelo)
 
-def detect_double_inside_bar(df):
-    """Detecta padrão Double Inside Bar"""
-    if df is None or len(df) < 3:
-        return False, None
 
-    df_norm = normalize_dataframe(df)
-    if df_norm is None:
-        return False, None
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_universe_data(symbols, period="2y", interval="1d", chunk_size=100, max_workers=4, fetcher=None, _telemetry=None):
+    """
+    Carrega o universo do disco e baixa apenas as barras novas (símbolos como tupla para o cache).
 
-    current = df_norm.iloc[-1]
-    previous = df_norm.iloc[-2]
-    before_previous = df_norm.iloc[-3]
+    Retorna (data, report, loaded_at); loaded_at anterior à chamada indica hit do st.cache_data.
+    `data` guarda CompactOHLCV (float32 + volume inteiro + datas compartilhadas) em vez
+    do DataFrame bruto, para reduzir a memória do cache em cada worker.
+    """
+    # SCANNER_FETCHER=async usa o pipeline assíncrono com rate limit e retries
+    fetcher = fetcher or os.environ.get("SCANNER_FETCHER", "yfinance")
+    data, report = refresh_store(
+        list(symbols),
+        period=period,
+        interval=interval,
+        chunk_size=chunk_size,
+        max_workers=max_workers,
+        downloader=get_downloader(fetcher),
+        telemetry=_telemetry
+    )
+    compact = compact_universe(data)
+    if _telemetry is not None:
+        _telemetry.info["memory_raw"] = memory_report(compact, raw_frames=data)
+    return compact, report, time.time()
+
+
+@st.cache_resource
+def get_bar_cache():
+    """Cache de barras semanais/mensais/trimestrais compartilhado entre sessões"""
+    return BarCache()
+
+
+@st.cache_resource
+def get_panel_reader():
+    """
+    Painel OHLCV mapeado em memória (publicado pelo agendador de snapshots, por um
+    scan que atualizou o armazenamento ou por `python -m scanner panel`): todos os
+    processos do host leem as mesmas páginas.
+    """
+    return PanelReader(os.environ.get("SCANNER_PANEL_DIR", PANEL_DIR))
 
-    try:
-        # Corrige dados da barra atual
-        open_curr, high_curr, low_curr, close_curr, valid_flag_curr = fix_candle(
-            float(current["open"]),
-            float(current["high"]),
-            float(current["low"]),
-            float(current["close"])
-        )
-        
-        # Corrige dados da barra anterior
-        open_prev, high_prev, low_prev, close_prev, valid_flag_prev = fix_candle(
-            float(previous["open"]),
-            float(previous["high"]),
-            float(previous["low"]),
-            float(previous["close"])
-        )
-        
-        # Dados da barra antes da anterior
-        high_before, low_before = float(before_previous["high"]), float(before_previous["low"])
-
-        # Verifica se a barra atual é inside da anterior
-        current_inside = high_curr < high_prev and low_curr > low_prev
-        
-        # Verifica se a barra anterior é inside da que vem antes
-        previous_inside = high_prev < high_before and low_prev > low_before
-
-        if current_inside and previous_inside:
-            valid_flag = "Adjusted" if valid_flag_curr == "Adjusted" or valid_flag_prev == "Adjusted" else "OK"
-            return True, {
-                "type": "Double Inside Bar",
-                "price": close_curr,
-                "valid": valid_flag
-            }
-            
-    except (ValueError, KeyError) as e:
-        st.error(f"Erro no Double Inside Bar: {e}")
-        return False, None
-    
-    return False, None
-
-
-def detect_inside_bar(df):
-    """Detecta padrão Inside Bar"""
-    if df is None or len(df) < 2:
-        return False, None
-
-    df_norm = normalize_dataframe(df)
-    if df_norm is None:
-        return False, None
-
-    current = df_norm.iloc[-1]
-    previous = df_norm.iloc[-2]
 
-    try:
-        open_curr, high_curr, low_curr, close_curr, valid_flag = fix_candle(
-            float(current["open"]),
-            float(current["high"]),
-            float(current["low"]),
-            float(current["close"])
-        )
-        high_prev, low_prev = float(previous["high"]), float(previous["low"])
-
-        if high_curr < high_prev and low_curr > low_prev:
-            return True, {
-                "type": "Inside Bar",
-                "price": close_curr,
-                "valid": valid_flag
-            }
-    except (ValueError, KeyError) as e:
-        st.error(f"Erro no Inside Bar: {e}")
-        return False, None
-    
-    return False, None
-
-
-def detect_2down_green_3m(df):
+def panel_is_current(panel, scheduler):
     """
-    Detecta 2Down Green 3M (trimestral):
-    - Vela atual rompeu mínima da vela anterior (low_atual < low_anterior)
-    - Vela atual está verde (close_atual > open_atual)
-    - Vela atual NÃO rompeu máxima da vela anterior (high_atual < high_anterior)
+    O painel foi publicado depois do último horário agendado (sem agendador, o da
+    configuração)? Então já tem a última sessão fechada e vale o dia inteiro.
     """
-    if df is None or df.empty:
-        return False, None
+    calendar = scheduler or SnapshotScheduler(None, **scheduler_options_from_env())
+    return panel is not None and panel.created_at >= calendar.last_slot().timestamp()
 
-    try:
-        df_norm = normalize_dataframe(df)
-        if df_norm is None:
-            return False, None
-
-        # Garante que o índice é datetime
-        if not isinstance(df_norm.index, pd.DatetimeIndex):
-            df_norm = df_norm.reset_index()
-            if 'date' in df_norm.columns:
-                df_norm['date'] = pd.to_datetime(df_norm['date'])
-                df_norm = df_norm.set_index('date')
-            else:
-                df_norm.index = pd.to_datetime(df_norm.index)
-
-        # Cria dados trimestrais usando 'Q' para trimestres corretos do calendário
-        df_quarterly = df_norm.resample('Q').agg({
-            'open': 'first',
-            'high': 'max',
-            'low': 'min',
-            'close': 'last',
-            'volume': 'sum' if 'volume' in df_norm.columns else lambda x: 0
-        }).dropna()
-
-        if len(df_quarterly) < 2:
-            return False, None
-
-        # Analisa as últimas 2 barras trimestrais
-        current = df_quarterly.iloc[-1]   # Barra atual
-        previous = df_quarterly.iloc[-2]  # Barra anterior
-
-        open_curr, high_curr, low_curr, close_curr, valid_flag = fix_candle(
-            float(current["open"]),
-            float(current["high"]),
-            float(current["low"]),
-            float(current["close"])
-        )
-        
-        high_prev = float(previous["high"])
-        low_prev = float(previous["low"])
-
-        # Condições do 2Down Green 3M
-        rompeu_minima = low_curr < low_prev           # 1. Rompeu mínima anterior
-        fechou_verde = close_curr > open_curr         # 2. Fechou verde
-        nao_rompeu_maxima = high_curr < high_prev     # 3. NÃO rompeu máxima anterior
-
-        if rompeu_minima and fechou_verde and nao_rompeu_maxima:
-            return True, {
-                "type": "2Down Green 3M",
-                "price": round(close_curr, 2),
-                "valid": valid_flag
-            }
 
-    except Exception as e:
-        st.error(f"Erro no 2Down Green 3M: {e}")
-        return False, None
+def republish_panel(symbols):
+    """
+    Republica o painel a partir do armazenamento recém-atualizado, em segundo plano.
+    write_panel é um escritor por vez (flock): se outro processo já estiver publicando, não faz nada.
+    """
+    reader = get_panel_reader()
+    threading.Thread(
+        target=publish_panel, args=(list(symbols),), kwargs={"root": reader.root},
+        name="panel-publish", daemon=True
+    ).start()
+
 
-    return False, None
+@st.cache_resource
+def get_results_history():
+    """Histórico diário dos resultados; reload() só relê as partições que mudaram"""
+    return ResultsHistory(os.environ.get("SCANNER_HISTORY_DIR", HISTORY_DIR))
 
 
-def detect_2down_green_monthly(df):
+@st.cache_resource
+def get_snapshot_scheduler():
     """
-    Detecta 2Down Green Monthly:
-    - Vela atual rompeu mínima da vela anterior (low_atual < low_anterior)
-    - Vela atual está verde (close_atual > open_atual)
-    - Vela atual NÃO rompeu máxima da vela anterior (high_atual < high_anterior)
+    Agendador de snapshots do processo: um para todas as sessões (SCANNER_SNAPSHOT=off desliga).
+    Horário/intervalo em SCANNER_SNAPSHOT_AT / SCANNER_SNAPSHOT_INTERVAL.
     """
-    if df is None or df.empty:
-        return False, None
+    if os.environ.get("SCANNER_SNAPSHOT", "on").lower() in ("0", "off", "false"):
+        return None
 
-    try:
-        df_norm = normalize_dataframe(df)
-        if df_norm is None:
-            return False, None
-
-        # Garante que o índice é datetime
-        if not isinstance(df_norm.index, pd.DatetimeIndex):
-            df_norm = df_norm.reset_index()
-            if 'date' in df_norm.columns:
-                df_norm['date'] = pd.to_datetime(df_norm['date'])
-                df_norm = df_norm.set_index('date')
-            else:
-                # Se não há coluna de data, usa o índice atual como data
-                df_norm.index = pd.to_datetime(df_norm.index)
-
-        # Cria dados mensais
-        df_monthly = df_norm.resample('M').agg({
-            'open': 'first',
-            'high': 'max',
-            'low': 'min',
-            'close': 'last',
-            'volume': 'sum' if 'volume' in df_norm.columns else lambda x: 0
-        }).dropna()
-
-        if len(df_monthly) < 2:  # Precisamos de pelo menos 2 barras mensais
-            return False, None
-
-        # Analisa as últimas 2 barras mensais
-        current = df_monthly.iloc[-1]   # Barra atual (em andamento)
-        previous = df_monthly.iloc[-2]  # Barra anterior
-
-        open_curr, high_curr, low_curr, close_curr, valid_flag = fix_candle(
-            float(current["open"]),
-            float(current["high"]),
-            float(current["low"]),
-            float(current["close"])
-        )
-        
-        high_prev = float(previous["high"])
-        low_prev = float(previous["low"])
-
-        # Condições do 2Down Green Monthly
-        rompeu_minima = low_curr < low_prev           # 1. Rompeu mínima anterior
-        fechou_verde = close_curr > open_curr         # 2. Fechou verde
-        nao_rompeu_maxima = high_curr < high_prev     # 3. NÃO rompeu máxima anterior
-
-        if rompeu_minima and fechou_verde and nao_rompeu_maxima:
-            return True, {
-                "type": "2Down Green Monthly",
-                "price": round(close_curr, 2),
-                "valid": valid_flag
-            }
+    def build():
+        symbols = compiled_symbol_index(SYMBOLS_CSV).symbols
+        return build_snapshot(symbols, downloader=get_downloader(os.environ.get("SCANNER_FETCHER", "yfinance")))
 
-    except Exception as e:
-        st.error(f"Erro no 2Down Green Monthly: {e}")
-        return False, None
+    return SnapshotScheduler(build, **scheduler_options_from_env()).start()
 
-    return False, None
 
+@st.cache_data(max_entries=2, show_spinner=False)
+def get_snapshot(version):
+    """Snapshot de uma versão; cada versão nova vira uma entrada nova do cache"""
+    return load_snapshot(version)
 
-@st.cache_data(ttl=3600)
-def get_stock_data(symbol, period="2y", interval="1d"):
-    """Baixa dados do Yahoo Finance com tratamento de erros"""
-    try:
-        # Aumentei o período para 2 anos para ter mais dados mensais
-        ticker = yf.Ticker(symbol)
-        df = ticker.history(period=period, interval=interval, auto_adjust=False)
-        
-        if df is None or df.empty:
-            return None
-            
-        # Remove timezone se presente
-        if hasattr(df.index, 'tz_localize'):
-            df.index = df.index.tz_localize(None)
-            
-        return df
-    except Exception as e:
-        return None
+
+def format_age(seconds):
+    """Idade legível: minutos, horas ou dias"""
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 86400:.1f} dias"
 
 
 @st.cache_data(ttl=3600)
@@ -386,26 +209,126 @@ def load_symbols():
         })
 
 
+@st.cache_resource(max_entries=1, show_spinner=False)
+def get_symbol_index(path, signature):
+    """
+    Índice do symbols.csv compartilhado entre sessões; a assinatura (mtime/hash) força o rebuild quando o arquivo muda.
+    Num processo novo vem do binário pré-compilado (recompilado só quando o csv muda).
+    """
+    return compiled_symbol_index(path)
+
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def get_fallback_index():
+    """Índice sobre o fallback de load_symbols (GitHub ou lista padrão)"""
+    return SymbolIndex(load_symbols())
+
+
+def load_symbol_index():
+    """
+    Índice de metadados dos símbolos: symbols.csv local (pelo binário pré-compilado), a última
+    versão compilada se o csv sumiu e, só sem nenhum dos dois, o fallback de load_symbols (rede).
+    """
+    if os.path.exists(SYMBOLS_CSV):
+        return get_symbol_index(SYMBOLS_CSV, file_signature(SYMBOLS_CSV))
+    if os.path.exists(compiled_path(SYMBOLS_CSV)):
+        return get_symbol_index(SYMBOLS_CSV, None)
+    return get_fallback_index()
+
+
+def format_results(hits, symbol_index, conditions=None, mode="all", symbols=None):
+    """
+    Colunas exibidas na tabela: hit + setor/tags do índice de símbolos.
+
+    Com `conditions` (confluência), uma linha por símbolo com ✅/— por condição.
+    """
+    if conditions is not None:
+        hits = confluence(hits, conditions, mode, symbols=symbols)
+        labels = [condition_label(tf, setup) for tf, setup in conditions]
+        hits[labels] = np.where(hits[labels].to_numpy(dtype=bool), "✅", "—")
+        base_columns = ["symbol", "matches"] + labels + ["price", "valid"]
+    else:
+        base_columns = ["symbol", "setup", "price", "valid"]
+    hits = enrich_results(hits, symbol_index)
+    meta_columns = [col for col in ("sector_spdr", "tags") if col in symbol_index.frame.columns]
+    hits = hits.assign(**{col: None for col in meta_columns if col not in hits.columns})
+    return hits[base_columns + meta_columns].reset_index(drop=True)
+
+
 def render_results_table(df):
-    """Renderiza tabela de resultados"""
+    """Renderiza tabela de resultados paginada, com ordenação e filtro por coluna"""
     if df.empty:
         st.warning("Nenhum resultado para exibir")
         return
-        
-    html_table = "<table style='width:100%; border-collapse: collapse;'>"
-    html_table += "<tr>" + "".join(f"<th>{col}</th>" for col in df.columns) + "</tr>"
-    
-    for idx, row in df.iterrows():
-        bg_color = "#15191f" if idx % 2 == 0 else "#1b1f24"
-        html_table += f"<tr style='background-color:{bg_color};'>"
-        for col in df.columns:
-            value = str(row[col]) if pd.notna(row[col]) else ""
-            color = "#ffcc00" if col == "setup" else "#eee"
-            html_table += f"<td style='color:{color};'>{value}</td>"
-        html_table += "</tr>"
-    html_table += "</table>"
+
+    col1, col2, col3, col4, col5 = st.columns([2, 1, 2, 2, 1])
+    sort_by = col1.selectbox("↕️ Ordenar por", ["(original)"] + list(df.columns), key="results_sort_by")
+    ascending = col2.radio("Ordem", ["⬆️", "⬇️"], horizontal=True, key="results_sort_order") == "⬆️"
+    filter_col = col3.selectbox("🔍 Filtrar coluna", list(df.columns), key="results_filter_col")
+    query = col4.text_input("Contém", key="results_filter_query")
+    page_size = col5.selectbox("Por página", PAGE_SIZES, index=1, key="results_page_size")
+
+    # Página atual fica no session_state; volta para 1 se a página deixar de existir
+    page = st.session_state.get("results_page", 1)
+    html_table, total, pages = render_page(
+        df,
+        sort_by=None if sort_by == "(original)" else sort_by,
+        ascending=ascending,
+        filters={filter_col: query},
+        page=page,
+        page_size=page_size
+    )
     st.markdown(html_table, unsafe_allow_html=True)
 
+    if page > pages:
+        st.session_state["results_page"] = pages
+    nav1, nav2 = st.columns([1, 4])
+    nav1.number_input("Página", min_value=1, max_value=pages, step=1, key="results_page")
+    nav2.caption(f"{total} resultados | {pages} páginas")
+
+
+def render_diagnostics(diagnostics):
+    """Painel recolhível com as métricas do último scan e exportação em JSON"""
+    with st.expander("🩺 Diagnóstico do scan"):
+        stages = diagnostics["stages"]
+        cols = st.columns(len(STAGES))
+        for col, name in zip(cols, STAGES):
+            stage = stages.get(name, {"seconds": 0.0, "count": 0})
+            col.metric(f"⏱️ {name}", f"{stage['seconds']:.2f}s", f"{stage['count']} itens", delta_color="off")
+
+        caches = diagnostics["caches"]
+        if caches:
+            st.markdown("**Cache hit/miss**")
+            st.dataframe(
+                pd.DataFrame.from_dict(caches, orient="index").rename_axis("cache").reset_index(),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        slowest = [dict(item, stage=name) for name, items in diagnostics["slowest"].items() for item in items]
+        if slowest:
+            st.markdown("**Mais lentos por estágio**")
+            st.dataframe(pd.DataFrame(slowest)[["stage", "symbol", "seconds"]], use_container_width=True, hide_index=True)
+
+        memory = diagnostics.get("info", {}).get("memory")
+        if memory:
+            st.markdown(
+                f"**💾 Memória do cache:** {memory['bytes'] / 1e6:.1f} MB para {memory['symbols']} símbolos "
+                f"({memory['bytes_per_symbol'] / 1e3:.1f} KB/símbolo, {memory['shared_date_indexes']} índices de datas)"
+            )
+
+        errors = diagnostics["errors"]
+        st.markdown(f"**❗ Erros: {errors['count']}** {errors['by_stage'] if errors['count'] else ''}")
+        if errors["items"]:
+            st.dataframe(pd.DataFrame(errors["items"]), use_container_width=True, hide_index=True)
+
+        st.download_button(
+            "💾 Exportar diagnóstico (JSON)",
+            data=json.dumps(diagnostics, indent=2, ensure_ascii=False, default=str),
+            file_name="scanner_diagnostics.json",
+            mime="application/json"
+        )
+
 
 # =========================
 # MAIN
@@ -414,9 +337,8 @@ def main():
     st.markdown('<h2 style="color:#ccc;">🎯 Scanner de Setups (Estilo Gerenciador)</h2>', unsafe_allow_html=True)
 
     try:
-        df_symbols = load_symbols()
-        df_symbols.columns = df_symbols.columns.str.strip().str.lower()
-        st.success(f"✅ Carregados {len(df_symbols)} símbolos com sucesso!")
+        symbol_index = load_symbol_index()
+        st.success(f"✅ Carregados {len(symbol_index)} símbolos com sucesso!")
     except Exception as e:
         st.error(f"Erro ao carregar símbolos: {e}")
         return
@@ -424,136 +346,285 @@ def main():
     # =========================
     # FILTROS NO TOPO
     # =========================
+    scan_mode = st.radio("Modo", ["🎯 Setup único", "🔗 Confluência"], horizontal=True, label_visibility="collapsed")
     col1, col2, col3, col4 = st.columns([1,1,1,2])
 
-    setores = ["Todos"] + sorted(df_symbols["sector_spdr"].dropna().unique().tolist()) if "sector_spdr" in df_symbols.columns else ["Todos"]
-    tags = ["Todos"] + sorted(df_symbols["tags"].dropna().unique().tolist()) if "tags" in df_symbols.columns else ["Todos"]
-
-    setor_filter = col1.selectbox("📌 Setor", setores)
-    tag_filter = col2.selectbox("🏷️ Tag", tags)
-    timeframe_filter = col3.selectbox("⏳ Timeframe", ["Daily", "Weekly", "Monthly", "Quarterly"])
+    # Filtros vazios = Todos; são resolvidos no conjunto de símbolos ANTES do download
+    filters = {
+        "sector_spdr": col1.multiselect(FILTER_COLUMNS["sector_spdr"], symbol_index.options("sector_spdr"), placeholder="Todos"),
+        "tags": col2.multiselect(FILTER_COLUMNS["tags"], symbol_index.options("tags"), placeholder="Todos"),
+    }
+    # Timeframes e setups vêm do registro (scanner.setups)
+    available_setups = setups_by_timeframe()
+    if scan_mode == "🔗 Confluência":
+        # Condições timeframe · setup; o símbolo entra se bater todas (ou qualquer uma)
+        condition_options = {condition_label(tf, setup): (tf, setup) for tf, setup in resolve_combos()}
+        selected_conditions = col4.multiselect("🔗 Condições", list(condition_options), placeholder="Escolha 2 ou mais")
+        conditions = [condition_options[label] for label in selected_conditions]
+        confluence_mode = "all" if col3.radio("Bater", ["Todas", "Qualquer"], horizontal=True) == "Todas" else "any"
+        combos = conditions
+        label = " + ".join(selected_conditions) if confluence_mode == "all" else " | ".join(selected_conditions)
+    else:
+        timeframe_filter = col3.selectbox("⏳ Timeframe", list(available_setups))
+        setup_filter = col4.selectbox("⚡ Setup", available_setups[timeframe_filter])
+        conditions, confluence_mode = None, "all"
+        combos = [(timeframe_filter, setup_filter)]
+        label = f"{timeframe_filter} - {setup_filter}"
+
+    with st.expander("🔧 Mais filtros"):
+        fcol1, fcol2, fcol3 = st.columns(3)
+        for fcol, column in zip((fcol1, fcol2, fcol3), ("exchange", "tradingview_sector", "tradingview_industry")):
+            filters[column] = fcol.multiselect(FILTER_COLUMNS[column], symbol_index.options(column), placeholder="Todos")
+
+    SYMBOLS = symbol_index.select(filters)
+    st.caption(f"🔎 {len(SYMBOLS)} de {len(symbol_index)} símbolos serão escaneados")
 
-    if timeframe_filter == "Daily":
-        setup_filter = col4.selectbox("⚡ Setup", ["Inside Bar", "Double Inside Bar"])
-    elif timeframe_filter == "Weekly":
-        setup_filter = col4.selectbox("⚡ Setup", ["Inside Bar", "Double Inside Bar"])
-    elif timeframe_filter == "Monthly":
-        setup_filter = col4.selectbox("⚡ Setup", ["Inside Bar", "2Down Green Monthly"])
-    else:  # Quarterly
-        setup_filter = col4.selectbox("⚡ Setup", ["Inside Bar", "2Down Green 3M"])
+    # =========================
+    # SNAPSHOT PRÉ-CALCULADO
+    # =========================
+    scheduler = get_snapshot_scheduler()
+    version = latest_version()
+    snapshot = get_snapshot(version) if version else None
+    if snapshot is not None:
+        meta = snapshot[1]
+        next_run = f" | próximo: {scheduler.next_run():%d/%m %H:%M %Z}" if scheduler is not None else ""
+        st.caption(
+            f"🗂️ Snapshot de {pd.Timestamp(meta['created_at'], unit='s', tz='UTC'):%d/%m %H:%M UTC} "
+            f"(há {format_age(snapshot_age(meta))}) | {meta['symbols']} símbolos{next_run}"
+        )
+    elif scheduler is not None and scheduler.status["running"]:
+        st.caption("🗂️ Gerando o primeiro snapshot em segundo plano...")
+    if scheduler is not None and scheduler.status["last_error"]:
+        st.caption(f"❗ Último snapshot falhou: {scheduler.status['last_error']}")
 
     # =========================
     # BOTÃO SCANNER
     # =========================
-    if st.button("🚀 Rodar Scanner"):
-        results = []
+    bcol1, bcol2, bcol3 = st.columns([1, 1, 3])
+    run_clicked = bcol1.button("🚀 Rodar Scanner")
+    rescan_clicked = bcol2.button("🔄 Reescanear agora", help="Ignora o snapshot: atualiza os dados e escaneia agora")
+    if bcol3.button("🗂️ Atualizar snapshot", disabled=scheduler is None or scheduler.status["running"]):
+        scheduler.trigger()
+
+    if (run_clicked or rescan_clicked) and not combos:
+        st.warning("❌ Escolha pelo menos uma condição")
+        run_clicked = rescan_clicked = False
+
+    snapshot_ready = snapshot is not None and all([tf, setup] in snapshot[1]["combos"] for tf, setup in combos)
+    if run_clicked and not rescan_clicked and snapshot_ready:
+        # Responde do snapshot: só filtra o que já foi calculado para todo o universo
+        results, meta = snapshot
+        telemetry = Telemetry()
+        telemetry.info["snapshot"] = meta["version"]
+        telemetry.cache("snapshot", hits=1)
+        with telemetry.stage("detect", count=len(results)):
+            selected = results[
+                pd.Series(list(zip(results["timeframe"], results["setup"])), index=results.index).isin(combos)
+                & results["symbol"].isin(SYMBOLS)
+            ]
+            df_results = format_results(order_by_combo([selected], combos), symbol_index, conditions, confluence_mode, SYMBOLS)
+        telemetry.finish()
+
+        st.session_state["results"] = df_results
+        st.session_state["results_label"] = label
+        st.session_state["results_page"] = 1
+        st.session_state["telemetry"] = telemetry
+        st.session_state["scan_status"] = {"state": "done", "done": len(SYMBOLS), "total": len(SYMBOLS)}
+        st.session_state["measure_render"] = True
+
+    elif run_clicked or rescan_clicked:
         progress_bar = st.progress(0)
         status_text = st.empty()
 
-        SYMBOLS = df_symbols["symbols"].dropna().tolist()
         total_symbols = len(SYMBOLS)
-
-        for i, symbol in enumerate(SYMBOLS):
-            try:
-                df = get_stock_data(symbol)
-                if df is None or len(df) < 5:  # Precisa de pelo menos 5 dias de dados
-                    continue
-
-                found, info = False, None
-
-                if timeframe_filter == "Daily":
-                    if setup_filter == "Inside Bar":
-                        found, info = detect_inside_bar(df)
-                    elif setup_filter == "Double Inside Bar":
-                        found, info = detect_double_inside_bar(df)
-
-                elif timeframe_filter == "Weekly":
-                    df_norm = normalize_dataframe(df)
-                    if df_norm is not None:
-                        df_weekly = df_norm.resample("W").agg({
-                            "open": "first",
-                            "high": "max",
-                            "low": "min",
-                            "close": "last"
-                        }).dropna()
-                        if setup_filter == "Inside Bar":
-                            found, info = detect_inside_bar(df_weekly)
-                        elif setup_filter == "Double Inside Bar":
-                            found, info = detect_double_inside_bar(df_weekly)
-
-                elif timeframe_filter == "Monthly":
-                    if setup_filter == "Inside Bar":
-                        df_norm = normalize_dataframe(df)
-                        if df_norm is not None:
-                            df_monthly = df_norm.resample("M").agg({
-                                "open": "first",
-                                "high": "max",
-                                "low": "min",
-                                "close": "last"
-                            }).dropna()
-                            found, info = detect_inside_bar(df_monthly)
-                    elif setup_filter == "2Down Green Monthly":
-                        found, info = detect_2down_green_monthly(df)
-
-                elif timeframe_filter == "Quarterly":
-                    if setup_filter == "Inside Bar":
-                        df_norm = normalize_dataframe(df)
-                        if df_norm is not None:
-                            df_quarterly = df_norm.resample("Q").agg({
-                                "open": "first",
-                                "high": "max",
-                                "low": "min",
-                                "close": "last"
-                            }).dropna()
-                            found, info = detect_inside_bar(df_quarterly)
-                    elif setup_filter == "2Down Green 3M":
-                        found, info = detect_2down_green_3m(df)
-
-                if found and info:
-                    # Busca informações adicionais do símbolo
-                    symbol_row = df_symbols[df_symbols["symbols"] == symbol]
-                    
-                    row = {
-                        "symbol": symbol,
-                        "setup": info["type"],
-                        "price": f"${info['price']:.2f}",
-                        "valid": info["valid"]
-                    }
-                    
-                    # Adiciona setor e tags se disponíveis
-                    if not symbol_row.empty:
-                        if "sector_spdr" in df_symbols.columns:
-                            row["sector_spdr"] = symbol_row["sector_spdr"].values[0]
-                        if "tags" in df_symbols.columns:
-                            row["tags"] = symbol_row["tags"].values[0]
-
-                    results.append(row)
-
-            except Exception as e:
-                # Log do erro mas continua o scanner
-                continue
-
-            # Atualiza progress bar
-            progress = (i + 1) / total_symbols
-            progress_bar.progress(progress)
-            status_text.text(f"⏳ {i+1}/{total_symbols} símbolos... | 🎯 {len(results)} setups encontrados")
+        if total_symbols == 0:
+            progress_bar.empty()
+            st.warning("❌ Nenhum símbolo corresponde aos filtros")
+            return
+
+        telemetry = Telemetry()
+
+        # Parciais ficam no session_state a cada lote: se o scan for interrompido
+        # (botão Parar ou qualquer outro widget dispara um rerun), o que já saiu é mantido
+        st.session_state["results"] = format_results(pd.DataFrame(columns=RESULT_COLUMNS), symbol_index, conditions, confluence_mode)
+        st.session_state["results_label"] = label
+        st.session_state["results_page"] = 1
+        st.session_state["telemetry"] = telemetry
+        st.session_state["scan_status"] = {"state": "running", "done": 0, "total": total_symbols}
+
+        st.button("⏹️ Parar scan", key="stop_scan")
+        preview = st.empty()
+
+        loaded = {}
+        download_report = []
+
+        # Reescanear ignora o painel (o pedido é justamente atualizar os dados)
+        panel = None if rescan_clicked else get_panel_reader().current()
+        if panel_is_current(panel, scheduler):
+            telemetry.info["panel"] = {"version": panel.version, "bytes": panel.meta["bytes"]}
+        else:
+            panel = None
+
+        def load_batch(batch):
+            """Lê o lote do painel mapeado; sem painel recente, baixa/atualiza (uma entrada no st.cache_data por lote)"""
+            if panel is not None:
+                with telemetry.stage("fetch", count=len(batch)):
+                    data = panel.universe(batch)
+                telemetry.cache("panel", hits=len(data), misses=len(batch) - len(data))
+                loaded.update(data)
+                return data
+            called_at = time.time()
+            with telemetry.stage("fetch", count=len(batch)):
+                data, report, loaded_at = get_universe_data(tuple(batch), chunk_size=SCAN_FETCH_CHUNK, _telemetry=telemetry)
+            cache_hit = loaded_at < called_at
+            telemetry.cache("st.cache_data", hits=int(cache_hit), misses=int(not cache_hit))
+            loaded.update(data)
+            download_report.extend(report)
+            return data
+
+        parts = []
+        status_text.text(f"📥 Atualizando {total_symbols} símbolos...")
+        # Cada lote é baixado, reamostrado (reaproveitando o cache) e escaneado antes do próximo;
+        # na confluência, todas as condições saem das mesmas barras do lote
+        for batch in iter_scan(SYMBOLS, combos, load_batch, batch_size=SCAN_BATCH_SIZE, bar_cache=get_bar_cache(), telemetry=telemetry):
+            parts.append(batch["hits"])
+            df_results = format_results(order_by_combo(parts, combos), symbol_index, conditions, confluence_mode, SYMBOLS)
+            st.session_state["results"] = df_results
+            st.session_state["scan_status"].update(done=batch["done"])
+
+            progress_bar.progress(batch["done"] / batch["total"])
+            status_text.text(f"⏳ {batch['done']}/{batch['total']} símbolos | {len(df_results)} setups até agora...")
+            preview.markdown(results_table_html(df_results.head(PAGE_SIZES[0])), unsafe_allow_html=True)
+
+        # Com o painel, os arrays são páginas compartilhadas do mapeamento (não contam por processo)
+        telemetry.info["memory"] = memory_report(loaded) if panel is None else {}
+        telemetry.finish()
+        # Só scans completos entram no histórico (o parcial de um scan interrompido não chega aqui)
+        record_results(order_by_combo(parts, combos), combos=combos, symbols=SYMBOLS, root=get_results_history().root)
+        if panel is None:
+            # O armazenamento foi atualizado por este scan: os outros workers passam a ler do painel
+            republish_panel(symbol_index.symbols)
+        download_summary = summarize_report(download_report)
+        st.session_state["scan_status"]["state"] = "done"
 
         progress_bar.empty()
         status_text.empty()
+        preview.empty()
 
-        if results:
-            df_results = pd.DataFrame(results)
+        if panel is not None:
+            st.caption(
+                f"🧱 Painel mapeado {panel.version} ({panel.meta['bytes'] / 1e6:.1f} MB compartilhados) | "
+                f"❗ {len(SYMBOLS) - len(loaded)} símbolos sem dados"
+            )
+        else:
+            st.caption(
+                f"📥 {download_summary['chunks']} lotes | "
+                f"lote mais lento: {download_summary['max_chunk_seconds']:.2f}s | "
+                f"❗ {len(download_summary['failed'])} símbolos sem dados"
+            )
+
+        # A renderização abaixo roda fora do botão: os controles da tabela disparam reruns
+        st.session_state["measure_render"] = True
+
+    # Scan ainda "running" num rerun = foi interrompido (Parar ou outro widget): mantém o parcial
+    scan_status = st.session_state.get("scan_status")
+    if scan_status and scan_status["state"] == "running":
+        scan_status["state"] = "cancelled"
+        st.session_state["measure_render"] = True
+        if "telemetry" in st.session_state:
+            st.session_state["telemetry"].finish()
+    if scan_status and scan_status["state"] == "cancelled":
+        st.warning(f"⏹️ Scan interrompido em {scan_status['done']}/{scan_status['total']} símbolos; resultados parciais")
+
+    if "results" in st.session_state:
+        df_results = st.session_state["results"]
+        if df_results.empty:
+            st.warning(f"❌ Nenhum setup encontrado em {st.session_state['results_label']}")
+        else:
+            st.success(f"✅ {len(df_results)} setups encontrados após filtros!")
+            # Mede só a primeira renderização após o scan (as demais são da paginação)
+            telemetry = st.session_state.get("telemetry")
+            if st.session_state.pop("measure_render", False) and telemetry is not None:
+                with telemetry.stage("render", count=len(df_results)):
+                    render_results_table(df_results)
+            else:
+                render_results_table(df_results)
 
-            # Aplica filtros
-            if setor_filter != "Todos" and "sector_spdr" in df_results.columns:
-                df_results = df_results[df_results["sector_spdr"] == setor_filter]
-            if tag_filter != "Todos" and "tags" in df_results.columns:
-                df_results = df_results[df_results["tags"] == tag_filter]
+    if "telemetry" in st.session_state:
+        render_diagnostics(st.session_state["telemetry"].to_dict())
 
-            st.success(f"✅ {len(df_results)} setups encontrados após filtros!")
-            render_results_table(df_results)
-        else:
-            st.warning(f"❌ Nenhum setup encontrado em {timeframe_filter} - {setup_filter}")
+    # =========================
+    # HISTÓRICO DIA A DIA
+    # =========================
+    with st.expander("📅 Novos x anteriores (histórico)"):
+        # O histórico só é lido quando pedido: carregar todas as partições atrasaria a primeira tela
+        history = get_results_history().reload() if st.checkbox("Comparar com o histórico") else None
+        if history is not None and not history.dates:
+            st.caption("Nenhum scan gravado ainda")
+        elif history is not None:
+            hcol1, hcol2 = st.columns([1, 2])
+            history_date = hcol1.selectbox("Data", history.dates[::-1], format_func=lambda d: f"{d:%d/%m/%Y}")
+            status_labels = {"new": "🟢 Novos", "dropped": "⚪ Saíram", "persisting": "🔁 Continuam"}
+            statuses = hcol2.multiselect("Status", DIFF_STATUSES, default=["new"], format_func=status_labels.get)
+            diff = history.diff(history_date, combos=combos, symbols=SYMBOLS)
+            counts = diff["status"].value_counts()
+            st.caption(" | ".join(f"{status_labels[status]}: {counts.get(status, 0)}" for status in DIFF_STATUSES))
+            diff = diff[diff["status"].isin(statuses)]
+            st.dataframe(diff, use_container_width=True, hide_index=True)
+            st.download_button(
+                "💾 Exportar diferença (CSV)",
+                data=diff.to_csv(index=False),
+                file_name=f"scanner_diff_{history_date:%Y-%m-%d}.csv",
+                mime="text/csv"
+            )
+
+    # =========================
+    # EXPORTAÇÃO GOOGLE SHEETS
+    # =========================
+    if "results" in st.session_state:
+        with st.expander("📤 Exportar para Google Sheets"):
+            sheet = st.text_input("Planilha (URL ou chave)", value=os.environ.get("SCANNER_SHEETS_URL", ""))
+            scol1, scol2 = st.columns(2)
+            with_diagnostics = scol1.checkbox("Incluir diagnóstico", value=True)
+            with_history = scol2.checkbox("Incluir histórico (novos/saíram/continuam)")
+            if st.button("📤 Exportar", disabled=not sheet):
+                # Importado só na exportação (o gspread, por sua vez, só ao abrir a planilha)
+                from scanner.sheets import export_scan, open_spreadsheet
+
+                diagnostics = st.session_state["telemetry"].to_dict() if with_diagnostics and "telemetry" in st.session_state else None
+                history = None
+                if with_history:
+                    history = get_results_history().reload().diff(combos=combos, symbols=SYMBOLS)
+                try:
+                    with st.spinner("Exportando em lote..."):
+                        summary = export_scan(open_spreadsheet(sheet), st.session_state["results"], diagnostics, history)
+                    st.success(
+                        f"✅ {summary['rows']} linhas em {len(summary['sheets'])} abas "
+                        f"({summary['requests']} requisições de escrita, {summary['retries']} novas tentativas)"
+                    )
+                except Exception as e:
+                    st.error(f"Erro ao exportar para o Google Sheets: {type(e).__name__}: {e}")
+
+    # =========================
+    # BACKTEST HISTÓRICO
+    # =========================
+    with st.expander("📈 Backtest histórico"):
+        group_by = st.multiselect("Agrupar também por", [c for c in ("sector_spdr", "tags") if c in symbol_index.frame.columns])
+        if st.button("📊 Rodar Backtest") and SYMBOLS and combos:
+            from scanner.backtest import run_backtest
+
+            with st.spinner(f"Backtest de {label} em {len(SYMBOLS)} símbolos..."):
+                data, _, _ = get_universe_data(tuple(SYMBOLS))
+                occurrences, summary = run_backtest(
+                    data,
+                    combos,
+                    df_symbols=symbol_index,
+                    by=["timeframe", "setup"] + group_by,
+                    bar_cache=get_bar_cache()
+                )
+            st.success(f"✅ {len(occurrences)} ocorrências históricas de {label}")
+            if not summary.empty:
+                st.dataframe(summary, use_container_width=True, hide_index=True)
 
 
 if __name__ == "__main__":
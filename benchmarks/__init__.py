@@ -0,0 +1 @@
+"""Benchmarks do scanner (rodam offline, com dados sintéticos)."""
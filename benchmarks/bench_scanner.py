@@ -0,0 +1,174 @@
+"""
+Benchmark por estágio do scanner com dados sintéticos (sem rede).
+
+    python -m benchmarks.bench_scanner --sizes 1000 10000 50000 --output bench.json
+    python -m benchmarks.bench_scanner --sizes 1000 --compare bench_anterior.json
+
+Cada estágio é cronometrado separadamente; a saída JSON guarda também o commit
+do git para comparar regressões entre commits.
+"""
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_symbols, synthetic_universe
+from scanner.bars import BarCache, TIMEFRAME_RULES
+from scanner.core import enrich_results, resolve_combos, scan_bars
+from scanner.detectors import (
+    detect_2down_green_3m,
+    detect_2down_green_monthly,
+    detect_double_inside_bar,
+    detect_inside_bar,
+    normalize_dataframe,
+)
+from scanner.render import render_page
+from scanner.store import load_universe, save_symbol
+
+
+class Timer:
+    """Acumula os tempos de cada estágio para um tamanho de universo"""
+
+    def __init__(self, n_symbols):
+        self.n_symbols = n_symbols
+        self.rows = []
+
+    def measure(self, stage, func, count=None):
+        started = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - started
+        count = self.n_symbols if count is None else count
+        self.rows.append({
+            "symbols": self.n_symbols,
+            "stage": stage,
+            "seconds": round(seconds, 6),
+            "count": count,
+            "us_per_item": round(seconds / count * 1e6, 3) if count else None,
+        })
+        print(f"  {stage:<32} {seconds:9.3f}s", file=sys.stderr)
+        return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def bench_size(n_symbols, n_bars, seed, with_store=True):
+    """Roda todos os estágios para um universo de n_symbols símbolos"""
+    print(f"▶ {n_symbols} símbolos x {n_bars} barras", file=sys.stderr)
+    timer = Timer(n_symbols)
+    frames = synthetic_universe(n_symbols, n_bars, seed=seed)
+    symbols = list(frames)
+
+    # Carga: grava o armazenamento fora do cronômetro e mede só a leitura
+    if with_store:
+        root = tempfile.mkdtemp(prefix="scanner-bench-")
+        try:
+            for symbol, df in frames.items():
+                save_symbol(symbol, df, root)
+            frames = timer.measure("load_store", lambda: load_universe(symbols, root))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    normalized = timer.measure("normalize_dataframe", lambda: {s: normalize_dataframe(df) for s, df in frames.items()})
+
+    cache = BarCache()
+    bars = {"Daily": frames}
+    for timeframe, rule in TIMEFRAME_RULES.items():
+        if rule is None:
+            continue
+        bars[timeframe] = timer.measure(
+            f"resample_{timeframe.lower()}",
+            lambda tf=timeframe: {s: cache.get(s, df, tf) for s, df in frames.items()}
+        )
+    timer.measure(
+        "resample_cache_hit",
+        lambda: {s: cache.get(s, df, "Monthly") for s, df in frames.items()}
+    )
+
+    # Detectores por símbolo (caminho legado)
+    timer.measure("detect_inside_bar", lambda: [detect_inside_bar(df) for df in normalized.values()])
+    timer.measure("detect_double_inside_bar", lambda: [detect_double_inside_bar(df) for df in normalized.values()])
+    timer.measure("detect_2down_green_monthly", lambda: [detect_2down_green_monthly(df) for df in normalized.values()])
+    timer.measure("detect_2down_green_3m", lambda: [detect_2down_green_3m(df) for df in normalized.values()])
+
+    # Motor vetorizado sobre todas as combinações
+    combos = resolve_combos()
+    hits = timer.measure("engine_scan_all_combos", lambda: scan_bars(bars, combos))
+
+    df_symbols = synthetic_symbols(symbols, seed=seed)
+
+    def assemble():
+        enriched = enrich_results(hits, df_symbols)
+        return enriched[["symbol", "setup", "price", "valid", "sector_spdr", "tags"]].reset_index(drop=True)
+
+    results = timer.measure("results_assembly", assemble, count=max(len(hits), 1))
+    timer.measure(
+        "render_results_table",
+        lambda: render_page(results, sort_by="price", page=1, page_size=50),
+        count=max(len(results), 1)
+    )
+    return timer.rows
+
+
+def compare(rows, previous_path):
+    """Imprime a razão atual/anterior por (tamanho, estágio)"""
+    with open(previous_path) as f:
+        previous = {(r["symbols"], r["stage"]): r["seconds"] for r in json.load(f)["results"]}
+    print(f"\nComparação com {previous_path} (atual / anterior):", file=sys.stderr)
+    for row in rows:
+        before = previous.get((row["symbols"], row["stage"]))
+        if before:
+            ratio = row["seconds"] / before
+            flag = "⚠️" if ratio > 1.2 else ""
+            print(f"  {row['symbols']:>6} {row['stage']:<32} {ratio:6.2f}x {flag}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_scanner", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--bars", type=int, default=504, help="Barras diárias por símbolo (~2 anos)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-store", action="store_true", help="Pula o estágio de leitura do armazenamento Parquet")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for size in args.sizes:
+        rows.extend(bench_size(size, args.bars, args.seed, with_store=not args.no_store))
+
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "bars": args.bars,
+            "seed": args.seed,
+        },
+        "results": rows,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"✅ {len(rows)} medições -> {args.output}", file=sys.stderr)
+
+    if args.compare:
+        compare(rows, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
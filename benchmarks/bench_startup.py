@@ -0,0 +1,170 @@
+"""
+Benchmark de partida a frio: tempo de import dos módulos, carga do universo de símbolos
+e latência da primeira renderização do app (sem rede).
+
+    python -m benchmarks.bench_startup --runs 5 --output startup.json
+    python -m benchmarks.bench_startup --compare startup_anterior.json
+
+Cada medição de import e de primeira renderização roda num processo Python novo;
+a saída guarda a mediana e o mínimo de `runs` execuções e os módulos pesados
+que já estavam carregados depois da primeira tela (devem ser só os do próprio Streamlit).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.bench_scanner import git_commit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+
+IMPORTS = ["pandas", "streamlit", "scanner.core", "scanner.snapshot", "scanner.history", "scanner.sheets"]
+# Só devem ser carregados quando um scan, backtest ou exportação precisar deles
+LAZY_MODULES = ["yfinance", "aiohttp", "gspread", "scanner.backtest", "scanner.sheets"]
+
+IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+FIRST_RENDER_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file({app!r}, default_timeout=120)
+app.run()
+first = time.perf_counter()
+app.run()
+rerun = time.perf_counter()
+print(json.dumps({{
+    "import_streamlit": imported - started,
+    "first_render": first - imported,
+    "rerun": rerun - first,
+    "exceptions": len(app.exception),
+    "loaded": [m for m in {lazy!r} if m in sys.modules],
+}}))
+"""
+
+SYMBOLS_SCRIPT = """
+import json, os, time
+from scanner import universe
+csv = universe.SYMBOLS_CSV
+started = time.perf_counter()
+universe.SymbolIndex.from_csv(csv)
+parsed = time.perf_counter()
+universe.compile_symbol_index(csv, {root!r})
+universe._SIGNATURES.clear()
+compiled = time.perf_counter()
+index = universe.read_compiled_index(csv, {root!r})
+loaded = time.perf_counter()
+print(json.dumps({{
+    "symbols_from_csv": parsed - started,
+    "symbols_compiled": loaded - compiled,
+    "symbols": len(index),
+}}))
+"""
+
+
+def run_python(script, env):
+    """Roda um script num processo novo e devolve a última linha do stdout"""
+    output = subprocess.check_output([sys.executable, "-c", script], cwd=ROOT, env=env, text=True, stderr=subprocess.DEVNULL)
+    return output.strip().splitlines()[-1]
+
+
+def summarize(stage, samples):
+    row = {
+        "stage": stage,
+        "seconds": round(statistics.median(samples), 6),
+        "min_seconds": round(min(samples), 6),
+        "runs": len(samples),
+    }
+    print(f"  {stage:<32} {row['seconds']:9.3f}s (mín {row['min_seconds']:.3f}s)", file=sys.stderr)
+    return row
+
+
+def bench(runs, data_dir):
+    # Sem agendador e com armazenamento vazio: a primeira tela não toca a rede
+    env = dict(os.environ, SCANNER_DATA_DIR=data_dir, SCANNER_SNAPSHOT="off", PYTHONPATH=ROOT)
+    rows = []
+
+    print("▶ imports (processo novo por execução)", file=sys.stderr)
+    for module in IMPORTS:
+        samples = [float(run_python(IMPORT_SCRIPT.format(module=module), env)) for _ in range(runs)]
+        rows.append(summarize(f"import_{module}", samples))
+
+    print("▶ universo de símbolos", file=sys.stderr)
+    compiled_root = os.path.join(data_dir, "compiled")
+    measured = [json.loads(run_python(SYMBOLS_SCRIPT.format(root=compiled_root), env)) for _ in range(runs)]
+    for stage in ("symbols_from_csv", "symbols_compiled"):
+        rows.append(summarize(stage, [m[stage] for m in measured]))
+
+    print("▶ primeira renderização do app", file=sys.stderr)
+    measured = [json.loads(run_python(FIRST_RENDER_SCRIPT.format(app=APP, lazy=LAZY_MODULES), env)) for _ in range(runs)]
+    for stage in ("import_streamlit", "first_render", "rerun"):
+        rows.append(summarize(f"app_{stage}", [m[stage] for m in measured]))
+
+    loaded = sorted({module for m in measured for module in m["loaded"]})
+    exceptions = max(m["exceptions"] for m in measured)
+    if loaded:
+        print(f"⚠️ carregados na primeira tela: {', '.join(loaded)}", file=sys.stderr)
+    if exceptions:
+        print(f"⚠️ {exceptions} exceções na primeira tela", file=sys.stderr)
+    return rows, {"lazy_modules_loaded": loaded, "exceptions": exceptions}
+
+
+def compare(rows, previous_path):
+    """Imprime a razão atual/anterior por estágio"""
+    with open(previous_path) as f:
+        previous = {r["stage"]: r["seconds"] for r in json.load(f)["results"]}
+    print(f"\nComparação com {previous_path} (atual / anterior):", file=sys.stderr)
+    for row in rows:
+        before = previous.get(row["stage"])
+        if before:
+            ratio = row["seconds"] / before
+            flag = "⚠️" if ratio > 1.2 else ""
+            print(f"  {row['stage']:<32} {ratio:6.2f}x {flag}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_startup", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="Execuções (processos novos) por medição")
+    parser.add_argument("--output", default="bench_startup.json")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="scanner-startup-") as data_dir:
+        rows, checks = bench(args.runs, data_dir)
+
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "runs": args.runs,
+            "seconds": round(time.perf_counter() - started, 3),
+        },
+        "checks": checks,
+        "results": rows,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"✅ {len(rows)} medições -> {args.output}", file=sys.stderr)
+
+    if args.compare:
+        compare(rows, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
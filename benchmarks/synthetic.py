@@ -0,0 +1,64 @@
+"""Gerador reprodutível de OHLCV sintético (no formato do yfinance)"""
+import numpy as np
+import pandas as pd
+
+
+def synthetic_arrays(n_symbols, n_bars=504, seed=42, bad_candle_rate=0.02):
+    """
+    Arrays (n_symbols x n_bars) de open/high/low/close/volume via passeio aleatório.
+
+    Uma fração `bad_candle_rate` dos candles é deliberadamente inconsistente
+    (máxima abaixo do corpo ou mínima acima), para exercitar o fix_candle.
+    """
+    rng = np.random.default_rng(seed)
+    shape = (n_symbols, n_bars)
+
+    start = rng.uniform(5, 500, size=(n_symbols, 1))
+    returns = rng.normal(0, 0.02, size=shape)
+    close = start * np.exp(np.cumsum(returns, axis=1))
+    open_ = close * np.exp(rng.normal(0, 0.01, size=shape))
+    body_high = np.maximum(open_, close)
+    body_low = np.minimum(open_, close)
+    high = body_high * (1 + rng.uniform(0, 0.02, size=shape))
+    low = body_low * (1 - rng.uniform(0, 0.02, size=shape))
+
+    # Candles inconsistentes: máxima abaixo do corpo ou mínima acima do corpo
+    bad = rng.random(shape) < bad_candle_rate
+    bad_high = bad & (rng.random(shape) < 0.5)
+    bad_low = bad & ~bad_high
+    high = np.where(bad_high, body_high * (1 - rng.uniform(0.001, 0.01, size=shape)), high)
+    low = np.where(bad_low, body_low * (1 + rng.uniform(0.001, 0.01, size=shape)), low)
+
+    volume = rng.integers(10_000, 5_000_000, size=shape)
+    return open_, high, low, close, volume
+
+
+def synthetic_universe(n_symbols, n_bars=504, seed=42, bad_candle_rate=0.02, end="2026-10-16"):
+    """Dict símbolo -> DataFrame diário (Open/High/Low/Close/Adj Close/Volume) em dias úteis"""
+    open_, high, low, close, volume = synthetic_arrays(n_symbols, n_bars, seed, bad_candle_rate)
+    index = pd.bdate_range(end=end, periods=n_bars, name="Date")
+    width = len(str(n_symbols))
+    frames = {}
+    for i in range(n_symbols):
+        frames[f"SYN{i:0{width}d}"] = pd.DataFrame({
+            "Open": open_[i],
+            "High": high[i],
+            "Low": low[i],
+            "Close": close[i],
+            "Adj Close": close[i],
+            "Volume": volume[i],
+        }, index=index)
+    return frames
+
+
+def synthetic_symbols(symbols, seed=42):
+    """Tabela no formato do symbols.csv (colunas normalizadas) para os símbolos sintéticos"""
+    rng = np.random.default_rng(seed)
+    sectors = ["XLB - Materials", "XLE - Energy", "XLF - Financials", "XLK - Technology", "XLV - Health Care"]
+    tags = [None, None, None, "mag7", "airlines", "solar"]
+    return pd.DataFrame({
+        "symbols": list(symbols),
+        "sector_spdr": rng.choice(sectors, size=len(symbols)),
+        "tags": rng.choice(np.array(tags, dtype=object), size=len(symbols)),
+        "exchange": rng.choice(["NYSE", "NASDAQ"], size=len(symbols)),
+    })
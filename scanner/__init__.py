@@ -0,0 +1 @@
+"""Núcleo do scanner de setups (sem dependência do Streamlit)."""
@@ -0,0 +1,456 @@
+"""
+CLI do scanner (sem Streamlit).
+
+Exemplos:
+    python -m scanner run --setups all --timeframes all --workers 4 --output results.parquet
+    python -m scanner confluence --condition "Daily:Inside Bar" --condition "Weekly:2Down Green" --mode all
+    python -m scanner backtest --timeframes Daily,Weekly --by timeframe,setup,sector_spdr --output summary.json
+    python -m scanner snapshot --schedule --at 16:30
+    python -m scanner panel && python -m scanner run --panel-dir data/panel --workers 4
+    python -m scanner history --status new --timeframes Daily --output novos.json
+    python -m scanner history --symbol AAPL --status new,persisting --output aapl.json
+    python -m scanner run --record --sheet https://docs.google.com/spreadsheets/d/<chave> --sheet-history
+    python -m scanner live --replay ticks.csv --no-refresh --changes --output live.json
+"""
+import argparse
+import signal
+import sys
+import threading
+import time
+
+from scanner.core import (
+    CONFLUENCE_MODES, confluence, enrich_results, iter_scan, order_by_combo, parse_conditions, resolve_combos,
+    load_local, run_scan, save_results
+)
+from scanner.fetch import get_downloader, summarize_report
+from scanner.history import DIFF_STATUSES, HISTORY_DIR
+from scanner.mapped import PANEL_DIR
+from scanner.snapshot import DEFAULT_AT, SNAPSHOT_DIR
+from scanner.store import OHLCV_DIR, refresh_store
+from scanner.telemetry import Telemetry
+from scanner.universe import SYMBOLS_CSV, load_symbol_index
+
+FAILURES_SHOWN = 10
+
+
+def _split(values):
+    """Junta opções repetidas e separadas por vírgula em uma lista"""
+    return [v.strip() for value in values or [] for v in value.split(",") if v.strip()]
+
+
+def _prepare(args, telemetry=None, only=None, combos=None):
+    """
+    Passos comuns: universo filtrado, combinações e refresh do armazenamento local.
+
+    `only` restringe o universo (ex.: símbolos presentes no arquivo de replay);
+    `combos` já resolvidas substituem --setups/--timeframes (ex.: condições da confluência).
+    """
+    index = load_symbol_index(args.symbols_file)
+    symbols = index.select({
+        "sector_spdr": _split(args.sector),
+        "tags": _split(args.tag),
+        "exchange": _split(args.exchange),
+        "tradingview_sector": _split(args.tv_sector),
+        "tradingview_industry": _split(args.industry),
+    })
+    if only is not None:
+        only = set(only)
+        symbols = [symbol for symbol in symbols if symbol in only]
+    print(f"🔎 {len(symbols)} símbolos após filtros", file=sys.stderr)
+
+    if combos is None:
+        combos = resolve_combos(args.setups, args.timeframes)
+
+    if combos and not args.no_refresh:
+        options = {"rate": args.rate, "concurrency": args.concurrency} if args.fetcher == "async" else {}
+        _, report = refresh_store(
+            symbols,
+            max_age=args.max_age,
+            root=args.data_dir,
+            downloader=get_downloader(args.fetcher, **options),
+            telemetry=telemetry
+        )
+        summary = summarize_report(report)
+        print(f"📥 {summary['chunks']} lotes | {len(summary['failed'])} símbolos sem dados", file=sys.stderr)
+        for symbol, reason in list(summary["reasons"].items())[:FAILURES_SHOWN]:
+            print(f"   ❗ {symbol}: {reason}", file=sys.stderr)
+        if len(summary["failed"]) > FAILURES_SHOWN:
+            print(f"   … e mais {len(summary['failed']) - FAILURES_SHOWN}", file=sys.stderr)
+
+    return index, symbols, combos
+
+
+def _stream_scan(symbols, combos, args, telemetry=None):
+    """
+    Scan em lotes com progresso no stderr. Ctrl+C pede o cancelamento: o lote atual
+    termina e o que já foi encontrado é gravado. Retorna (resultados, cancelado).
+    """
+    cancel = threading.Event()
+    previous = signal.signal(signal.SIGINT, lambda *_: cancel.set())
+    parts = []
+    try:
+        for batch in iter_scan(
+            symbols, combos, lambda chunk: load_local(chunk, args.data_dir, args.panel_dir),
+            batch_size=args.batch_size, cancel=cancel, telemetry=telemetry
+        ):
+            parts.append(batch["hits"])
+            print(f"⏳ {batch['done']}/{batch['total']} símbolos | {sum(len(p) for p in parts)} setups", file=sys.stderr)
+    finally:
+        signal.signal(signal.SIGINT, previous)
+    return order_by_combo(parts, combos), cancel.is_set()
+
+
+def cmd_run(args):
+    """Atualiza o armazenamento local e roda todas as combinações pedidas"""
+    started = time.perf_counter()
+    telemetry = Telemetry()
+    with telemetry.stage("fetch"):
+        index, symbols, combos = _prepare(args, telemetry)
+    if not combos:
+        print("Nenhuma combinação setup x timeframe válida", file=sys.stderr)
+        return 2
+
+    cancelled = False
+    if args.workers <= 1:
+        results, cancelled = _stream_scan(symbols, combos, args, telemetry)
+    else:
+        results = run_scan(symbols, combos, workers=args.workers, root=args.data_dir, telemetry=telemetry,
+                           panel_root=args.panel_dir)
+    telemetry.finish()
+    if args.record and not cancelled:
+        from scanner.history import record_results
+
+        record_results(results, combos=combos, symbols=symbols, root=args.history_dir)
+    results = enrich_results(results, index)
+    save_results(results, args.output)
+    if args.diagnostics:
+        with open(args.diagnostics, "w") as f:
+            f.write(telemetry.to_json())
+    if args.sheet:
+        from scanner.history import ResultsHistory
+        from scanner.sheets import export_scan, open_spreadsheet
+
+        history = None
+        if args.sheet_history:
+            history = ResultsHistory(args.history_dir).reload().diff(combos=combos, symbols=symbols)
+        summary = export_scan(
+            open_spreadsheet(args.sheet, credentials=args.sheet_credentials),
+            results,
+            diagnostics=telemetry.to_dict(),
+            history=history
+        )
+        print(
+            f"📤 {summary['rows']} linhas em {len(summary['sheets'])} abas "
+            f"({summary['requests']} requisições, {summary['retries']} novas tentativas)",
+            file=sys.stderr
+        )
+
+    print(
+        f"✅ {len(results)} setups em {len(combos)} combinações "
+        f"({time.perf_counter() - started:.1f}s) -> {args.output}",
+        file=sys.stderr
+    )
+    if cancelled:
+        print("⏹️ Scan interrompido: resultados parciais", file=sys.stderr)
+        return 130
+    return 0
+
+
+def cmd_confluence(args):
+    """Símbolos que batem todas (ou qualquer uma) das condições timeframe:setup, num único scan"""
+    started = time.perf_counter()
+    try:
+        conditions = parse_conditions(_split(args.condition))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    telemetry = Telemetry()
+    with telemetry.stage("fetch"):
+        index, symbols, combos = _prepare(args, telemetry, combos=conditions)
+    if not combos:
+        print("Nenhuma condição timeframe:setup informada", file=sys.stderr)
+        return 2
+
+    cancelled = False
+    if args.workers <= 1:
+        hits, cancelled = _stream_scan(symbols, combos, args, telemetry)
+    else:
+        hits = run_scan(symbols, combos, workers=args.workers, root=args.data_dir, telemetry=telemetry,
+                        panel_root=args.panel_dir)
+    telemetry.finish()
+    results = enrich_results(confluence(hits, combos, args.mode, symbols=symbols), index)
+    save_results(results, args.output)
+
+    print(
+        f"✅ {len(results)} símbolos com confluência ({args.mode}) de {len(combos)} condições "
+        f"({time.perf_counter() - started:.1f}s) -> {args.output}",
+        file=sys.stderr
+    )
+    if cancelled:
+        print("⏹️ Scan interrompido: resultados parciais", file=sys.stderr)
+        return 130
+    return 0
+
+
+def cmd_backtest(args):
+    """Todas as ocorrências históricas de cada setup e o resumo dos retornos futuros"""
+    from scanner.backtest import run_backtest
+
+    started = time.perf_counter()
+    index, symbols, combos = _prepare(args)
+    if not combos:
+        print("Nenhuma combinação setup x timeframe válida", file=sys.stderr)
+        return 2
+
+    occurrences, summary = run_backtest(
+        load_local(symbols, args.data_dir, args.panel_dir),
+        combos,
+        df_symbols=index,
+        by=_split([args.by])
+    )
+    save_results(summary, args.output)
+    if args.occurrences:
+        save_results(occurrences, args.occurrences)
+
+    print(
+        f"✅ {len(occurrences)} ocorrências em {len(combos)} combinações "
+        f"({time.perf_counter() - started:.1f}s) -> {args.output}",
+        file=sys.stderr
+    )
+    return 0
+
+
+def cmd_live(args):
+    """Replay de barras/ticks intradiários sobre o estado ao vivo semeado com o histórico local"""
+    from scanner.live import LiveEngine, read_replay, replay
+
+    started = time.perf_counter()
+    feed = read_replay(args.replay)
+    index, symbols, combos = _prepare(args, only=feed["symbol"].unique())
+    if not combos:
+        print("Nenhuma combinação setup x timeframe válida", file=sys.stderr)
+        return 2
+
+    engine = LiveEngine(combos)
+    engine.seed_universe(load_local(symbols, args.data_dir, args.panel_dir))
+    feed = feed[feed["symbol"].isin(engine.state)]
+
+    def on_change(change):
+        if args.changes:
+            icon = "🟢" if change["change"] == "new" else "⚪"
+            print(f"{icon} {change['timestamp']} {change['timeframe']} {change['setup']} {change['symbol']}", file=sys.stderr)
+
+    hits = replay(engine, feed, on_change=on_change)
+    save_results(enrich_results(hits, index), args.output)
+
+    stats = engine.stats
+    print(
+        f"✅ {len(hits)} setups após {stats['updates']} atualizações "
+        f"({stats['changes']} mudanças, {stats['stale']} fora de ordem, "
+        f"{time.perf_counter() - started:.1f}s) -> {args.output}",
+        file=sys.stderr
+    )
+    return 0
+
+
+def cmd_snapshot(args):
+    """Gera um snapshot de todas as combinações agora ou fica rodando no agendador"""
+    from scanner.snapshot import SnapshotScheduler, build_snapshot
+
+    index = load_symbol_index(args.symbols_file)
+    options = {"rate": args.rate, "concurrency": args.concurrency} if args.fetcher == "async" else {}
+
+    def build():
+        symbols = index.select({
+            "sector_spdr": _split(args.sector),
+            "tags": _split(args.tag),
+            "exchange": _split(args.exchange),
+            "tradingview_sector": _split(args.tv_sector),
+            "tradingview_industry": _split(args.industry),
+        })
+        meta = build_snapshot(
+            symbols,
+            resolve_combos(args.setups, args.timeframes),
+            root=args.snapshot_dir,
+            data_dir=args.data_dir,
+            refresh=not args.no_refresh,
+            max_age=args.max_age,
+            downloader=get_downloader(args.fetcher, **options),
+            workers=args.workers,
+            panel_root=None if args.no_panel else args.panel_dir or PANEL_DIR
+        )
+        if meta is None:
+            print("⏳ Outro processo já está gerando o snapshot; mantido o atual", file=sys.stderr)
+            return None
+        print(
+            f"🗂️ Snapshot {meta['version']}: {meta['hits']} setups em {meta['symbols']} símbolos "
+            f"({meta['seconds']:.1f}s)",
+            file=sys.stderr
+        )
+        return meta
+
+    if not args.schedule:
+        build()
+        return 0
+
+    scheduler = SnapshotScheduler(build, at=args.at, interval=args.interval, root=args.snapshot_dir)
+    print(f"⏰ Agendador ativo; próxima execução: {scheduler.next_run()}", file=sys.stderr)
+    scheduler.start()
+    try:
+        while scheduler.is_alive():
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        scheduler.stop()
+    return 0
+
+
+def cmd_history(args):
+    """Diferença entre duas datas do histórico (novos, saíram, continuam) com a sequência de cada hit"""
+    from scanner.history import ResultsHistory
+
+    history = ResultsHistory(args.history_dir).reload()
+    if not history.dates:
+        print(f"Histórico vazio em {args.history_dir}", file=sys.stderr)
+        return 2
+
+    date = history.resolve_date(args.date)
+    if date is None:
+        print(f"Nenhuma data gravada até {args.date} (primeira: {history.dates[0]:%Y-%m-%d})", file=sys.stderr)
+        return 2
+    if args.previous is not None and history.resolve_date(args.previous) is None:
+        print(f"Nenhuma data gravada até {args.previous} (primeira: {history.dates[0]:%Y-%m-%d})", file=sys.stderr)
+        return 2
+
+    combos = resolve_combos(args.setups, args.timeframes)
+    diff = history.diff(date, args.previous, combos=combos, symbols=_split(args.symbol) or None)
+    statuses = _split(args.status)
+    if statuses:
+        diff = diff[diff["status"].isin(statuses)].reset_index(drop=True)
+    save_results(diff, args.output)
+
+    counts = diff["status"].value_counts()
+    print(
+        f"📅 {date:%Y-%m-%d}: "
+        + " | ".join(f"{status} {counts.get(status, 0)}" for status in DIFF_STATUSES)
+        + f" -> {args.output}",
+        file=sys.stderr
+    )
+    return 0
+
+
+def cmd_panel(args):
+    """Atualiza o armazenamento local e publica uma nova versão do painel mapeado"""
+    from scanner.mapped import publish_panel
+
+    started = time.perf_counter()
+    # O painel guarda o histórico diário, independente dos setups
+    _, symbols, _ = _prepare(args, combos=resolve_combos())
+    meta = publish_panel(symbols, data_dir=args.data_dir, root=args.panel_dir or PANEL_DIR)
+    if meta is None:
+        print("⏳ Outro processo já está publicando o painel", file=sys.stderr)
+        return 1
+    symbols_count, dates, _ = meta["shape"]
+    print(
+        f"🧱 Painel {meta['version']}: {symbols_count} símbolos x {dates} datas "
+        f"({meta['bytes'] / 1e6:.1f} MB, {time.perf_counter() - started:.1f}s)",
+        file=sys.stderr
+    )
+    return 0
+
+
+def add_universe_arguments(parser, combos=True):
+    """Argumentos compartilhados: combinações, filtros do universo e armazenamento"""
+    if combos:
+        parser.add_argument("--setups", default="all", help="'all' ou lista separada por vírgula")
+        parser.add_argument("--timeframes", default="all", help="'all' ou lista (Daily,Weekly,Monthly,Quarterly)")
+    parser.add_argument("--symbols-file", default=SYMBOLS_CSV)
+    parser.add_argument("--data-dir", default=OHLCV_DIR, help="Diretório do armazenamento OHLCV")
+    parser.add_argument("--panel-dir", help=f"Painel mapeado em memória (ex.: {PANEL_DIR}); lido no lugar dos Parquet")
+    parser.add_argument("--max-age", type=int, default=3600, help="Idade máxima (s) antes de atualizar um símbolo")
+    parser.add_argument("--fetcher", choices=["yfinance", "async"], default="yfinance", help="Backend de download")
+    parser.add_argument("--rate", type=float, default=10.0, help="Requisições/s (fetcher async)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requisições simultâneas (fetcher async)")
+    parser.add_argument("--no-refresh", action="store_true", help="Não baixa nada; usa só o que está em disco")
+    parser.add_argument("--sector", action="append", help="Setor SPDR (repetível ou separado por vírgula)")
+    parser.add_argument("--tag", action="append", help="Tag (repetível ou separada por vírgula)")
+    parser.add_argument("--exchange", action="append", help="Exchange (repetível ou separada por vírgula)")
+    parser.add_argument("--tv-sector", action="append", help="Setor TradingView (repetível ou separado por vírgula)")
+    parser.add_argument("--industry", action="append", help="Indústria TradingView (repetível ou separada por vírgula)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m scanner", description="Scanner de setups")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Roda o scan e grava os resultados")
+    add_universe_arguments(run)
+    run.add_argument("--workers", type=int, default=1, help="Processos para o scan")
+    run.add_argument("--batch-size", type=int, default=200, help="Símbolos por lote no scan em um processo")
+    run.add_argument("--output", default="results.parquet", help="Arquivo .parquet ou .json")
+    run.add_argument("--diagnostics", help="Grava a telemetria por estágio em JSON")
+    run.add_argument("--record", action="store_true", help="Acrescenta os hits ao histórico diário")
+    run.add_argument("--history-dir", default=HISTORY_DIR, help="Diretório do histórico")
+    run.add_argument("--sheet", help="Exporta resultados e diagnóstico para esta planilha (URL ou chave)")
+    run.add_argument("--sheet-credentials", help="JSON da conta de serviço (padrão: SCANNER_SHEETS_CREDENTIALS)")
+    run.add_argument("--sheet-history", action="store_true", help="Inclui a aba de histórico (novos/saíram/continuam)")
+    run.set_defaults(func=cmd_run)
+
+    confluence_parser = subparsers.add_parser("confluence", help="Símbolos com setups em vários timeframes ao mesmo tempo")
+    add_universe_arguments(confluence_parser, combos=False)
+    confluence_parser.add_argument("--condition", action="append", required=True,
+                                   help="Timeframe:Setup (repetível ou separado por vírgula), ex.: 'Weekly:Inside Bar'")
+    confluence_parser.add_argument("--mode", choices=CONFLUENCE_MODES, default="all", help="all = todas as condições, any = qualquer uma")
+    confluence_parser.add_argument("--workers", type=int, default=1, help="Processos para o scan")
+    confluence_parser.add_argument("--batch-size", type=int, default=200, help="Símbolos por lote no scan em um processo")
+    confluence_parser.add_argument("--output", default="confluence.parquet", help="Arquivo .parquet ou .json")
+    confluence_parser.set_defaults(func=cmd_confluence)
+
+    backtest = subparsers.add_parser("backtest", help="Backtest histórico com retornos futuros")
+    add_universe_arguments(backtest)
+    backtest.add_argument("--by", default="timeframe,setup", help="Agrupamento do resumo (ex.: timeframe,setup,sector_spdr,tags)")
+    backtest.add_argument("--output", default="backtest_summary.parquet", help="Resumo em .parquet ou .json")
+    backtest.add_argument("--occurrences", help="Grava também todas as ocorrências (.parquet ou .json)")
+    backtest.set_defaults(func=cmd_backtest)
+
+    live = subparsers.add_parser("live", help="Modo ao vivo alimentado por um arquivo de replay")
+    add_universe_arguments(live)
+    live.add_argument("--replay", required=True, help="Barras/ticks (.csv ou .parquet): symbol, timestamp, open/high/low/close ou price")
+    live.add_argument("--changes", action="store_true", help="Mostra cada hit que entra/sai durante o replay")
+    live.add_argument("--output", default="live_results.parquet", help="Hits ao fim do replay (.parquet ou .json)")
+    live.set_defaults(func=cmd_live)
+
+    snapshot = subparsers.add_parser("snapshot", help="Pré-calcula todas as combinações em um snapshot versionado")
+    add_universe_arguments(snapshot)
+    snapshot.add_argument("--snapshot-dir", default=SNAPSHOT_DIR, help="Diretório dos snapshots")
+    snapshot.add_argument("--workers", type=int, default=1, help="Processos para o scan")
+    snapshot.add_argument("--schedule", action="store_true", help="Fica rodando e gera snapshots no horário/intervalo")
+    snapshot.add_argument("--at", default=DEFAULT_AT, help="Horário diário HH:MM (America/New_York), dias úteis")
+    snapshot.add_argument("--interval", type=float, help="Gera a cada N segundos (substitui --at)")
+    snapshot.add_argument("--no-panel", action="store_true", help="Não publica o painel mapeado junto com o snapshot")
+    snapshot.set_defaults(func=cmd_snapshot)
+
+    history = subparsers.add_parser("history", help="Novos, saíram e continuam entre datas do histórico")
+    history.add_argument("--setups", default="all", help="'all' ou lista separada por vírgula")
+    history.add_argument("--timeframes", default="all", help="'all' ou lista (Daily,Weekly,Monthly,Quarterly)")
+    history.add_argument("--history-dir", default=HISTORY_DIR, help="Diretório do histórico")
+    history.add_argument("--date", help="Data (AAAA-MM-DD); padrão: a última gravada")
+    history.add_argument("--previous", help="Data de comparação; padrão: a gravada antes de --date")
+    history.add_argument("--status", action="append", help=f"Filtra por status ({', '.join(DIFF_STATUSES)})")
+    history.add_argument("--symbol", action="append", help="Só estes símbolos (repetível ou separado por vírgula); streak = há quantas datas gravadas")
+    history.add_argument("--output", default="history_diff.parquet", help="Arquivo .parquet ou .json")
+    history.set_defaults(func=cmd_history)
+
+    panel = subparsers.add_parser("panel", help="Publica o painel OHLCV mapeado em memória (um escritor por host)")
+    add_universe_arguments(panel, combos=False)
+    panel.set_defaults(func=cmd_panel)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
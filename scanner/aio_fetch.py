@@ -0,0 +1,258 @@
+"""
+Pipeline assíncrono de download (endpoint de chart do Yahoo) com limite de concorrência,
+rate limit por token bucket e retry com backoff exponencial (com jitter).
+
+Diferente do get_stock_data antigo, nenhum símbolo some em silêncio: toda falha fica
+registrada no report (tentativas, último status HTTP e erro).
+"""
+import asyncio
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+YAHOO_CHART_URL = "https://query2.finance.yahoo.com/v8/finance/chart"
+
+HEADERS = {"User-Agent": "Mozilla/5.0 (stock-scanner-app)"}
+
+# Status que valem nova tentativa (throttling e erros do servidor)
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Token bucket: `rate` requisições por segundo com rajadas de até `capacity`.
+
+    Usa um lock de thread (não de event loop), então pode ser compartilhado entre
+    os lotes que download_universe roda em threads diferentes.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        """Consome um token; retorna quanto tempo esperar se não houver"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+class FetchError(Exception):
+    """Falha de download de um símbolo (status None = erro de rede/parse)"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+# =========================
+# PARSE
+# =========================
+def parse_chart(payload):
+    """Converte o JSON do endpoint de chart em DataFrame OHLCV (colunas no formato do yfinance)"""
+    chart = (payload or {}).get("chart") or {}
+    if chart.get("error"):
+        raise FetchError(str(chart["error"].get("description") or chart["error"]), status=200)
+    results = chart.get("result") or []
+    if not results or not results[0].get("timestamp"):
+        return None
+
+    result = results[0]
+    quote = (result.get("indicators", {}).get("quote") or [{}])[0]
+    timezone = result.get("meta", {}).get("exchangeTimezoneName") or "UTC"
+
+    index = pd.to_datetime(np.asarray(result["timestamp"], dtype=np.int64), unit="s", utc=True)
+    index = index.tz_convert(timezone).tz_localize(None).normalize()
+
+    columns = {
+        "Open": quote.get("open"),
+        "High": quote.get("high"),
+        "Low": quote.get("low"),
+        "Close": quote.get("close"),
+    }
+    adjclose = result.get("indicators", {}).get("adjclose")
+    if adjclose:
+        columns["Adj Close"] = adjclose[0].get("adjclose")
+    columns["Volume"] = quote.get("volume")
+
+    df = pd.DataFrame(
+        {name: np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+         for name, values in columns.items() if values is not None},
+        index=pd.DatetimeIndex(index, name="Date")
+    )
+    df = df.dropna(how="all", subset=[c for c in ("Open", "High", "Low", "Close") if c in df.columns])
+    df = df[~df.index.duplicated(keep="last")]
+    return df if not df.empty else None
+
+
+def chart_params(period="2y", interval="1d", start=None):
+    """Parâmetros de query: range (período) ou period1/period2 (a partir de `start`)"""
+    params = {"interval": interval, "includeAdjustedClose": "true", "events": "div,splits"}
+    if start is not None:
+        params["period1"] = str(int(pd.Timestamp(start).timestamp()))
+        params["period2"] = str(int(time.time()) + 86400)
+    else:
+        params["range"] = period
+    return params
+
+
+# =========================
+# DOWNLOAD
+# =========================
+async def _request(session, url, params, timeout):
+    import aiohttp
+
+    try:
+        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status != 200:
+                retry_after = response.headers.get("Retry-After")
+                try:
+                    retry_after = float(retry_after) if retry_after is not None else None
+                except ValueError:
+                    retry_after = None
+                raise FetchError(f"HTTP {response.status}", status=response.status, retry_after=retry_after)
+            return await response.json(content_type=None)
+    except asyncio.TimeoutError:
+        raise FetchError("timeout", status=408)
+    except aiohttp.ClientError as e:
+        raise FetchError(f"{type(e).__name__}: {e}")
+
+
+def backoff_delay(attempt, base, maximum, retry_after=None):
+    """Backoff exponencial com jitter completo; respeita Retry-After quando o servidor manda"""
+    delay = random.uniform(0, min(maximum, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(maximum, retry_after))
+    return delay
+
+
+async def fetch_symbol(session, symbol, bucket, semaphore, params, base_url=YAHOO_CHART_URL,
+                       retries=4, backoff=0.5, max_backoff=30.0, timeout=20.0):
+    """
+    Baixa um símbolo com retries. Retorna (DataFrame ou None, registro da tentativa).
+
+    Erros de rede/timeout e status em RETRY_STATUS são repetidos; os demais
+    (ex.: 404 de símbolo inexistente) falham na hora.
+    """
+    url = f"{base_url.rstrip('/')}/{symbol}"
+    record = {"symbol": symbol, "attempts": 0, "status": None, "error": None, "seconds": 0.0}
+    started = time.perf_counter()
+
+    for attempt in range(retries + 1):
+        record["attempts"] = attempt + 1
+        await bucket.acquire()
+        try:
+            async with semaphore:
+                payload = await _request(session, url, params, timeout)
+            df = parse_chart(payload)
+            record.update(status=200, error=None if df is not None else "sem dados")
+            record["seconds"] = round(time.perf_counter() - started, 4)
+            return df, record
+        except FetchError as e:
+            record.update(status=e.status, error=str(e))
+            retryable = e.status is None or e.status in RETRY_STATUS
+            if not retryable or attempt == retries:
+                break
+            await asyncio.sleep(backoff_delay(attempt, backoff, max_backoff, e.retry_after))
+        except Exception as e:
+            record.update(status=None, error=f"{type(e).__name__}: {e}")
+            break
+
+    record["seconds"] = round(time.perf_counter() - started, 4)
+    return None, record
+
+
+async def fetch_universe_async(symbols, period="2y", interval="1d", start=None, base_url=YAHOO_CHART_URL,
+                               concurrency=16, rate=10.0, burst=None, bucket=None, retries=4,
+                               backoff=0.5, max_backoff=30.0, timeout=20.0, on_result=None):
+    """
+    Baixa todos os símbolos de forma assíncrona.
+
+    Retorna (data, report): data é um dict símbolo -> DataFrame e report tem uma
+    entrada por símbolo (attempts, status, error, seconds), inclusive os que falharam.
+    """
+    import aiohttp
+
+    symbols = list(dict.fromkeys(s for s in symbols if s))
+    bucket = bucket or TokenBucket(rate, burst)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    params = chart_params(period, interval, start)
+
+    data = {}
+    report = []
+    connector = aiohttp.TCPConnector(limit=max(1, concurrency))
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector) as session:
+        tasks = [
+            asyncio.ensure_future(fetch_symbol(
+                session, symbol, bucket, semaphore, params, base_url=base_url,
+                retries=retries, backoff=backoff, max_backoff=max_backoff, timeout=timeout
+            ))
+            for symbol in symbols
+        ]
+        for task in asyncio.as_completed(tasks):
+            df, record = await task
+            if df is not None:
+                data[record["symbol"]] = df
+            report.append(record)
+            if on_result is not None:
+                on_result(record)
+
+    position = {symbol: i for i, symbol in enumerate(symbols)}
+    report.sort(key=lambda r: position[r["symbol"]])
+    return data, report
+
+
+def fetch_universe(symbols, **kwargs):
+    """Versão síncrona de fetch_universe_async (roda o próprio event loop)"""
+    return asyncio.run(fetch_universe_async(symbols, **kwargs))
+
+
+def failure_report(report):
+    """Somente os símbolos que falharam, com o motivo"""
+    return [r for r in report if r["status"] != 200 or r["error"]]
+
+
+def describe_failure(record):
+    """Motivo legível de uma falha: erro, status HTTP e número de tentativas"""
+    error = record["error"] or f"HTTP {record['status']}"
+    if record["status"] not in (None, 200) and str(record["status"]) not in error:
+        error = f"{error} (HTTP {record['status']})"
+    return f"{error} após {record['attempts']} tentativa(s)"
+
+
+def async_downloader(**options):
+    """
+    Adapta o pipeline assíncrono à interface `downloader` de download_universe.
+
+    O token bucket é criado aqui e compartilhado entre todos os lotes, então o
+    rate limit vale para o universo inteiro, não por lote. Devolve (data, motivos),
+    então o report de cada lote traz o motivo de cada símbolo que falhou.
+    """
+    options.setdefault("bucket", TokenBucket(options.pop("rate", 10.0), options.pop("burst", None)))
+
+    def downloader(symbols, period="2y", interval="1d", start=None):
+        data, report = fetch_universe(symbols, period=period, interval=interval, start=start, **options)
+        return data, {record["symbol"]: describe_failure(record) for record in failure_report(report)}
+
+    return downloader
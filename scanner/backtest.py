@@ -0,0 +1,110 @@
+"""
+Backtest histórico: encontra todas as ocorrências de cada setup (em todas as barras, não só
+na última) com operações vetorizadas sobre o painel e mede os retornos N barras à frente.
+"""
+import numpy as np
+import pandas as pd
+
+from scanner.core import build_timeframe_bars, enrich_results
+from scanner.engine import build_panel
+from scanner.setups import evaluate_setups
+
+# Horizontes (em barras do próprio timeframe) dos retornos futuros
+FORWARD_BARS = {
+    "Daily": [1, 5, 10, 20],
+    "Weekly": [1, 4, 8],
+    "Monthly": [1, 3, 6],
+    "Quarterly": [1, 2, 4],
+}
+
+PERCENTILES = [10, 25, 50, 75, 90]
+
+
+def forward_returns(close, bars):
+    """Retorno simples de close[t] até close[t + bars] em todo o painel (NaN sem barra futura)"""
+    out = np.full_like(close, np.nan)
+    if bars < close.shape[1]:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[:, :-bars] = close[:, bars:] / close[:, :-bars] - 1.0
+    return out
+
+
+def find_occurrences(bars, combos, forward_bars=None):
+    """
+    Todas as ocorrências históricas de cada (timeframe, setup).
+
+    `bars` é o dict timeframe -> {símbolo: barras} de build_timeframe_bars. Retorna um
+    DataFrame com timeframe, setup, symbol, date, price, valid e uma coluna fwd_<N> por horizonte.
+    """
+    forward_bars = forward_bars or FORWARD_BARS
+    parts = []
+    for timeframe in dict.fromkeys(tf for tf, _ in combos):
+        panel = build_panel(bars.get(timeframe, {}), depth=None, with_dates=True)
+        if len(panel["symbols"]) == 0:
+            continue
+        horizons = forward_bars.get(timeframe, [1])
+        returns = {n: forward_returns(panel["close"], n) for n in horizons}
+        setups = [setup for tf, setup in combos if tf == timeframe]
+        evaluated = evaluate_setups(panel, setups)
+
+        for setup in setups:
+            mask, price, adjusted = evaluated[setup]
+            rows, cols = np.nonzero(mask)
+            part = pd.DataFrame({
+                "timeframe": timeframe,
+                "setup": setup,
+                "symbol": panel["symbols"][rows],
+                "date": panel["dates"][rows, cols],
+                "price": price[rows, cols],
+                "valid": np.where(adjusted[rows, cols], "Adjusted", "OK"),
+            })
+            for n in horizons:
+                part[f"fwd_{n}"] = returns[n][rows, cols]
+            parts.append(part)
+
+    if not parts:
+        return pd.DataFrame(columns=["timeframe", "setup", "symbol", "date", "price", "valid"])
+    return pd.concat(parts, ignore_index=True)
+
+
+def summarize(occurrences, by=("timeframe", "setup")):
+    """
+    Estatísticas por grupo e horizonte: ocorrências, hit-rate (retorno > 0), média,
+    desvio-padrão e percentis da distribuição dos retornos futuros.
+    """
+    by = [col for col in by if col in occurrences.columns]
+    fwd_columns = [col for col in occurrences.columns if col.startswith("fwd_")]
+    if occurrences.empty or not fwd_columns:
+        return pd.DataFrame()
+
+    long = occurrences.melt(id_vars=by, value_vars=fwd_columns, var_name="horizon", value_name="ret")
+    long = long.dropna(subset=["ret"])
+    if long.empty:
+        return pd.DataFrame()
+    long["horizon"] = long["horizon"].str[4:].astype(int)
+    long["hit"] = long["ret"] > 0
+
+    grouped = long.groupby(by + ["horizon"], dropna=False)
+    summary = grouped.agg(
+        occurrences=("ret", "size"),
+        hit_rate=("hit", "mean"),
+        mean=("ret", "mean"),
+        std=("ret", "std"),
+    )
+    quantiles = grouped["ret"].quantile([p / 100 for p in PERCENTILES]).unstack()
+    quantiles.columns = [f"p{p}" for p in PERCENTILES]
+    return summary.join(quantiles).reset_index()
+
+
+def run_backtest(data, combos, df_symbols=None, by=("timeframe", "setup"), forward_bars=None, bar_cache=None):
+    """
+    Backtest completo: (ocorrências, resumo).
+
+    Com df_symbols, as ocorrências recebem setor/tags e `by` pode incluir essas colunas.
+    """
+    timeframes = list(dict.fromkeys(tf for tf, _ in combos))
+    bars = build_timeframe_bars(data, timeframes, bar_cache=bar_cache)
+    occurrences = find_occurrences(bars, combos, forward_bars)
+    if df_symbols is not None:
+        occurrences = enrich_results(occurrences, df_symbols)
+    return occurrences, summarize(occurrences, by)
@@ -0,0 +1,196 @@
+"""Cache de barras multi-timeframe (semanal/mensal/trimestral) montadas uma vez por símbolo"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+TIMEFRAME_RULES = {
+    "Daily": None,
+    "Weekly": "W",
+    "Monthly": "M",
+    "Quarterly": "Q",
+}
+
+OHLC = ["open", "high", "low", "close"]
+
+
+def normalize_columns(df):
+    """Renomeia as colunas para minúsculas (não faz nada se o frame já estiver normalizado)"""
+    if "close" in df.columns and all(isinstance(c, str) and c.islower() and " " not in c for c in df.columns):
+        return df
+    df = df.rename(columns=lambda col: str(col).lower().replace(" ", "_"))
+    if "close" not in df.columns:
+        for alt in ("adj_close", "adjclose"):
+            if alt in df.columns:
+                df = df.assign(close=df[alt])
+                break
+    return df
+
+
+def _period_codes(index, rule):
+    """Código inteiro do período (semana W-SUN, mês, trimestre) de cada data e a data-rótulo do fim do período"""
+    days = index.values.astype("datetime64[D]")
+    if rule == "W":
+        # 1970-01-05 foi segunda-feira: semanas de segunda a domingo
+        codes = (days.astype(np.int64) + 3) // 7
+        return codes, lambda c: (c * 7 - 3 + 6).astype("datetime64[D]")
+    months = days.astype("datetime64[M]").astype(np.int64)
+    if rule == "M":
+        return months, lambda c: (c.astype("datetime64[M]") + 1).astype("datetime64[D]") - 1
+    quarters = months // 3
+    return quarters, lambda c: ((c * 3).astype("datetime64[M]") + 3).astype("datetime64[D]") - 1
+
+
+def resample_ohlc(df, rule):
+    """Agrega barras diárias (colunas normalizadas) para o timeframe `rule`"""
+    agg = {"open": "first", "high": "max", "low": "min", "close": "last"}
+    if "volume" in df.columns:
+        agg["volume"] = "sum"
+
+    values = df[OHLC].to_numpy(dtype=np.float64)
+    fast = (
+        rule in ("W", "M", "Q")
+        and len(df) > 0
+        and isinstance(df.index, pd.DatetimeIndex)
+        and df.index.is_monotonic_increasing
+        and not np.isnan(values).any()
+    )
+    if not fast:
+        return df[list(agg)].resample(rule).agg(agg).dropna(subset=OHLC)
+
+    # Caminho rápido (sem NaN, índice ordenado): reduceat sobre os limites de cada período
+    codes, label_of = _period_codes(df.index, rule)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)] - 1
+    columns = {
+        "open": values[starts, 0],
+        "high": np.maximum.reduceat(values[:, 1], starts),
+        "low": np.minimum.reduceat(values[:, 2], starts),
+        "close": values[ends, 3],
+    }
+    if "volume" in agg:
+        columns["volume"] = np.add.reduceat(df["volume"].to_numpy(), starts)
+    index = pd.DatetimeIndex(label_of(codes[starts]).astype("datetime64[ns]"), name=df.index.name)
+    return pd.DataFrame(columns, index=index)
+
+
+# Multiplicadores ímpares (um por coluna: data + OHLC) do hash de cada barra diária
+_ROW_HASH = np.array(
+    [0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93, 0xFF51AFD7ED558CCD],
+    dtype=np.uint64
+)
+
+
+def row_hashes(daily, stop=None):
+    """Hash (uint64) de cada barra diária até `stop`: data e bits de open/high/low/close"""
+    window = slice(0, stop)
+    with np.errstate(over="ignore"):
+        hashes = daily.index.values[window].astype("datetime64[ns]").view(np.uint64) * _ROW_HASH[0]
+        for multiplier, col in zip(_ROW_HASH[1:], OHLC):
+            hashes += daily[col].to_numpy(dtype=np.float64)[window].view(np.uint64) * multiplier
+    return hashes
+
+
+class BarCache:
+    """
+    Memoiza as barras de timeframe maior por (símbolo, timeframe, última barra diária).
+
+    - Mesma última barra (data e valores): devolve as barras já montadas
+    - Barras diárias novas no fim do histórico: refaz só o último período (parcial) em diante
+    - Janela móvel (primeira barra avançou): descarta os períodos que saíram e refaz o
+      primeiro, que ficou parcial
+    - Histórico anterior ao último período reescrito (ex.: split re-baixado): remonta tudo
+
+    Para saber se o histórico já fechado mudou, cada entrada guarda o hash (8 bytes por
+    barra) das barras diárias até o penúltimo período.
+    Thread-safe para ser compartilhado entre sessões (st.cache_resource).
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "incremental": 0, "full": 0}
+
+    @staticmethod
+    def _fingerprint(df):
+        # Coluna a coluna: df[OHLC] copiaria o frame inteiro só para ler a última linha
+        return tuple(float(df[col].iat[-1]) for col in OHLC)
+
+    def get(self, symbol, daily, timeframe):
+        """Retorna as barras do timeframe para o histórico diário de um símbolo"""
+        rule = TIMEFRAME_RULES[timeframe]
+        if rule is None or daily is None or len(daily) == 0:
+            return daily
+        if hasattr(daily, "to_frame"):  # CompactOHLCV
+            daily = daily.to_frame()
+
+        daily = normalize_columns(daily)
+        if any(col not in daily.columns for col in OHLC):
+            return None
+
+        first, last = daily.index[0], daily.index[-1]
+        fingerprint = self._fingerprint(daily)
+        key = (symbol, timeframe)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is not None:
+            if entry["first"] == first and entry["last"] == last and entry["fingerprint"] == fingerprint:
+                with self._lock:
+                    self.stats["hits"] += 1
+                return entry["bars"]
+
+            bars = self._extend(entry, daily, rule)
+            if bars is not None:
+                self._store(key, daily, fingerprint, bars, "incremental")
+                return bars
+
+        bars = resample_ohlc(daily, rule)
+        self._store(key, daily, fingerprint, bars, "full")
+        return bars
+
+    @staticmethod
+    def _extend(entry, daily, rule):
+        """
+        Barras novas reaproveitando as da entrada, ou None se o histórico fechado mudou
+        (aí só remontando tudo).
+        """
+        cached = entry["bars"]
+        if daily.index[-1] < entry["last"] or len(cached) < 2:
+            return None
+        # Barras diárias dos períodos fechados: precisam ser as mesmas de antes (ou um sufixo
+        # delas, se a janela andou)
+        boundary = cached.index[-2]
+        head = int(daily.index.searchsorted(boundary, side="right"))
+        offset = len(entry["hashes"]) - head
+        if head == 0 or offset < 0 or not np.array_equal(row_hashes(daily, head), entry["hashes"][offset:]):
+            return None
+
+        parts = [cached.iloc[:-1]]
+        if offset:
+            # O primeiro período perdeu dias: refeito; os que saíram inteiros da janela somem
+            codes, _ = _period_codes(daily.index[:head], rule)
+            lead = resample_ohlc(daily.iloc[:int(np.count_nonzero(codes == codes[0]))], rule)
+            parts = [lead, parts[0][parts[0].index > lead.index[-1]]]
+        parts.append(resample_ohlc(daily.iloc[head:], rule))
+        return pd.concat(parts)
+
+    def _store(self, key, daily, fingerprint, bars, kind):
+        boundary = bars.index[-2] if len(bars) >= 2 else None
+        head = int(daily.index.searchsorted(boundary, side="right")) if boundary is not None else 0
+        entry = {
+            "first": daily.index[0],
+            "last": daily.index[-1],
+            "fingerprint": fingerprint,
+            "bars": bars,
+            "hashes": row_hashes(daily, head),
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self.stats[kind] += 1
+
+    def clear(self):
+        """Descarta todas as barras memoizadas"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,100 @@
+"""
+Representação compacta de OHLCV para o cache em memória.
+
+Mantém só o que o scanner usa: preços em float32 num bloco contíguo (barras x 4),
+volume inteiro e um índice de datas compartilhado entre os símbolos que têm o
+mesmo calendário. Os nomes de colunas são normalizados uma única vez, na ingestão.
+"""
+import numpy as np
+import pandas as pd
+
+from scanner.bars import OHLC, normalize_columns
+
+
+class CompactOHLCV:
+    """OHLCV de um símbolo: dates (datetime64[ns]), prices (float32, barras x 4) e volume (int64)"""
+
+    __slots__ = ("dates", "prices", "volume")
+
+    def __init__(self, dates, prices, volume):
+        self.dates = dates
+        self.prices = prices
+        self.volume = volume
+
+    @classmethod
+    def from_frame(cls, df, dates=None):
+        """Converte um DataFrame (qualquer capitalização de colunas); None se faltar OHLC"""
+        if df is None or df.empty:
+            return None
+        df = normalize_columns(df)
+        if any(col not in df.columns for col in OHLC):
+            return None
+        prices = np.ascontiguousarray(df[OHLC].to_numpy(dtype=np.float32))
+        if "volume" in df.columns:
+            volume = df["volume"].fillna(0).to_numpy().astype(np.int64)
+        else:
+            volume = np.zeros(len(df), dtype=np.int64)
+        if dates is None:
+            dates = df.index.values.astype("datetime64[ns]")
+        return cls(dates, prices, volume)
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def nbytes(self):
+        """Bytes próprios (sem contar o índice de datas, que pode ser compartilhado)"""
+        return self.prices.nbytes + self.volume.nbytes
+
+    def to_frame(self):
+        """DataFrame com colunas normalizadas (open/high/low/close/volume), sem copiar os preços"""
+        df = pd.DataFrame(self.prices, index=pd.DatetimeIndex(self.dates, name="date"), columns=OHLC, copy=False)
+        df["volume"] = self.volume
+        return df
+
+
+def as_frame(value):
+    """Aceita DataFrame ou CompactOHLCV e devolve sempre um DataFrame"""
+    return value.to_frame() if isinstance(value, CompactOHLCV) else value
+
+
+def compact_universe(frames):
+    """
+    Converte um dict símbolo -> DataFrame em símbolo -> CompactOHLCV.
+
+    Índices de datas idênticos viram o mesmo array (a maioria dos símbolos
+    compartilha o calendário da bolsa).
+    """
+    shared_dates = {}
+    data = {}
+    for symbol, df in frames.items():
+        if df is None or df.empty:
+            continue
+        if isinstance(df, CompactOHLCV):
+            data[symbol] = df
+            continue
+        values = df.index.values.astype("datetime64[ns]")
+        key = (len(values), values[0], values[-1], hash(values.tobytes()))
+        dates = shared_dates.setdefault(key, values)
+        compact = CompactOHLCV.from_frame(df, dates=dates)
+        if compact is not None:
+            data[symbol] = compact
+    return data
+
+
+def memory_report(data, raw_frames=None):
+    """Pegada de memória por símbolo e do universo (índices compartilhados contados uma vez)"""
+    unique_dates = {id(c.dates): c.dates.nbytes for c in data.values()}
+    own = sum(c.nbytes for c in data.values())
+    total = own + sum(unique_dates.values())
+    report = {
+        "symbols": len(data),
+        "bytes": total,
+        "bytes_per_symbol": round(total / len(data), 1) if data else 0,
+        "shared_date_indexes": len(unique_dates),
+    }
+    if raw_frames is not None:
+        raw = sum(int(df.memory_usage(deep=True).sum()) for df in raw_frames.values() if df is not None)
+        report["raw_bytes"] = raw
+        report["ratio"] = round(raw / total, 2) if total else None
+    return report
@@ -0,0 +1,292 @@
+"""Núcleo de scan: avalia todas as combinações setup x timeframe em uma passada pelos dados"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scanner.bars import BarCache, normalize_columns
+from scanner.compact import CompactOHLCV
+from scanner.engine import build_panel
+from scanner.fetch import chunked
+from scanner.mapped import open_panel
+from scanner.setups import evaluate_setups, scan_last_bar, setup_depth, setups_by_timeframe
+from scanner.store import OHLCV_DIR, load_universe
+from scanner.universe import SymbolIndex
+
+RESULT_COLUMNS = ["timeframe", "setup", "symbol", "price", "valid"]
+
+MIN_DAILY_BARS = 5  # Precisa de pelo menos 5 dias de dados
+
+
+# =========================
+# COMBINAÇÕES
+# =========================
+def _parse_list(value):
+    if value is None or value == "all":
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    return [v.strip() for v in value if v.strip()]
+
+
+def resolve_combos(setups="all", timeframes="all"):
+    """Lista de (timeframe, setup) válidos para os filtros informados ('all' ou lista/CSV), vinda do registro de setups"""
+    setups = _parse_list(setups)
+    timeframes = _parse_list(timeframes)
+    combos = []
+    for timeframe, available in setups_by_timeframe().items():
+        if timeframes is not None and timeframe not in timeframes:
+            continue
+        for setup in available:
+            if setups is None or setup in setups:
+                combos.append((timeframe, setup))
+    return combos
+
+
+# =========================
+# CONFLUÊNCIA
+# =========================
+CONFLUENCE_MODES = ("all", "any")
+
+
+def condition_label(timeframe, setup):
+    """Nome da coluna de uma condição no resultado de confluence"""
+    return f"{timeframe} · {setup}"
+
+
+def parse_conditions(values):
+    """
+    Converte "Timeframe:Setup" (lista ou separado por vírgula) em combinações validadas pelo registro.
+
+    Ex.: "Daily:Inside Bar,Weekly:Inside Bar" -> [("Daily", "Inside Bar"), ("Weekly", "Inside Bar")]
+    """
+    available = setups_by_timeframe()
+    conditions = []
+    for value in _parse_list(values) or []:
+        timeframe, _, setup = value.partition(":")
+        timeframe, setup = timeframe.strip(), setup.strip()
+        if setup not in available.get(timeframe, []):
+            raise ValueError(f"Condição inválida: {value!r} (use Timeframe:Setup)")
+        conditions.append((timeframe, setup))
+    return list(dict.fromkeys(conditions))
+
+
+def confluence(results, conditions, mode="all", symbols=None):
+    """
+    Uma linha por símbolo com uma coluna booleana por condição (hits de scan_bars/run_scan).
+
+    mode="all" mantém os símbolos que atendem todas as condições e "any" os que atendem
+    pelo menos uma. `matches` conta as condições atendidas; price vem da primeira
+    condição atendida e valid é "Adjusted" se alguma delas foi ajustada.
+    A ordem segue `symbols` (padrão: ordem de aparição nos hits).
+    """
+    if mode not in CONFLUENCE_MODES:
+        raise ValueError(f"Modo de confluência inválido: {mode}")
+    labels = [condition_label(tf, setup) for tf, setup in conditions]
+    columns = ["symbol", "matches"] + labels + ["price", "valid"]
+
+    rank = {combo: i for i, combo in enumerate(conditions)}
+    hits = results[[(tf, setup) in rank for tf, setup in zip(results["timeframe"], results["setup"])]]
+    if hits.empty:
+        return pd.DataFrame(columns=columns)
+    hits = hits.assign(label=[condition_label(tf, setup) for tf, setup in zip(hits["timeframe"], hits["setup"])])
+
+    table = pd.crosstab(hits["symbol"], hits["label"]).reindex(columns=labels, fill_value=0) > 0
+    order = list(dict.fromkeys(symbols if symbols is not None else hits["symbol"]))
+    table = table.reindex([s for s in order if s in table.index])
+    matches = table.sum(axis=1)
+    table = table[matches == len(labels)] if mode == "all" else table[matches > 0]
+
+    hits = hits.assign(_rank=[rank[(tf, setup)] for tf, setup in zip(hits["timeframe"], hits["setup"])])
+    first = hits.sort_values("_rank", kind="stable").drop_duplicates("symbol").set_index("symbol")
+    adjusted = hits.assign(_adjusted=hits["valid"] == "Adjusted").groupby("symbol")["_adjusted"].any()
+
+    table.columns.name = None
+    out = table.rename_axis("symbol").reset_index()
+    out.insert(1, "matches", matches.reindex(out["symbol"]).to_numpy())
+    out["price"] = first["price"].reindex(out["symbol"]).to_numpy()
+    out["valid"] = np.where(adjusted.reindex(out["symbol"]).to_numpy(), "Adjusted", "OK")
+    return out[columns].reset_index(drop=True)
+
+
+# =========================
+# SCAN
+# =========================
+def build_timeframe_bars(data, timeframes, bar_cache=None, progress=None, telemetry=None):
+    """Monta uma vez, por símbolo, as barras de cada timeframe pedido"""
+    bar_cache = bar_cache if bar_cache is not None else BarCache()
+    stats_before = dict(bar_cache.stats)
+    bars = {timeframe: {} for timeframe in timeframes}
+    total = len(data)
+    for i, (symbol, df) in enumerate(data.items()):
+        if df is not None and len(df) >= MIN_DAILY_BARS:
+            started = time.perf_counter()
+            try:
+                # CompactOHLCV já foi normalizado na ingestão
+                if not isinstance(df, CompactOHLCV):
+                    df = normalize_columns(df)
+            except Exception as e:
+                df = None
+                if telemetry is not None:
+                    telemetry.error("normalize", symbol, e)
+            if telemetry is not None:
+                telemetry.record("normalize", symbol, time.perf_counter() - started)
+
+            for timeframe in timeframes if df is not None else []:
+                started = time.perf_counter()
+                try:
+                    tf_bars = bar_cache.get(symbol, df, timeframe)
+                except Exception as e:
+                    tf_bars = None
+                    if telemetry is not None:
+                        telemetry.error("resample", symbol, e)
+                if telemetry is not None:
+                    telemetry.record("resample", symbol, time.perf_counter() - started)
+                if tf_bars is not None:
+                    bars[timeframe][symbol] = tf_bars
+        if progress is not None:
+            progress(i + 1, total)
+
+    if telemetry is not None:
+        stats = bar_cache.stats
+        telemetry.cache(
+            "bar_cache",
+            hits=stats["hits"] - stats_before.get("hits", 0),
+            misses=(stats["incremental"] - stats_before.get("incremental", 0))
+            + (stats["full"] - stats_before.get("full", 0))
+        )
+    return bars
+
+
+def scan_bars(bars, combos, telemetry=None):
+    """
+    Roda o motor vetorizado: um painel por timeframe, compartilhado entre os setups dele
+    (inclusive as subexpressões comuns das regras).
+    """
+    started = time.perf_counter()
+    results = []
+    for timeframe in dict.fromkeys(tf for tf, _ in combos):
+        setups = [setup for tf, setup in combos if tf == timeframe]
+        panel = build_panel(bars.get(timeframe, {}), depth=setup_depth(setups))
+        evaluated = evaluate_setups(panel, setups)
+        for setup in setups:
+            hits = scan_last_bar(panel, setup, evaluated[setup])
+            hits = hits[hits["found"]]
+            hits.insert(0, "timeframe", timeframe)
+            hits.insert(1, "setup", setup)
+            results.append(hits[RESULT_COLUMNS])
+
+    results = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=RESULT_COLUMNS)
+    if telemetry is not None:
+        telemetry.add_time("detect", time.perf_counter() - started, count=len(results))
+    return results
+
+
+def scan_universe(data, combos, bar_cache=None, progress=None, telemetry=None):
+    """Scan completo em memória: data é um dict símbolo -> DataFrame diário"""
+    timeframes = list(dict.fromkeys(tf for tf, _ in combos))
+    bars = build_timeframe_bars(data, timeframes, bar_cache=bar_cache, progress=progress, telemetry=telemetry)
+    return scan_bars(bars, combos, telemetry=telemetry)
+
+
+def order_by_combo(parts, combos):
+    """
+    Junta resultados parciais na ordem de scan_universe: por combinação, depois por símbolo.
+
+    Os lotes precisam chegar na ordem dos símbolos; a ordenação estável preserva essa ordem.
+    """
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    order = {combo: i for i, combo in enumerate(combos)}
+    results = pd.concat(parts, ignore_index=True)
+    results["_order"] = [order[(tf, setup)] for tf, setup in zip(results["timeframe"], results["setup"])]
+    return results.sort_values("_order", kind="stable").drop(columns="_order").reset_index(drop=True)
+
+
+def iter_scan(symbols, combos, load, batch_size=100, bar_cache=None, cancel=None, telemetry=None):
+    """
+    Scan em lotes: gera um dict por lote assim que ele termina, com
+    "symbols" (o lote), "hits", "done" e "total" (símbolos processados/total).
+
+    `load(lote)` devolve o dict símbolo -> DataFrame do lote (disco, download...), então
+    os primeiros hits saem depois de um lote e não do universo inteiro.
+    `cancel` (ex.: threading.Event) é checado entre lotes: cancelamento cooperativo,
+    o lote em andamento termina e nada mais é gerado. order_by_combo sobre todos os
+    "hits" gerados dá o mesmo resultado de scan_universe.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    timeframes = list(dict.fromkeys(tf for tf, _ in combos))
+    done = 0
+    for batch in chunked(symbols, batch_size):
+        if cancel is not None and cancel.is_set():
+            return
+        data = load(batch)
+        bars = build_timeframe_bars(
+            {symbol: data.get(symbol) for symbol in batch}, timeframes, bar_cache=bar_cache, telemetry=telemetry
+        )
+        done += len(batch)
+        yield {"symbols": batch, "hits": scan_bars(bars, combos, telemetry=telemetry), "done": done, "total": len(symbols)}
+
+
+def load_local(symbols, root=OHLCV_DIR, panel_root=None):
+    """
+    Histórico diário dos símbolos: do painel mapeado (sem cópia) quando `panel_root`
+    tem uma versão publicada, senão dos Parquet do armazenamento local.
+    """
+    if panel_root is not None:
+        panel = open_panel(root=panel_root)
+        if panel is not None:
+            return panel.universe(symbols)
+    return load_universe(symbols, root)
+
+
+def _scan_chunk(symbols, combos, root, panel_root=None):
+    """Trabalho de um processo: lê seus símbolos do armazenamento local e faz o scan"""
+    return scan_universe(load_local(symbols, root, panel_root), combos)
+
+
+def run_scan(symbols, combos, workers=1, root=OHLCV_DIR, chunk_size=200, telemetry=None, panel_root=None):
+    """
+    Scan do armazenamento local distribuído em um pool de processos.
+
+    Cada processo lê e reamostra apenas o seu lote de símbolos; o resultado
+    é o mesmo de scan_universe sobre o universo inteiro. A telemetria por símbolo
+    só é coletada no modo de um processo; no pool fica o tempo total em "detect".
+    Com `panel_root`, todos os processos mapeiam o mesmo painel em vez de ler os Parquet.
+    """
+    chunks = chunked(list(symbols), chunk_size)
+    if workers <= 1 or len(chunks) <= 1:
+        return scan_universe(load_local(symbols, root, panel_root), combos, telemetry=telemetry)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_scan_chunk, chunk, combos, root, panel_root) for chunk in chunks]
+        parts = [future.result() for future in futures]
+    if telemetry is not None:
+        telemetry.add_time("detect", time.perf_counter() - started, count=len(symbols))
+
+    return order_by_combo(parts, combos)
+
+
+# =========================
+# RESULTADOS
+# =========================
+def enrich_results(results, df_symbols, columns=("sector_spdr", "tags")):
+    """Acrescenta setor e tags do symbols.csv a cada hit (aceita DataFrame ou SymbolIndex)"""
+    if isinstance(df_symbols, SymbolIndex):
+        return df_symbols.enrich(results, columns)
+    columns = [col for col in columns if col in df_symbols.columns]
+    if results.empty or not columns:
+        return results
+    meta = df_symbols.drop_duplicates("symbols").set_index("symbols")[columns]
+    return results.join(meta, on="symbol")
+
+
+def save_results(results, path):
+    """Grava os resultados em Parquet ou JSON (pela extensão do arquivo)"""
+    if str(path).endswith(".json"):
+        results.to_json(path, orient="records", indent=2, force_ascii=False)
+    else:
+        results.to_parquet(path, index=False)
@@ -0,0 +1,264 @@
+"""Detectores de setups por símbolo (sem dependência do Streamlit)"""
+import logging
+
+import pandas as pd
+
+from scanner.bars import resample_ohlc
+
+logger = logging.getLogger(__name__)
+
+
+def fix_candle(open_p, high_p, low_p, close_p):
+    """Corrige inconsistências nos dados de candlestick"""
+    valid_flag = "OK"
+    if open_p > high_p:
+        high_p = open_p
+        valid_flag = "Adjusted"
+    if open_p < low_p:
+        low_p = open_p
+        valid_flag = "Adjusted"
+    if close_p > high_p:
+        high_p = close_p
+        valid_flag = "Adjusted"
+    if close_p < low_p:
+        low_p = close_p
+        valid_flag = "Adjusted"
+    return open_p, high_p, low_p, close_p, valid_flag
+
+
+def normalize_dataframe(df):
+    """Normaliza o DataFrame com nomes de colunas padronizados"""
+    if df is None or df.empty:
+        return None
+
+    # Já normalizado (ex.: barras do BarCache ou CompactOHLCV.to_frame()): os detectores
+    # só leem, então não precisa copiar
+    if all(isinstance(col, str) and col.islower() and " " not in col for col in df.columns) \
+            and all(col in df.columns for col in ('open', 'high', 'low', 'close')):
+        return df
+
+    # Cria uma cópia para não modificar o original
+    df_normalized = df.copy()
+    
+    # Normaliza os nomes das colunas
+    df_normalized.columns = [str(col).lower().replace(' ', '_') for col in df_normalized.columns]
+    
+    # Mapeia possíveis variações de nomes de colunas
+    column_mapping = {
+        'adj_close': 'close',
+        'adjclose': 'close',
+        'adj close': 'close'
+    }
+    
+    for old_name, new_name in column_mapping.items():
+        if old_name in df_normalized.columns and new_name not in df_normalized.columns:
+            df_normalized[new_name] = df_normalized[old_name]
+    
+    # Verifica se temos as colunas essenciais
+    required_columns = ['open', 'high', 'low', 'close']
+    missing_columns = [col for col in required_columns if col not in df_normalized.columns]
+    
+    if missing_columns:
+        logger.warning(f"Colunas faltando: {missing_columns}")
+        return None
+    
+    return df_normalized
+
+
+def detect_double_inside_bar(df):
+    """Detecta padrão Double Inside Bar"""
+    if df is None or len(df) < 3:
+        return False, None
+
+    df_norm = normalize_dataframe(df)
+    if df_norm is None:
+        return False, None
+
+    current = df_norm.iloc[-1]
+    previous = df_norm.iloc[-2]
+    before_previous = df_norm.iloc[-3]
+
+    try:
+        # Corrige dados da barra atual
+        open_curr, high_curr, low_curr, close_curr, valid_flag_curr = fix_candle(
+            float(current["open"]),
+            float(current["high"]),
+            float(current["low"]),
+            float(current["close"])
+        )
+        
+        # Corrige dados da barra anterior
+        open_prev, high_prev, low_prev, close_prev, valid_flag_prev = fix_candle(
+            float(previous["open"]),
+            float(previous["high"]),
+            float(previous["low"]),
+            float(previous["close"])
+        )
+        
+        # Dados da barra antes da anterior
+        high_before, low_before = float(before_previous["high"]), float(before_previous["low"])
+
+        # Verifica se a barra atual é inside da anterior
+        current_inside = high_curr < high_prev and low_curr > low_prev
+        
+        # Verifica se a barra anterior é inside da que vem antes
+        previous_inside = high_prev < high_before and low_prev > low_before
+
+        if current_inside and previous_inside:
+            valid_flag = "Adjusted" if valid_flag_curr == "Adjusted" or valid_flag_prev == "Adjusted" else "OK"
+            return True, {
+                "type": "Double Inside Bar",
+                "price": close_curr,
+                "valid": valid_flag
+            }
+            
+    except (ValueError, KeyError) as e:
+        logger.warning(f"Erro no Double Inside Bar: {e}")
+        return False, None
+    
+    return False, None
+
+
+def detect_inside_bar(df):
+    """Detecta padrão Inside Bar"""
+    if df is None or len(df) < 2:
+        return False, None
+
+    df_norm = normalize_dataframe(df)
+    if df_norm is None:
+        return False, None
+
+    current = df_norm.iloc[-1]
+    previous = df_norm.iloc[-2]
+
+    try:
+        open_curr, high_curr, low_curr, close_curr, valid_flag = fix_candle(
+            float(current["open"]),
+            float(current["high"]),
+            float(current["low"]),
+            float(current["close"])
+        )
+        high_prev, low_prev = float(previous["high"]), float(previous["low"])
+
+        if high_curr < high_prev and low_curr > low_prev:
+            return True, {
+                "type": "Inside Bar",
+                "price": close_curr,
+                "valid": valid_flag
+            }
+    except (ValueError, KeyError) as e:
+        logger.warning(f"Erro no Inside Bar: {e}")
+        return False, None
+    
+    return False, None
+
+
+def _check_2down_green(bars, label):
+    """Avalia as condições do 2Down Green nas 2 últimas barras (colunas já normalizadas)"""
+    current = bars.iloc[-1]   # Barra atual (em andamento)
+    previous = bars.iloc[-2]  # Barra anterior
+
+    open_curr, high_curr, low_curr, close_curr, valid_flag = fix_candle(
+        float(current["open"]),
+        float(current["high"]),
+        float(current["low"]),
+        float(current["close"])
+    )
+
+    high_prev = float(previous["high"])
+    low_prev = float(previous["low"])
+
+    rompeu_minima = low_curr < low_prev           # 1. Rompeu mínima anterior
+    fechou_verde = close_curr > open_curr         # 2. Fechou verde
+    nao_rompeu_maxima = high_curr < high_prev     # 3. NÃO rompeu máxima anterior
+
+    if rompeu_minima and fechou_verde and nao_rompeu_maxima:
+        return True, {
+            "type": label,
+            "price": round(close_curr, 2),
+            "valid": valid_flag
+        }
+
+    return False, None
+
+
+def detect_2down_green_3m(df, bars=None):
+    """
+    Detecta 2Down Green 3M (trimestral):
+    - Vela atual rompeu mínima da vela anterior (low_atual < low_anterior)
+    - Vela atual está verde (close_atual > open_atual)
+    - Vela atual NÃO rompeu máxima da vela anterior (high_atual < high_anterior)
+
+    `bars`: barras trimestrais já montadas (ex.: BarCache); se informadas, pula o resample de `df`
+    """
+    try:
+        if bars is not None:
+            df_quarterly = normalize_dataframe(bars)
+        else:
+            if df is None or df.empty:
+                return False, None
+
+            df_norm = normalize_dataframe(df)
+            if df_norm is None:
+                return False, None
+
+            # Garante que o índice é datetime
+            if not isinstance(df_norm.index, pd.DatetimeIndex):
+                df_norm = df_norm.reset_index()
+                if 'date' in df_norm.columns:
+                    df_norm['date'] = pd.to_datetime(df_norm['date'])
+                    df_norm = df_norm.set_index('date')
+                else:
+                    df_norm.index = pd.to_datetime(df_norm.index)
+
+            df_quarterly = resample_ohlc(df_norm, 'Q')
+
+        if df_quarterly is None or len(df_quarterly) < 2:  # Precisamos de pelo menos 2 barras trimestrais
+            return False, None
+
+        return _check_2down_green(df_quarterly, "2Down Green 3M")
+
+    except Exception as e:
+        logger.warning(f"Erro no 2Down Green 3M: {e}")
+        return False, None
+
+
+def detect_2down_green_monthly(df, bars=None):
+    """
+    Detecta 2Down Green Monthly:
+    - Vela atual rompeu mínima da vela anterior (low_atual < low_anterior)
+    - Vela atual está verde (close_atual > open_atual)
+    - Vela atual NÃO rompeu máxima da vela anterior (high_atual < high_anterior)
+
+    `bars`: barras mensais já montadas (ex.: BarCache); se informadas, pula o resample de `df`
+    """
+    try:
+        if bars is not None:
+            df_monthly = normalize_dataframe(bars)
+        else:
+            if df is None or df.empty:
+                return False, None
+
+            df_norm = normalize_dataframe(df)
+            if df_norm is None:
+                return False, None
+
+            # Garante que o índice é datetime
+            if not isinstance(df_norm.index, pd.DatetimeIndex):
+                df_norm = df_norm.reset_index()
+                if 'date' in df_norm.columns:
+                    df_norm['date'] = pd.to_datetime(df_norm['date'])
+                    df_norm = df_norm.set_index('date')
+                else:
+                    df_norm.index = pd.to_datetime(df_norm.index)
+
+            df_monthly = resample_ohlc(df_norm, 'M')
+
+        if df_monthly is None or len(df_monthly) < 2:  # Precisamos de pelo menos 2 barras mensais
+            return False, None
+
+        return _check_2down_green(df_monthly, "2Down Green Monthly")
+
+    except Exception as e:
+        logger.warning(f"Erro no 2Down Green Monthly: {e}")
+        return False, None
@@ -0,0 +1,104 @@
+"""
+Motor vetorizado: painel símbolos x barras e as primitivas de array usadas pelas regras
+de scanner.setups para avaliar todo o universo de uma vez.
+"""
+import numpy as np
+
+from scanner.compact import CompactOHLCV
+
+PRICE_FIELDS = ["open", "high", "low", "close"]
+
+
+# =========================
+# PAINEL
+# =========================
+def _column_lookup(df):
+    """Mapeia nomes normalizados (minúsculos, '_' no lugar de espaço) para as colunas originais"""
+    lookup = {}
+    for col in df.columns:
+        lookup.setdefault(str(col).lower().replace(" ", "_"), col)
+    if "close" not in lookup:
+        for alt in ("adj_close", "adjclose"):
+            if alt in lookup:
+                lookup["close"] = lookup[alt]
+                break
+    return lookup
+
+
+def build_panel(frames, depth=3, with_dates=False):
+    """
+    Empilha o OHLC das últimas `depth` barras de cada símbolo em arrays alinhados à direita.
+
+    Retorna um dict com "symbols", "length" e um array (n_símbolos x depth) por campo;
+    posições sem barra ficam como NaN. Símbolos sem colunas OHLC são ignorados.
+    depth=None usa o histórico inteiro; with_dates=True inclui "dates" (NaT nas posições vazias).
+    """
+    if depth is None:
+        depth = max((len(df) for df in frames.values() if df is not None), default=0)
+    symbols = []
+    rows = []
+    lengths = []
+    indexes = []
+    positions_by_columns = {}
+    for symbol, df in frames.items():
+        if df is None or len(df) == 0:
+            continue
+        if isinstance(df, CompactOHLCV):
+            # Já está no layout do painel: só recorta as últimas barras
+            values = df.prices[-depth:].astype(np.float64)
+            index = df.dates
+        else:
+            # Quase todos os frames têm as mesmas colunas: resolve as posições uma vez por layout
+            key = tuple(df.columns)
+            if key not in positions_by_columns:
+                lookup = _column_lookup(df)
+                positions_by_columns[key] = (
+                    [df.columns.get_loc(lookup[field]) for field in PRICE_FIELDS]
+                    if all(field in lookup for field in PRICE_FIELDS) else None
+                )
+            positions = positions_by_columns[key]
+            if positions is None:
+                continue
+            # to_numpy do frame inteiro e depois o recorte é bem mais barato que df[colunas]
+            values = df.to_numpy()[-depth:, positions].astype(np.float64)
+            index = df.index.values
+        symbols.append(symbol)
+        rows.append(values)
+        lengths.append(len(values))
+        if with_dates:
+            indexes.append(index[-depth:])
+
+    n = len(symbols)
+    stacked = np.full((n, depth, len(PRICE_FIELDS)), np.nan)
+    for i, values in enumerate(rows):
+        stacked[i, depth - len(values):] = values
+
+    panel = {"symbols": np.array(symbols, dtype=object), "length": np.array(lengths, dtype=np.int64)}
+    for j, field in enumerate(PRICE_FIELDS):
+        panel[field] = np.ascontiguousarray(stacked[:, :, j])
+    if with_dates:
+        dates = np.full((n, depth), np.datetime64("NaT"), dtype="datetime64[ns]")
+        for i, index in enumerate(indexes):
+            dates[i, depth - len(index):] = index
+        panel["dates"] = dates
+    return panel
+
+
+def shift(values, periods=1):
+    """Desloca um array (símbolos x barras) para a direita, preenchendo com NaN/False"""
+    out = np.empty_like(values)
+    fill = False if values.dtype == bool else np.nan
+    out[:, :periods] = fill
+    out[:, periods:] = values[:, :-periods] if periods else values
+    return out
+
+
+def fix_candles(open_p, high_p, low_p, close_p):
+    """Versão vetorizada de fix_candle: retorna (high, low, adjusted) corrigidos"""
+    adjusted = (open_p > high_p) | (open_p < low_p)
+    high_fixed = np.where(open_p > high_p, open_p, high_p)
+    low_fixed = np.where(open_p < low_p, open_p, low_p)
+    adjusted |= (close_p > high_fixed) | (close_p < low_fixed)
+    high_fixed = np.where(close_p > high_fixed, close_p, high_fixed)
+    low_fixed = np.where(close_p < low_fixed, close_p, low_fixed)
+    return high_fixed, low_fixed, adjusted
@@ -0,0 +1,155 @@
+"""Download em lote de dados OHLCV do Yahoo Finance"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+
+# =========================
+# HELPERS
+# =========================
+def strip_timezone(df):
+    """Remove timezone do índice se presente"""
+    if df is None:
+        return None
+    if getattr(df.index, "tz", None) is not None:
+        df.index = df.index.tz_localize(None)
+    return df
+
+
+def split_by_symbol(raw, symbols):
+    """Separa o DataFrame do yf.download (agrupado por ticker) em um dict símbolo -> DataFrame"""
+    frames = {}
+    if raw is None or raw.empty:
+        return frames
+
+    if isinstance(raw.columns, pd.MultiIndex):
+        available = set(raw.columns.get_level_values(0))
+        for symbol in symbols:
+            if symbol not in available:
+                continue
+            df = raw[symbol].dropna(how="all")
+            if not df.empty:
+                frames[symbol] = df
+    elif len(symbols) == 1:
+        df = raw.dropna(how="all")
+        if not df.empty:
+            frames[symbols[0]] = df
+
+    return frames
+
+
+def yf_download_chunk(symbols, period="2y", interval="1d", start=None):
+    """Baixa um lote de símbolos em uma única chamada ao Yahoo Finance"""
+    import yfinance as yf
+
+    kwargs = {"start": start} if start is not None else {"period": period}
+    raw = yf.download(
+        symbols,
+        interval=interval,
+        group_by="ticker",
+        auto_adjust=False,
+        threads=False,
+        progress=False,
+        **kwargs
+    )
+    return split_by_symbol(raw, symbols)
+
+
+def get_downloader(name="yfinance", **options):
+    """Downloader por nome: 'yfinance' (yf.download em lote) ou 'async' (pipeline aiohttp)"""
+    if name == "async":
+        from scanner.aio_fetch import async_downloader
+        return async_downloader(**options)
+    if name != "yfinance":
+        raise ValueError(f"Downloader desconhecido: {name}")
+    return yf_download_chunk
+
+
+# =========================
+# DOWNLOAD EM LOTE
+# =========================
+def chunked(items, size):
+    """Divide uma lista em lotes de tamanho fixo"""
+    size = max(1, int(size))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def download_universe(symbols, period="2y", interval="1d", start=None,
+                      chunk_size=100, max_workers=4, downloader=None, on_chunk=None):
+    """
+    Baixa todo o universo de símbolos em lotes concorrentes.
+
+    Retorna (data, report):
+    - data: dict símbolo -> DataFrame OHLCV sem timezone
+    - report: uma entrada por lote com latência (segundos) e símbolos que falharam
+
+    `downloader` recebe (symbols, period=, interval=, start=) e retorna um dict
+    símbolo -> DataFrame, ou (dict, motivos) com motivos símbolo -> descrição da
+    falha; permite trocar o Yahoo por um substituto local.
+    Cada entrada do report traz `failed`, `error` (falha do lote inteiro) e `reasons`
+    (motivo por símbolo, quando o downloader informa).
+    `on_chunk` é chamado com cada entrada do report assim que o lote termina.
+    """
+    downloader = downloader or yf_download_chunk
+    symbols = list(dict.fromkeys(s for s in symbols if s))
+    chunks = chunked(symbols, chunk_size)
+
+    data = {}
+    report = []
+
+    def run_chunk(index, chunk):
+        started = time.perf_counter()
+        error = None
+        reasons = {}
+        try:
+            frames = downloader(chunk, period=period, interval=interval, start=start) or {}
+            if isinstance(frames, tuple):
+                frames, reasons = frames
+        except Exception as e:
+            frames = {}
+            error = str(e)
+        frames = {s: strip_timezone(df) for s, df in frames.items() if df is not None and not df.empty}
+        failed = [s for s in chunk if s not in frames]
+        entry = {
+            "chunk": index,
+            "symbols": len(chunk),
+            "seconds": round(time.perf_counter() - started, 4),
+            "failed": failed,
+            "error": error,
+            "reasons": {s: reasons[s] for s in failed if reasons and reasons.get(s)},
+        }
+        return frames, entry
+
+    if not chunks:
+        return data, report
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        futures = [executor.submit(run_chunk, i, chunk) for i, chunk in enumerate(chunks)]
+        for future in as_completed(futures):
+            frames, entry = future.result()
+            data.update(frames)
+            report.append(entry)
+            if on_chunk is not None:
+                on_chunk(entry)
+
+    report.sort(key=lambda e: e["chunk"])
+    return data, report
+
+
+def summarize_report(report):
+    """Resume o report de download: lotes, latência, falhas e motivo de cada uma"""
+    seconds = [e["seconds"] for e in report]
+    failed = [s for e in report for s in e["failed"]]
+    return {
+        "chunks": len(report),
+        "total_seconds": round(sum(seconds), 4),
+        "max_chunk_seconds": max(seconds) if seconds else 0.0,
+        "failed": failed,
+        "reasons": {s: failure_reason(e, s) for e in report for s in e["failed"]},
+    }
+
+
+def failure_reason(entry, symbol):
+    """Motivo da falha de um símbolo numa entrada do report"""
+    return entry.get("reasons", {}).get(symbol) or entry["error"] or "sem dados"
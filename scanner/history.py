@@ -0,0 +1,201 @@
+"""
+Histórico dos resultados: uma partição Parquet por data de pregão, só acrescentada.
+
+Layout em HISTORY_DIR:
+    <AAAA-MM-DD>.parquet   hits do dia (RESULT_COLUMNS)
+    .lock                  trava dos gravadores (leitura + junção + troca de uma partição)
+
+Datas passadas nunca são reescritas; um novo scan no mesmo dia substitui só as
+combinações/símbolos que ele cobriu (a barra do dia ainda estava em formação).
+As consultas (novos, saíram, continuam, sequência) leem o histórico indexado por
+(timeframe, setup, symbol, date) sem escanear o universo de novo.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from scanner.store import DATA_DIR, acquire_lock
+
+HISTORY_DIR = os.path.join(DATA_DIR, "history")
+LOCK = ".lock"
+KEY_COLUMNS = ["timeframe", "setup", "symbol"]
+HISTORY_COLUMNS = ["date", "timeframe", "setup", "symbol", "price", "valid"]
+DIFF_STATUSES = ("new", "dropped", "persisting")
+
+
+def session_date(now=None, timezone="America/New_York"):
+    """Data do pregão (no fuso da bolsa) a que um scan feito em `now` se refere"""
+    now = pd.Timestamp(now) if now is not None else pd.Timestamp.now(tz="UTC")
+    if now.tzinfo is None:
+        now = now.tz_localize("UTC")
+    return now.tz_convert(timezone).tz_localize(None).normalize()
+
+
+def _partition_path(root, date):
+    return os.path.join(root, f"{pd.Timestamp(date):%Y-%m-%d}.parquet")
+
+
+# =========================
+# GRAVAÇÃO
+# =========================
+def record_results(results, date=None, combos=None, symbols=None, root=HISTORY_DIR):
+    """
+    Acrescenta os hits de um scan à partição da data (padrão: pregão de hoje).
+
+    `combos`/`symbols` dizem o que o scan cobriu: na mesma data, só essas linhas são
+    substituídas (padrão: as combinações e símbolos presentes em `results`).
+    Gravadores concorrentes (sessões, agendador, CLI) esperam a trava em root/.lock,
+    então nenhum perde as linhas do outro. Retorna o número de linhas da partição.
+    """
+    os.makedirs(root, exist_ok=True)
+    date = pd.Timestamp(date).normalize() if date is not None else session_date()
+    path = _partition_path(root, date)
+    rows = results[HISTORY_COLUMNS[1:]].assign(date=date)[HISTORY_COLUMNS]
+    # Mesma unidade dos dois lados do concat (Timestamp vem em segundos, o Parquet volta em ms)
+    rows["date"] = rows["date"].astype("datetime64[ns]")
+    combos = set(map(tuple, combos)) if combos is not None else set(zip(results["timeframe"], results["setup"]))
+
+    lock = acquire_lock(os.path.join(root, LOCK))
+    try:
+        if os.path.exists(path):
+            stored = pd.read_parquet(path)
+            stored["date"] = stored["date"].astype("datetime64[ns]")
+            covered = pd.Series(list(zip(stored["timeframe"], stored["setup"])), index=stored.index).isin(combos)
+            if symbols is not None:
+                covered &= stored["symbol"].isin(symbols)
+            rows = pd.concat([stored[~covered], rows], ignore_index=True)
+
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        rows.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    finally:
+        lock.close()
+    return len(rows)
+
+
+# =========================
+# CONSULTA
+# =========================
+class ResultsHistory:
+    """
+    Histórico carregado e indexado por (timeframe, setup, symbol, date).
+
+    reload() só relê partições novas ou alteradas (por mtime), então pode ser chamado
+    a cada consulta. Sequências contam datas gravadas consecutivas, não dias corridos.
+    """
+
+    def __init__(self, root=HISTORY_DIR):
+        self.root = root
+        self._partitions = {}
+        self._lock = threading.Lock()
+        self.frame = pd.DataFrame(columns=HISTORY_COLUMNS)
+        self.dates = []
+        self._streaks = {}
+
+    def reload(self):
+        """Relê o que mudou em disco; retorna self"""
+        try:
+            names = sorted(name for name in os.listdir(self.root) if name.endswith(".parquet"))
+        except OSError:
+            names = []
+        with self._lock:
+            changed = set(self._partitions) - set(names)
+            for name in names:
+                mtime = os.stat(os.path.join(self.root, name)).st_mtime_ns
+                cached = self._partitions.get(name)
+                if cached is None or cached[0] != mtime:
+                    # A data vem do nome da partição (partições sem hits não têm linhas)
+                    frame = pd.read_parquet(os.path.join(self.root, name)).assign(date=pd.Timestamp(name[:-8]))
+                    self._partitions[name] = (mtime, frame)
+                    changed.add(name)
+            for name in set(self._partitions) - set(names):
+                del self._partitions[name]
+            if changed:
+                frames = [frame for _, frame in self._partitions.values() if not frame.empty]
+                frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=HISTORY_COLUMNS)
+                frame["date"] = pd.to_datetime(frame["date"]).astype("datetime64[ns]")
+                self.frame = frame.sort_values(KEY_COLUMNS + ["date"], kind="stable").set_index(KEY_COLUMNS + ["date"])
+                self.dates = [pd.Timestamp(name[:-8]) for name in sorted(self._partitions)]
+                self._streaks = {}
+        return self
+
+    def resolve_date(self, date):
+        """Data gravada mais recente até `date` (padrão: a última)"""
+        if not self.dates:
+            return None
+        if date is None:
+            return self.dates[-1]
+        position = np.searchsorted(np.array(self.dates, dtype="datetime64[ns]"), np.datetime64(pd.Timestamp(date)), side="right")
+        return self.dates[position - 1] if position else None
+
+    def day(self, date=None):
+        """Hits de uma data gravada (padrão: a última)"""
+        date = self.resolve_date(date)
+        if date is None:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        try:
+            return self.frame.xs(date, level="date").reset_index()
+        except KeyError:
+            return pd.DataFrame(columns=HISTORY_COLUMNS[1:])
+
+    def streaks(self, date=None):
+        """Sequência de cada hit de `date`: em quantas datas gravadas seguidas (até ela) ele aparece"""
+        date = self.resolve_date(date)
+        if date is None:
+            return pd.Series(dtype=np.int64)
+        if date in self._streaks:
+            return self._streaks[date]
+        position = self.dates.index(date)
+        rows = self.frame.index.to_frame(index=False)
+        rows["position"] = np.searchsorted(np.array(self.dates, dtype="datetime64[ns]"), rows["date"].to_numpy())
+        rows = rows[rows["position"] <= position]
+        # Ordenado por chave e data: em datas consecutivas, posição - ordem no grupo fica constante
+        rows["run"] = rows["position"] - rows.groupby(KEY_COLUMNS, sort=False).cumcount()
+        run_sizes = rows.groupby(KEY_COLUMNS + ["run"], sort=False).size()
+        last = rows.drop_duplicates(KEY_COLUMNS, keep="last")
+        last = last[last["position"] == position]
+        streak = run_sizes.reindex(pd.MultiIndex.from_frame(last[KEY_COLUMNS + ["run"]])).to_numpy()
+        streaks = pd.Series(streak, index=pd.MultiIndex.from_frame(last[KEY_COLUMNS]), name="streak", dtype=np.int64)
+        self._streaks[date] = streaks
+        return streaks
+
+    def diff(self, date=None, previous=None, combos=None, symbols=None):
+        """
+        Compara `date` com a data gravada anterior (ou `previous`).
+
+        Retorna timeframe, setup, symbol, status (new/dropped/persisting), price (de hoje
+        ou, para dropped, da data anterior), valid e streak (0 para dropped).
+        Combinações que não foram escaneadas em `date` apareceriam como dropped: use
+        `combos` para comparar só o que os dois scans cobriram.
+        """
+        date = self.resolve_date(date)
+        columns = KEY_COLUMNS + ["status", "price", "valid", "streak"]
+        if date is None:
+            return pd.DataFrame(columns=columns)
+        if previous is None:
+            position = self.dates.index(date)
+            previous = self.dates[position - 1] if position else None
+        else:
+            previous = self.resolve_date(previous)
+
+        today = self.day(date).set_index(KEY_COLUMNS)
+        before = self.day(previous).set_index(KEY_COLUMNS) if previous is not None else today.iloc[:0]
+        status = pd.Series("persisting", index=today.index.union(before.index, sort=False))
+        status[~status.index.isin(before.index)] = "new"
+        status[~status.index.isin(today.index)] = "dropped"
+
+        out = status.rename("status").to_frame()
+        prices = today[["price", "valid"]].combine_first(before[["price", "valid"]])
+        out = out.join(prices).join(self.streaks(date)).reset_index()
+        out["streak"] = out["streak"].fillna(0).astype(np.int64)
+
+        if combos is not None:
+            combos = set(map(tuple, combos))
+            out = out[[combo in combos for combo in zip(out["timeframe"], out["setup"])]]
+        if symbols is not None:
+            out = out[out["symbol"].isin(symbols)]
+        order = {name: i for i, name in enumerate(DIFF_STATUSES)}
+        out = out.sort_values(["status", "streak"], key=lambda col: col.map(order) if col.name == "status" else -col, kind="stable")
+        return out[columns].reset_index(drop=True)
@@ -0,0 +1,200 @@
+"""
+Modo intradiário/ao vivo: estado pequeno por símbolo e reavaliação O(1) a cada atualização.
+
+Cada símbolo guarda, por timeframe, só as últimas barras que os setups olham; a última
+é a barra em formação (dia, semana, mês ou trimestre corrente). Um tick ou barra
+intradiária atualiza a barra em formação de cada timeframe (ou abre uma nova quando o
+período vira) e reavalia os setups daquele símbolo, sem baixar nem reamostrar o histórico.
+As regras são as mesmas do registro em scanner.setups, compiladas para escalares (compile_scalar).
+
+Semântica igual à do scan em lote: a barra em formação faz o papel da última barra
+diária/semanal/mensal/trimestral do painel.
+"""
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from scanner.bars import TIMEFRAME_RULES, _period_codes, normalize_columns, resample_ohlc
+from scanner.compact import as_frame
+from scanner.core import MIN_DAILY_BARS, RESULT_COLUMNS, resolve_combos
+from scanner.setups import compile_scalar, setup_depth
+
+# Barra: [chave do período, open, high, low, close, volume]
+KEY, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+
+EPOCH_ORDINAL = pd.Timestamp("1970-01-01").toordinal()
+
+
+def period_keys(timestamp):
+    """
+    Código inteiro do período de cada regra (None = dia, "W", "M", "Q"), na mesma
+    convenção de _period_codes: semanas de segunda a domingo, meses desde 1970.
+    Timestamps com fuso usam a data local.
+    """
+    ts = pd.Timestamp(timestamp)
+    day = ts.toordinal() - EPOCH_ORDINAL
+    month = (ts.year - 1970) * 12 + ts.month - 1
+    return {None: day, "W": (day + 3) // 7, "M": month, "Q": month // 3}
+
+
+# =========================
+# MOTOR
+# =========================
+class LiveEngine:
+    """
+    Estado ao vivo do universo: por símbolo e timeframe, um deque com as últimas
+    barras que as regras olham (a última em formação) e a lista de hits sempre atualizada.
+
+    update()/tick() custam O(timeframes x setups) por chamada, independente do
+    tamanho do histórico e do universo.
+    """
+
+    def __init__(self, combos=None):
+        self.combos = list(combos) if combos is not None else resolve_combos()
+        self.timeframes = list(dict.fromkeys(tf for tf, _ in self.combos))
+        self.setups = {tf: [setup for t, setup in self.combos if t == tf] for tf in self.timeframes}
+        self.depth = {tf: setup_depth(self.setups[tf]) for tf in self.timeframes}
+        self.rules = {tf: compile_scalar(self.setups[tf], columns=(OPEN, HIGH, LOW, CLOSE)) for tf in self.timeframes}
+        self.state = {}
+        self.order = {}
+        self.found = {combo: {} for combo in self.combos}
+        self.stats = {"updates": 0, "stale": 0, "changes": 0}
+
+    def _symbol_state(self, symbol):
+        state = self.state.get(symbol)
+        if state is None:
+            state = self.state[symbol] = {tf: deque(maxlen=self.depth[tf]) for tf in self.timeframes}
+            self.order[symbol] = len(self.order)
+        return state
+
+    def seed(self, symbol, daily):
+        """
+        Inicializa o símbolo a partir do histórico diário (DataFrame ou CompactOHLCV).
+
+        Única etapa que reamostra; depois disso só update()/tick() mexem no estado.
+        """
+        df = as_frame(daily)
+        if df is None or len(df) < MIN_DAILY_BARS:
+            return []
+        df = normalize_columns(df)
+        state = self._symbol_state(symbol)
+        for timeframe in self.timeframes:
+            rule = TIMEFRAME_RULES[timeframe]
+            depth = self.depth[timeframe]
+            bars = (df if rule is None else resample_ohlc(df, rule)).iloc[-depth:]
+            if rule is None:
+                keys = bars.index.values.astype("datetime64[D]").astype(np.int64)
+            else:
+                keys, _ = _period_codes(bars.index, rule)
+            volume = bars["volume"].to_numpy(dtype=np.float64) if "volume" in bars.columns else np.zeros(len(bars))
+            rows = zip(keys.tolist(), *(bars[col].to_numpy(dtype=np.float64).tolist() for col in ("open", "high", "low", "close")), volume.tolist())
+            state[timeframe].clear()
+            state[timeframe].extend(list(row) for row in rows)
+        return self._evaluate(symbol, state, self.timeframes)
+
+    def seed_universe(self, data):
+        """seed() de um dict símbolo -> histórico diário"""
+        for symbol, daily in data.items():
+            self.seed(symbol, daily)
+
+    def update(self, symbol, timestamp, open_p, high_p, low_p, close_p, volume=0.0):
+        """
+        Aplica uma barra intradiária (ou tick) e reavalia o símbolo.
+
+        Atualizações de um período anterior à barra em formação são ignoradas (contadas em
+        stats["stale"]). Retorna as mudanças de hits: dicts timeframe/setup/symbol/change ("new"/"gone").
+        """
+        self.stats["updates"] += 1
+        state = self._symbol_state(symbol)
+        keys = period_keys(timestamp)
+        touched = []
+        for timeframe in self.timeframes:
+            bars = state[timeframe]
+            key = keys[TIMEFRAME_RULES[timeframe]]
+            if bars and key == bars[-1][KEY]:
+                bar = bars[-1]
+                if bar[HIGH] != bar[HIGH] or high_p > bar[HIGH]:
+                    bar[HIGH] = high_p
+                if bar[LOW] != bar[LOW] or low_p < bar[LOW]:
+                    bar[LOW] = low_p
+                bar[CLOSE] = close_p
+                bar[VOLUME] += volume
+            elif not bars or key > bars[-1][KEY]:
+                bars.append([key, open_p, high_p, low_p, close_p, volume])
+            else:
+                self.stats["stale"] += 1
+                continue
+            touched.append(timeframe)
+        return self._evaluate(symbol, state, touched)
+
+    def tick(self, symbol, timestamp, price, volume=0.0):
+        """Negócio isolado: uma barra com open = high = low = close = price"""
+        return self.update(symbol, timestamp, price, price, price, price, volume)
+
+    def _evaluate(self, symbol, state, timeframes):
+        changes = []
+        for timeframe in timeframes:
+            # Uma chamada avalia todos os setups do timeframe
+            evaluated = self.rules[timeframe](state[timeframe])
+            for setup, (hit, price, adjusted) in zip(self.setups[timeframe], evaluated):
+                found = self.found[(timeframe, setup)]
+                if hit:
+                    if symbol not in found:
+                        changes.append({"timeframe": timeframe, "setup": setup, "symbol": symbol, "change": "new"})
+                    found[symbol] = (price, "Adjusted" if adjusted else "OK")
+                elif found.pop(symbol, None) is not None:
+                    changes.append({"timeframe": timeframe, "setup": setup, "symbol": symbol, "change": "gone"})
+        self.stats["changes"] += len(changes)
+        return changes
+
+    def hits(self):
+        """Hits atuais no formato de scan_universe (por combinação, depois na ordem dos símbolos)"""
+        rows = []
+        for timeframe, setup in self.combos:
+            found = self.found[(timeframe, setup)]
+            for symbol in sorted(found, key=self.order.__getitem__):
+                price, valid = found[symbol]
+                rows.append((timeframe, setup, symbol, price, valid))
+        return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+# =========================
+# FEED DE REPLAY
+# =========================
+REPLAY_COLUMNS = ["symbol", "timestamp"]
+
+
+def read_replay(path):
+    """
+    Lê um arquivo de replay (.csv ou .parquet) ordenado por timestamp.
+
+    Colunas: symbol, timestamp e open/high/low/close (barras) ou price (ticks); volume opcional.
+    """
+    df = pd.read_parquet(path) if str(path).endswith(".parquet") else pd.read_csv(path)
+    df.columns = df.columns.str.strip().str.lower()
+    missing = [col for col in REPLAY_COLUMNS if col not in df.columns]
+    if missing or not ({"open", "high", "low", "close"} <= set(df.columns) or "price" in df.columns):
+        raise ValueError(f"Arquivo de replay sem as colunas necessárias: {missing or 'open/high/low/close ou price'}")
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+
+def iter_replay(df):
+    """Gera (symbol, timestamp, open, high, low, close, volume) de cada linha do replay"""
+    if "open" in df.columns:
+        prices = [df[col].to_numpy(dtype=np.float64) for col in ("open", "high", "low", "close")]
+    else:
+        price = df["price"].to_numpy(dtype=np.float64)
+        prices = [price] * 4
+    volume = df["volume"].to_numpy(dtype=np.float64) if "volume" in df.columns else np.zeros(len(df))
+    yield from zip(df["symbol"].tolist(), df["timestamp"].tolist(), *(p.tolist() for p in prices), volume.tolist())
+
+
+def replay(engine, df, on_change=None):
+    """Alimenta o motor com o replay inteiro; on_change recebe cada mudança de hit"""
+    for symbol, timestamp, open_p, high_p, low_p, close_p, volume in iter_replay(df):
+        for change in engine.update(symbol, timestamp, open_p, high_p, low_p, close_p, volume):
+            if on_change is not None:
+                on_change(dict(change, timestamp=timestamp))
+    return engine.hits()
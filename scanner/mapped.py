@@ -0,0 +1,232 @@
+"""
+Painel OHLCV mapeado em memória: um único arquivo por campo (símbolos x datas x campos),
+escrito por um processo e mapeado sem cópia por todos os workers do host.
+
+Layout em PANEL_DIR:
+    <versão>/meta.json      símbolos, formato, criado em
+    <versão>/dates.npy      calendário comum (datetime64[ns], datas)
+    <versão>/prices.npy     float32 (símbolos x datas x 4: open/high/low/close), NaN sem barra
+    <versão>/volume.npy     int64 (símbolos x datas)
+    <versão>/present.npy    bool (símbolos x datas): o símbolo tem barra na data
+    CURRENT                 versão atual (trocado de forma atômica depois da pasta completa)
+
+Os arquivos são lidos com np.load(mmap_mode="r"): as páginas ficam no page cache do
+sistema e são compartilhadas entre processos, então a memória cresce com uma cópia
+por host e não uma por processo. Versões antigas removidas continuam válidas para
+quem já as mapeou (o arquivo só some quando o último mapeamento é fechado).
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from scanner.compact import CompactOHLCV, compact_universe
+from scanner.store import DATA_DIR, OHLCV_DIR, acquire_lock, load_universe, new_version
+
+PANEL_DIR = os.path.join(DATA_DIR, "panel")
+CURRENT = "CURRENT"
+LOCK = ".lock"
+KEEP_VERSIONS = 3
+ARRAYS = ("dates", "prices", "volume", "present")
+
+
+# =========================
+# ESCRITA (um único escritor)
+# =========================
+def _acquire_writer(root):
+    """Trava exclusiva sem espera em root/.lock; None se outro processo já estiver escrevendo"""
+    return acquire_lock(os.path.join(root, LOCK), blocking=False)
+
+
+def pack_panel(data):
+    """
+    Alinha um dict símbolo -> DataFrame/CompactOHLCV no calendário comum.
+
+    Retorna (symbols, arrays) com os arrays de ARRAYS.
+    """
+    data = compact_universe(data)
+    symbols = list(data)
+    if symbols:
+        dates = np.unique(np.concatenate([np.unique(data[s].dates) for s in symbols]))
+    else:
+        dates = np.array([], dtype="datetime64[ns]")
+    prices = np.full((len(symbols), len(dates), 4), np.nan, dtype=np.float32)
+    volume = np.zeros((len(symbols), len(dates)), dtype=np.int64)
+    present = np.zeros((len(symbols), len(dates)), dtype=bool)
+    for i, symbol in enumerate(symbols):
+        compact = data[symbol]
+        # Datas repetidas: fica a última barra (mesma regra de append_bars)
+        positions = np.searchsorted(dates, compact.dates)
+        prices[i, positions] = compact.prices
+        volume[i, positions] = compact.volume
+        present[i, positions] = True
+    return symbols, {"dates": dates, "prices": prices, "volume": volume, "present": present}
+
+
+def write_panel(data, root=PANEL_DIR, keep=KEEP_VERSIONS):
+    """
+    Grava uma nova versão do painel e aponta CURRENT para ela.
+
+    Só um escritor por vez (trava em root/.lock): se outro processo já estiver
+    escrevendo, não faz nada e retorna None. Retorna os metadados gravados.
+    """
+    os.makedirs(root, exist_ok=True)
+    lock = _acquire_writer(root)
+    if lock is None:
+        return None
+    try:
+        symbols, arrays = pack_panel(data)
+        version = new_version()
+        tmp_dir = os.path.join(root, f"{version}.tmp-{os.getpid()}")
+        os.makedirs(tmp_dir)
+        for name in ARRAYS:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), arrays[name])
+        meta = {
+            "version": version,
+            "created_at": time.time(),
+            "symbols": symbols,
+            "shape": list(arrays["prices"].shape),
+            "bytes": int(sum(array.nbytes for array in arrays.values())),
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_dir, os.path.join(root, version))
+
+        tmp_current = os.path.join(root, f"{CURRENT}.tmp-{os.getpid()}")
+        with open(tmp_current, "w") as f:
+            f.write(version)
+        os.replace(tmp_current, os.path.join(root, CURRENT))
+        prune_panels(root, keep)
+        return meta
+    finally:
+        lock.close()
+
+
+def prune_panels(root=PANEL_DIR, keep=KEEP_VERSIONS):
+    """Mantém só as `keep` versões mais recentes (a apontada por CURRENT nunca é removida)"""
+    current = current_version(root)
+    versions = sorted(
+        name for name in os.listdir(root)
+        if os.path.isdir(os.path.join(root, name)) and ".tmp-" not in name
+    )
+    for version in versions[:-keep] if keep else []:
+        if version != current:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+
+
+def publish_panel(symbols, data_dir=OHLCV_DIR, root=PANEL_DIR, data=None, keep=KEEP_VERSIONS):
+    """Publica o painel a partir do armazenamento local (ou de `data` já carregado)"""
+    if data is None:
+        data = load_universe(symbols, data_dir)
+    else:
+        data = {symbol: data[symbol] for symbol in symbols if data.get(symbol) is not None}
+    return write_panel(data, root, keep)
+
+
+# =========================
+# LEITURA (zero-copy)
+# =========================
+def current_version(root=PANEL_DIR):
+    """Versão apontada por CURRENT (None se ainda não houver painel)"""
+    try:
+        with open(os.path.join(root, CURRENT)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+class MappedPanel:
+    """
+    Uma versão do painel mapeada em memória.
+
+    get()/universe() devolvem CompactOHLCV cujos arrays são fatias do mapeamento
+    (sem cópia) para símbolos com barras em todas as datas do seu intervalo.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.version = self.meta["version"]
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+        self.symbols = self.meta["symbols"]
+        self.positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+        # Intervalo [start, stop) de cada símbolo e se ele é denso (sem buracos no calendário)
+        present = np.asarray(self.present)
+        has_bars = present.any(axis=1)
+        self.start = np.where(has_bars, present.argmax(axis=1), 0)
+        self.stop = np.where(has_bars, present.shape[1] - present[:, ::-1].argmax(axis=1), 0)
+        self.dense = present.sum(axis=1) == self.stop - self.start
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.positions
+
+    @property
+    def created_at(self):
+        return self.meta["created_at"]
+
+    def age(self, now=None):
+        """Idade da versão em segundos"""
+        return (now if now is not None else time.time()) - self.created_at
+
+    def get(self, symbol):
+        """CompactOHLCV do símbolo (None se não estiver no painel)"""
+        i = self.positions.get(symbol)
+        if i is None or self.stop[i] == self.start[i]:
+            return None
+        if self.dense[i]:
+            window = slice(self.start[i], self.stop[i])
+            return CompactOHLCV(self.dates[window], self.prices[i, window], self.volume[i, window])
+        # Calendário com buracos: única situação em que as barras são copiadas
+        mask = np.asarray(self.present[i])
+        return CompactOHLCV(self.dates[mask], np.ascontiguousarray(self.prices[i][mask]), self.volume[i][mask])
+
+    def universe(self, symbols=None):
+        """dict símbolo -> CompactOHLCV dos símbolos pedidos que estão no painel"""
+        data = {}
+        for symbol in self.symbols if symbols is None else symbols:
+            compact = self.get(symbol)
+            if compact is not None:
+                data[symbol] = compact
+        return data
+
+
+def open_panel(version=None, root=PANEL_DIR):
+    """Mapeia uma versão (padrão: CURRENT); None se não existir"""
+    version = version or current_version(root)
+    if version is None:
+        return None
+    try:
+        return MappedPanel(os.path.join(root, version))
+    except (OSError, ValueError):
+        return None
+
+
+class PanelReader:
+    """
+    Leitor compartilhado por sessões/threads de um processo: current() devolve o painel
+    mapeado e troca para a versão nova assim que CURRENT muda. Quem ainda segura a
+    versão anterior continua lendo dela até soltar a referência.
+    """
+
+    def __init__(self, root=PANEL_DIR):
+        self.root = root
+        self._panel = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        version = current_version(self.root)
+        with self._lock:
+            if version is not None and (self._panel is None or self._panel.version != version):
+                panel = open_panel(version, self.root)
+                if panel is not None:
+                    self._panel = panel
+            return self._panel
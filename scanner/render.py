@@ -0,0 +1,85 @@
+"""
+Montagem do HTML da tabela de resultados (estilo Gerenciador), sem dependência do Streamlit.
+
+O HTML é montado por coluna (operações de string vetorizadas) e só para a página visível;
+ordenação e filtros operam no DataFrame, então o custo de renderizar não cresce com o
+número total de resultados.
+"""
+import html
+import math
+
+import numpy as np
+import pandas as pd
+
+ROW_COLORS = ("#15191f", "#1b1f24")
+HIGHLIGHT_COLUMNS = {"setup": "#ffcc00"}
+DEFAULT_COLOR = "#eee"
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def format_column(values, column):
+    """Texto exibido de uma coluna (preço com $ e 2 casas, vazios para NaN)"""
+    if column == "price" and pd.api.types.is_numeric_dtype(values):
+        text = values.map("${:.2f}".format)
+    else:
+        text = values.astype(str)
+    return text.where(values.notna(), "")
+
+
+def results_table_html(df, start=0):
+    """
+    Monta a tabela de resultados em HTML.
+
+    `start` é a posição da primeira linha no resultado completo (mantém a listra
+    correta entre páginas); a cor alterna pela posição, não pelo índice do DataFrame.
+    """
+    header = "<tr>" + "".join(f"<th>{html.escape(str(col))}</th>" for col in df.columns) + "</tr>"
+    if df.empty:
+        return f"<table style='width:100%; border-collapse: collapse;'>{header}</table>"
+
+    stripes = np.where(np.arange(start, start + len(df)) % 2 == 0, ROW_COLORS[0], ROW_COLORS[1])
+    rows = "<tr style='background-color:" + pd.Series(stripes, index=df.index, dtype=object) + ";'>"
+    for col in df.columns:
+        color = HIGHLIGHT_COLUMNS.get(col, DEFAULT_COLOR)
+        cells = format_column(df[col], col).map(html.escape)
+        rows = rows + f"<td style='color:{color};'>" + cells + "</td>"
+    rows = rows + "</tr>"
+
+    return "<table style='width:100%; border-collapse: collapse;'>" + header + "".join(rows.tolist()) + "</table>"
+
+
+def filter_results(df, filters=None):
+    """Filtra por coluna: texto contido (sem diferenciar maiúsculas), vazio não filtra"""
+    mask = np.ones(len(df), dtype=bool)
+    for column, query in (filters or {}).items():
+        if not query or column not in df.columns:
+            continue
+        text = format_column(df[column], column)
+        mask &= text.str.contains(str(query), case=False, regex=False).to_numpy()
+    return df[mask]
+
+
+def sort_results(df, sort_by=None, ascending=True):
+    """Ordena por uma coluna (NaN sempre no fim), estável para manter a ordem original nos empates"""
+    if not sort_by or sort_by not in df.columns:
+        return df
+    return df.sort_values(sort_by, ascending=ascending, kind="stable", na_position="last")
+
+
+def paginate(df, page=1, page_size=50):
+    """Recorta a página pedida. Retorna (página, posição inicial, total de páginas)"""
+    pages = max(1, math.ceil(len(df) / page_size))
+    page = min(max(1, int(page)), pages)
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size], start, pages
+
+
+def render_page(df, sort_by=None, ascending=True, filters=None, page=1, page_size=50):
+    """
+    Filtra, ordena e monta só a página pedida.
+
+    Retorna (html, total de linhas após filtros, total de páginas).
+    """
+    view = sort_results(filter_results(df, filters), sort_by, ascending)
+    page_df, start, pages = paginate(view, page, page_size)
+    return results_table_html(page_df, start=start), len(view), pages
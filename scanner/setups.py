@@ -0,0 +1,348 @@
+"""
+Registro de setups declarados como regras sobre deslocamentos de barra.
+
+Uma regra é uma árvore de tuplas montada com os termos abaixo; 0 é a barra atual,
+1 a anterior e assim por diante. `fixed=True` usa a máxima/mínima corrigidas por fix_candle.
+No registro, a árvore é compilada em nós numerados e avaliada de duas formas:
+
+- PanelEvaluator: arrays símbolos x barras do painel (todo o universo de uma vez); cada nó
+  calculado fica guardado, então termos repetidos entre setups (ex.: "atual dentro da
+  anterior", fix_candle da barra atual) são avaliados uma vez só quando rodam juntos
+- compile_scalar: código Python gerado para as últimas barras de um símbolo (modo ao vivo),
+  com campos e fix_candle de cada barra calculados uma vez para todas as regras
+
+Novo setup = uma chamada a register_setup; o seletor da UI, o scan, o backtest e o modo
+ao vivo passam a enxergá-lo sem mais nada.
+"""
+import math
+import operator
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from scanner.bars import TIMEFRAME_RULES
+from scanner.detectors import fix_candle
+from scanner.engine import fix_candles, shift
+
+TIMEFRAMES = list(TIMEFRAME_RULES)
+
+
+# =========================
+# TERMOS
+# =========================
+def field(name, offset=0, fixed=False):
+    """Campo OHLC de uma barra; `fixed` só muda high/low (open/close não são corrigidos)"""
+    return ("field", name, int(offset), bool(fixed) and name in ("high", "low"))
+
+
+def high(offset=0, fixed=False):
+    return field("high", offset, fixed)
+
+
+def low(offset=0, fixed=False):
+    return field("low", offset, fixed)
+
+
+def open_(offset=0):
+    return field("open", offset)
+
+
+def close(offset=0):
+    return field("close", offset)
+
+
+def lt(a, b):
+    return ("lt", a, b)
+
+
+def gt(a, b):
+    return ("gt", a, b)
+
+
+def all_of(*terms):
+    """E lógico; padrões aninhados continuam sendo um nó, então são avaliados uma vez entre regras"""
+    return ("and",) + tuple(terms)
+
+
+def any_of(*terms):
+    return ("or",) + tuple(terms)
+
+
+# =========================
+# PADRÕES (vocabulário "The Strat")
+# =========================
+def inside(bar=0, of=1, fixed=True, fixed_of=False):
+    """Barra `bar` dentro da barra `of`: máxima menor e mínima maior"""
+    return all_of(lt(high(bar, fixed), high(of, fixed_of)), gt(low(bar, fixed), low(of, fixed_of)))
+
+
+def outside(bar=0, of=1, fixed=True, fixed_of=False):
+    """Barra `bar` engole a barra `of`: máxima maior e mínima menor"""
+    return all_of(gt(high(bar, fixed), high(of, fixed_of)), lt(low(bar, fixed), low(of, fixed_of)))
+
+
+def two_up(bar=0, of=1, fixed=True, fixed_of=False):
+    """2Up: rompe a máxima de `of` sem perder a mínima"""
+    return all_of(gt(high(bar, fixed), high(of, fixed_of)), gt(low(bar, fixed), low(of, fixed_of)))
+
+
+def two_down(bar=0, of=1, fixed=True, fixed_of=False):
+    """2Down: rompe a mínima de `of` sem passar da máxima"""
+    return all_of(lt(low(bar, fixed), low(of, fixed_of)), lt(high(bar, fixed), high(of, fixed_of)))
+
+
+def green(bar=0):
+    return gt(close(bar), open_(bar))
+
+
+def red(bar=0):
+    return lt(close(bar), open_(bar))
+
+
+def _walk(node):
+    yield node
+    if node[0] in ("lt", "gt", "and", "or"):
+        for child in node[1:]:
+            yield from _walk(child)
+
+
+def rule_offsets(rule):
+    """(maior deslocamento usado, deslocamentos com campos corrigidos)"""
+    fields = [node for node in _walk(rule) if node[0] == "field"]
+    return max(node[2] for node in fields), sorted({node[2] for node in fields if node[3]})
+
+
+# =========================
+# COMPILAÇÃO E AVALIAÇÃO
+# =========================
+# Cada nó distinto vira um id inteiro uma única vez; a avaliação só trabalha com ids
+# (hash de int em vez de tuplas aninhadas) e nós iguais em regras diferentes têm o mesmo id
+_NODE_IDS = {}
+_NODES = []
+
+
+def compile_rule(node):
+    """Id inteiro do nó (e dos filhos), compartilhado entre todas as regras registradas"""
+    node_id = _NODE_IDS.get(node)
+    if node_id is None:
+        kind = node[0]
+        args = tuple(compile_rule(child) for child in node[1:]) if kind in ("lt", "gt", "and", "or") else node[1:]
+        node_id = _NODE_IDS[node] = len(_NODES)
+        _NODES.append((kind, args))
+    return node_id
+
+
+class PanelEvaluator:
+    """
+    Avaliação vetorizada sobre o painel de build_panel (arrays símbolos x barras).
+
+    Cada nó calculado fica guardado pelo id, então vale compartilhar um avaliador
+    entre todos os setups do mesmo painel (evaluate_setups).
+    """
+
+    def __init__(self, panel):
+        self.panel = panel
+        self.cache = {}
+        self._fixed = None
+
+    def fixed(self):
+        """fix_candles da barra em todas as posições (high, low, adjusted), calculado uma vez"""
+        if self._fixed is None:
+            p = self.panel
+            self._fixed = fix_candles(p["open"], p["high"], p["low"], p["close"])
+        return self._fixed
+
+    def field(self, name, offset, fixed):
+        if fixed:
+            high_fixed, low_fixed, _ = self.fixed()
+            base = high_fixed if name == "high" else low_fixed
+        else:
+            base = self.panel[name]
+        return shift(base, offset) if offset else base
+
+    def value(self, node_id):
+        result = self.cache.get(node_id)
+        if result is not None:
+            return result
+        kind, args = _NODES[node_id]
+        if kind == "field":
+            result = self.field(*args)
+        elif kind == "adjusted":
+            adjusted = self.fixed()[2]
+            result = shift(adjusted, args[0]) if args[0] else adjusted
+        elif kind == "lt":
+            result = self.value(args[0]) < self.value(args[1])
+        elif kind == "gt":
+            result = self.value(args[0]) > self.value(args[1])
+        elif kind == "and":
+            result = reduce(operator.and_, (self.value(arg) for arg in args))
+        elif kind == "or":
+            result = reduce(operator.or_, (self.value(arg) for arg in args))
+        else:
+            raise ValueError(f"Termo desconhecido: {kind}")
+        self.cache[node_id] = result
+        return result
+
+    def evaluate(self, setup):
+        """(máscara, preço, ajustado) do setup em todas as barras"""
+        mask = self.value(setup.rule_id)
+        price = self.value(setup.price_id)
+        if setup.decimals is not None:
+            price = np.round(price, setup.decimals)
+        adjusted = np.zeros(mask.shape, dtype=bool)
+        for node_id in setup.adjusted_ids:
+            adjusted = adjusted | self.value(node_id)
+        return mask, price, adjusted
+
+
+def _source(node):
+    """Expressão Python escalar de um nó (variáveis o0, h1, fh0... definidas em compile_scalar)"""
+    kind, args = node[0], node[1:]
+    if kind == "field":
+        name, offset, fixed = args
+        return f"{'f' if fixed else ''}{name[0]}{offset}"
+    if kind in ("lt", "gt"):
+        return f"({_source(args[0])} {'<' if kind == 'lt' else '>'} {_source(args[1])})"
+    joiner = " and " if kind == "and" else " or "
+    return "(" + joiner.join(_source(arg) for arg in args) + ")"
+
+
+_SCALAR_CACHE = {}
+
+
+def compile_scalar(names, columns=(0, 1, 2, 3)):
+    """
+    Compila vários setups em uma função escalar bars -> [(achou, preço, ajustado), ...].
+
+    Para uma única barra por vez o custo é dominado pelo interpretador, não pelas contas:
+    em vez de percorrer a árvore, gera o código das regras. Os campos de cada barra e o
+    fix_candle de cada deslocamento saem uma vez no início e valem para todas as regras;
+    `columns` são as posições de open/high/low/close em cada barra. Barras que faltam
+    viram NaN (comparações falsas, como as posições vazias do painel).
+    """
+    key = (tuple(names), tuple(columns))
+    if key in _SCALAR_CACHE:
+        return _SCALAR_CACHE[key]
+
+    setups = [get_setup(name) for name in names]
+    depth = max(setup.depth for setup in setups)
+    o, h, l, c = columns
+    lines = ["def evaluate(bars):", "    n = len(bars)"]
+    for k in range(depth):
+        lines += [
+            f"    if n > {k}:",
+            f"        bar = bars[{-1 - k}]",
+            f"        o{k}, h{k}, l{k}, c{k} = bar[{o}], bar[{h}], bar[{l}], bar[{c}]",
+            "    else:",
+            f"        o{k} = h{k} = l{k} = c{k} = nan",
+        ]
+    for k in sorted({k for setup in setups for k in setup.fixed_offsets}):
+        lines += [
+            f"    _, fh{k}, fl{k}, _, flag = fix_candle(o{k}, h{k}, l{k}, c{k})",
+            f"    adj{k} = flag == 'Adjusted'",
+        ]
+    results = []
+    for setup in setups:
+        price = f"round(c0, {setup.decimals})" if setup.decimals is not None else "c0"
+        adjusted = " or ".join(f"adj{k}" for k in setup.fixed_offsets) or "False"
+        results.append(f"(bool{_source(setup.rule)}, {price}, {adjusted})")
+    lines.append("    return [" + ", ".join(results) + "]")
+
+    namespace = {"fix_candle": fix_candle, "nan": math.nan}
+    exec("\n".join(lines), namespace)
+    _SCALAR_CACHE[key] = namespace["evaluate"]
+    return namespace["evaluate"]
+
+
+# =========================
+# REGISTRO
+# =========================
+class Setup:
+    """Setup registrado: regra, timeframes em que aparece e casas decimais do preço (None = sem arredondar)"""
+
+    __slots__ = ("name", "rule", "timeframes", "decimals", "depth", "fixed_offsets", "rule_id", "price_id", "adjusted_ids")
+
+    def __init__(self, name, rule, timeframes=None, decimals=None):
+        self.name = name
+        self.rule = rule
+        self.timeframes = list(timeframes) if timeframes is not None else list(TIMEFRAMES)
+        self.decimals = decimals
+        max_offset, self.fixed_offsets = rule_offsets(rule)
+        self.depth = max_offset + 1
+        self.rule_id = compile_rule(rule)
+        self.price_id = compile_rule(close(0))
+        # "Adjusted" quando alguma barra cuja máxima/mínima corrigida entra na regra foi corrigida
+        self.adjusted_ids = [compile_rule(("adjusted", offset)) for offset in self.fixed_offsets]
+
+
+SETUP_REGISTRY = {}
+
+
+def register_setup(name, rule, timeframes=None, decimals=None):
+    """Registra (ou substitui) um setup; a ordem de registro é a ordem no seletor da UI"""
+    unknown = [tf for tf in timeframes or [] if tf not in TIMEFRAMES]
+    if unknown:
+        raise ValueError(f"Timeframes desconhecidos: {unknown}")
+    SETUP_REGISTRY[name] = Setup(name, rule, timeframes, decimals)
+    return SETUP_REGISTRY[name]
+
+
+def get_setup(name):
+    try:
+        return SETUP_REGISTRY[name]
+    except KeyError:
+        raise ValueError(f"Setup desconhecido: {name}") from None
+
+
+def setups_for(timeframe):
+    """Setups disponíveis em um timeframe, na ordem de registro"""
+    return [name for name, setup in SETUP_REGISTRY.items() if timeframe in setup.timeframes]
+
+
+def setups_by_timeframe():
+    """timeframe -> setups disponíveis (base do seletor da UI e de resolve_combos)"""
+    return {timeframe: setups_for(timeframe) for timeframe in TIMEFRAMES}
+
+
+def setup_depth(names):
+    """Barras necessárias para avaliar todos os setups da lista"""
+    return max(get_setup(name).depth for name in names)
+
+
+def evaluate_setups(panel, names):
+    """Avalia vários setups no mesmo painel compartilhando subexpressões: nome -> (máscara, preço, ajustado)"""
+    evaluator = PanelEvaluator(panel)
+    return {name: evaluator.evaluate(get_setup(name)) for name in names}
+
+
+def scan_last_bar(panel, setup, evaluated=None):
+    """
+    Avalia um setup na última barra de todos os símbolos.
+
+    Retorna um DataFrame (uma linha por símbolo) com as colunas found, price e valid.
+    `evaluated` reaproveita o resultado de evaluate_setups.
+    """
+    mask, price, adjusted = evaluated if evaluated is not None else evaluate_setups(panel, [setup])[setup]
+    return pd.DataFrame({
+        "symbol": panel["symbols"],
+        "found": mask[:, -1],
+        "price": price[:, -1],
+        "valid": np.where(adjusted[:, -1], "Adjusted", "OK"),
+    })
+
+
+# =========================
+# SETUPS PADRÃO
+# =========================
+# Os originais mantêm exatamente as barras corrigidas de antes: a atual sempre corrigida,
+# a anterior corrigida só no Double Inside Bar, e a de referência mais antiga sempre crua.
+register_setup("Inside Bar", inside(0, 1))
+register_setup("Double Inside Bar", all_of(inside(0, 1, fixed_of=True), inside(1, 2)), ["Daily", "Weekly"])
+register_setup("2Down Green Monthly", all_of(two_down(0, 1), green(0)), ["Monthly"], decimals=2)
+register_setup("2Down Green 3M", all_of(two_down(0, 1), green(0)), ["Quarterly"], decimals=2)
+register_setup("Outside Bar", outside(0, 1))
+register_setup("2Up Green", all_of(two_up(0, 1), green(0)))
+register_setup("2Up Red", all_of(two_up(0, 1), red(0)))
+register_setup("2Down Green", all_of(two_down(0, 1), green(0)), ["Daily", "Weekly"])
+register_setup("2Down Red", all_of(two_down(0, 1), red(0)))
@@ -0,0 +1,196 @@
+"""
+Exportação para Google Sheets em lote: cada aba é escrita com poucas chamadas
+values_batch_update (intervalos inteiros, não célula a célula), divididas por número
+de células e com retry/backoff nos erros de cota (429) e do servidor.
+
+Chamadas por exportação: 1 (lista as abas) + 1 por aba nova + 1 (redimensiona as
+existentes) + ceil(células / max_cells). O gspread só é importado ao abrir a planilha;
+qualquer objeto com a mesma interface mínima (worksheets, add_worksheet, batch_update,
+values_batch_update) serve no lugar dele.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from scanner.aio_fetch import RETRY_STATUS, backoff_delay
+
+MAX_CELLS_PER_REQUEST = 40000
+SHEET_TITLES = {"results": "Resultados", "diagnostics": "Diagnóstico", "history": "Histórico"}
+
+
+# =========================
+# CONVERSÃO
+# =========================
+def _cell(value):
+    """Valor aceito pela API: sem NaN/NaT e sem tipos do numpy/pandas"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+def frame_to_values(df):
+    """DataFrame -> lista de linhas (cabeçalho + dados) pronta para a API"""
+    rows = [[str(col) for col in df.columns]]
+    rows.extend([_cell(value) for value in row] for row in df.itertuples(index=False, name=None))
+    return rows
+
+
+def diagnostics_frame(diagnostics):
+    """Telemetria (Telemetry.to_dict) em formato longo: seção, nome, métrica, valor"""
+    rows = []
+    for name, stage in diagnostics.get("stages", {}).items():
+        rows.extend(("stage", name, metric, stage[metric]) for metric in ("seconds", "count"))
+    for name, cache in diagnostics.get("caches", {}).items():
+        rows.extend(("cache", name, metric, value) for metric, value in cache.items())
+    for stage, items in diagnostics.get("slowest", {}).items():
+        rows.extend(("slowest", stage, item["symbol"], item["seconds"]) for item in items)
+    errors = diagnostics.get("errors", {})
+    rows.extend(("errors", stage, "count", count) for stage, count in errors.get("by_stage", {}).items())
+    return pd.DataFrame(rows, columns=["section", "name", "metric", "value"])
+
+
+def _a1(title, row):
+    """Início do intervalo de uma aba em notação A1 (aspas simples escapadas)"""
+    escaped = title.replace("'", "''")
+    return f"'{escaped}'!A{row}"
+
+
+# =========================
+# PLANILHA
+# =========================
+def open_spreadsheet(spreadsheet, credentials=None, client=None):
+    """
+    Abre a planilha por URL ou chave.
+
+    Sem `client`, autentica com a conta de serviço em `credentials` (padrão:
+    SCANNER_SHEETS_CREDENTIALS ou GOOGLE_APPLICATION_CREDENTIALS).
+    """
+    if client is None:
+        import gspread
+
+        credentials = credentials or os.environ.get("SCANNER_SHEETS_CREDENTIALS") or os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+        client = gspread.service_account(filename=credentials) if credentials else gspread.service_account()
+    if str(spreadsheet).startswith("http"):
+        return client.open_by_url(spreadsheet)
+    return client.open_by_key(spreadsheet)
+
+
+def _error_status(error):
+    """Status HTTP de um erro do gspread/requests (None se não houver)"""
+    status = getattr(error, "code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class SheetsExporter:
+    """
+    Escreve DataFrames em abas de uma planilha (gspread.Spreadsheet).
+
+    Erros com status em RETRY_STATUS e falhas de rede (OSError) são tentados de novo
+    com backoff exponencial; os demais sobem na hora.
+    """
+
+    def __init__(self, spreadsheet, max_cells=MAX_CELLS_PER_REQUEST, retries=5, backoff=1.0,
+                 max_backoff=64.0, sleep=time.sleep):
+        self.spreadsheet = spreadsheet
+        self.max_cells = max_cells
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.stats = {"calls": 0, "retries": 0, "cells": 0}
+
+    def _call(self, method, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            self.stats["calls"] += 1
+            try:
+                return method(*args, **kwargs)
+            except Exception as e:
+                status = _error_status(e)
+                retryable = status in RETRY_STATUS or (status is None and isinstance(e, OSError))
+                if not retryable or attempt == self.retries:
+                    raise
+                self.stats["retries"] += 1
+                self.sleep(backoff_delay(attempt, self.backoff, self.max_backoff, _retry_after(e)))
+
+    def _prepare_sheets(self, shapes):
+        """Cria as abas que faltam e ajusta o grid das existentes ao tamanho exato (uma chamada)"""
+        existing = {worksheet.title: worksheet for worksheet in self._call(self.spreadsheet.worksheets)}
+        resize = []
+        for title, (rows, cols) in shapes.items():
+            worksheet = existing.get(title)
+            if worksheet is None:
+                self._call(self.spreadsheet.add_worksheet, title=title, rows=rows, cols=cols)
+            elif (worksheet.row_count, worksheet.col_count) != (rows, cols):
+                # Encolher também apaga o que sobrou da exportação anterior
+                resize.append({
+                    "updateSheetProperties": {
+                        "properties": {"sheetId": worksheet.id, "gridProperties": {"rowCount": rows, "columnCount": cols}},
+                        "fields": "gridProperties(rowCount,columnCount)",
+                    }
+                })
+        if resize:
+            self._call(self.spreadsheet.batch_update, {"requests": resize})
+
+    def export(self, tables):
+        """
+        Escreve cada DataFrame de `tables` (título da aba -> DataFrame) a partir de A1.
+
+        Retorna {"sheets", "rows", "cells", "requests", "calls", "retries"}.
+        """
+        values = {title: frame_to_values(df) for title, df in tables.items()}
+        shapes = {title: (len(rows), max(1, max(len(row) for row in rows))) for title, rows in values.items()}
+        self._prepare_sheets(shapes)
+
+        # Blocos de linhas de até max_cells células; vários blocos (de abas diferentes) por requisição
+        requests, data, cells = [], [], 0
+        for title, rows in values.items():
+            width = shapes[title][1]
+            step = max(1, self.max_cells // width)
+            for start in range(0, len(rows), step):
+                block = rows[start:start + step]
+                if data and cells + len(block) * width > self.max_cells:
+                    requests.append(data)
+                    data, cells = [], 0
+                data.append({"range": _a1(title, start + 1), "values": block})
+                cells += len(block) * width
+        if data:
+            requests.append(data)
+
+        for data in requests:
+            self._call(self.spreadsheet.values_batch_update, {"valueInputOption": "RAW", "data": data})
+        total_cells = sum(rows * cols for rows, cols in shapes.values())
+        self.stats["cells"] += total_cells
+        return {
+            "sheets": list(tables),
+            "rows": sum(len(df) for df in tables.values()),
+            "cells": total_cells,
+            "requests": len(requests),
+            "calls": self.stats["calls"],
+            "retries": self.stats["retries"],
+        }
+
+
+def export_scan(spreadsheet, results, diagnostics=None, history=None, titles=SHEET_TITLES, **options):
+    """Resultados (+ diagnóstico e histórico, se informados) em abas separadas"""
+    tables = {titles["results"]: results}
+    if diagnostics is not None:
+        tables[titles["diagnostics"]] = diagnostics_frame(diagnostics)
+    if history is not None:
+        tables[titles["history"]] = history
+    return SheetsExporter(spreadsheet, **options).export(tables)
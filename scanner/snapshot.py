@@ -0,0 +1,309 @@
+"""
+Snapshots pré-calculados: todas as combinações timeframe x setup sobre o universo inteiro,
+gravados em disco com versão e lidos por todas as sessões.
+
+Layout em SNAPSHOT_DIR:
+    <versão>.parquet   hits (RESULT_COLUMNS) do scan completo
+    <versão>.json      metadados (criado em, símbolos, combinações, falhas, duração)
+    LATEST             versão mais recente (trocado de forma atômica depois dos dois acima)
+    .lock              trava do gerador (um build por vez entre todos os processos do host)
+
+Quem lê nunca vê um snapshot pela metade: LATEST só aponta para versões completas.
+"""
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from scanner.core import resolve_combos, run_scan
+from scanner.fetch import summarize_report
+from scanner.history import HISTORY_DIR, record_results, session_date
+from scanner.mapped import PANEL_DIR, publish_panel
+from scanner.store import DATA_DIR, OHLCV_DIR, acquire_lock, new_version, refresh_store
+
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+LATEST = "LATEST"
+LOCK = ".lock"
+KEEP_VERSIONS = 5
+
+MARKET_TIMEZONE = "America/New_York"
+DEFAULT_AT = "16:30"  # depois do fechamento (16:00 em Nova York)
+
+
+# =========================
+# LEITURA / ESCRITA
+# =========================
+def _write_atomic(path, write):
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_text(text):
+    def write(path):
+        with open(path, "w") as f:
+            f.write(text)
+    return write
+
+
+def write_snapshot(results, meta, root=SNAPSHOT_DIR, keep=KEEP_VERSIONS):
+    """Grava resultados e metadados de uma nova versão, aponta LATEST para ela e remove as antigas"""
+    os.makedirs(root, exist_ok=True)
+    version = meta.setdefault("version", new_version())
+    _write_atomic(os.path.join(root, f"{version}.parquet"), lambda p: results.to_parquet(p, index=False))
+    _write_atomic(os.path.join(root, f"{version}.json"), _write_text(json.dumps(meta, indent=2, ensure_ascii=False)))
+    _write_atomic(os.path.join(root, LATEST), _write_text(version))
+    prune_snapshots(root, keep)
+    return version
+
+
+def prune_snapshots(root=SNAPSHOT_DIR, keep=KEEP_VERSIONS):
+    """Mantém só as `keep` versões mais recentes (a apontada por LATEST nunca é removida)"""
+    latest = latest_version(root)
+    versions = sorted(name[:-5] for name in os.listdir(root) if name.endswith(".json"))
+    for version in versions[:-keep] if keep else []:
+        if version == latest:
+            continue
+        for ext in (".parquet", ".json"):
+            try:
+                os.remove(os.path.join(root, version + ext))
+            except OSError:
+                pass
+
+
+def latest_version(root=SNAPSHOT_DIR):
+    """Versão apontada por LATEST (None se ainda não houver snapshot)"""
+    try:
+        with open(os.path.join(root, LATEST)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def load_meta(version=None, root=SNAPSHOT_DIR):
+    """Lê só os metadados (<versão>.json) de uma versão (padrão: a mais recente); None se não existir"""
+    version = version or latest_version(root)
+    if version is None:
+        return None
+    try:
+        with open(os.path.join(root, f"{version}.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_snapshot(version=None, root=SNAPSHOT_DIR):
+    """Lê (resultados, metadados) de uma versão (padrão: a mais recente); None se não existir"""
+    version = version or latest_version(root)
+    if version is None:
+        return None
+    meta = load_meta(version, root)
+    if meta is None:
+        return None
+    try:
+        results = pd.read_parquet(os.path.join(root, f"{version}.parquet"))
+    except (OSError, ValueError):
+        return None
+    return results, meta
+
+
+def snapshot_age(meta, now=None):
+    """Idade do snapshot em segundos"""
+    return (now if now is not None else time.time()) - meta["created_at"]
+
+
+# =========================
+# GERAÇÃO
+# =========================
+def build_snapshot(symbols, combos=None, root=SNAPSHOT_DIR, data_dir=OHLCV_DIR, refresh=True,
+                   max_age=3600, downloader=None, workers=1, telemetry=None, keep=KEEP_VERSIONS,
+                   panel_root=PANEL_DIR, history_root=HISTORY_DIR):
+    """
+    Atualiza o armazenamento local, publica o painel mapeado (panel_root=None desliga),
+    escaneia todas as combinações e grava uma nova versão. Os hits também entram no
+    histórico diário (history_root=None desliga).
+
+    Só um processo gera por vez (trava em root/.lock): cada worker do Streamlit tem
+    o seu agendador, e quem não consegue a trava não baixa nem escaneia nada — retorna
+    None e o snapshot do outro aparece em LATEST. Senão, retorna os metadados gravados.
+    """
+    lock = acquire_lock(os.path.join(root, LOCK), blocking=False)
+    if lock is None:
+        return None
+    try:
+        started = time.perf_counter()
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        combos = combos if combos is not None else resolve_combos()
+        failed = []
+        data = None
+        if refresh:
+            data, report = refresh_store(symbols, max_age=max_age, root=data_dir, downloader=downloader, telemetry=telemetry)
+            failed = summarize_report(report)["failed"]
+        panel = None
+        if panel_root is not None:
+            # Quem gera o snapshot é o escritor do painel; os workers do scan já leem dele
+            panel = publish_panel(symbols, data_dir=data_dir, root=panel_root, data=data)
+        results = run_scan(symbols, combos, workers=workers, root=data_dir, telemetry=telemetry,
+                           panel_root=panel_root if panel is not None else None)
+        history_date = None
+        if history_root is not None:
+            history_date = session_date(timezone=MARKET_TIMEZONE)
+            record_results(results, history_date, combos=combos, symbols=symbols, root=history_root)
+        meta = {
+            "created_at": time.time(),
+            "symbols": len(symbols),
+            "combos": [list(combo) for combo in combos],
+            "hits": len(results),
+            "failed": failed,
+            "panel": panel["version"] if panel is not None else None,
+            "history_date": f"{history_date:%Y-%m-%d}" if history_date is not None else None,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        write_snapshot(results, meta, root, keep)
+        return meta
+    finally:
+        lock.close()
+
+
+# =========================
+# AGENDADOR
+# =========================
+def _parse_at(at):
+    hour, minute = (int(part) for part in str(at).split(":"))
+    return pd.Timedelta(hours=hour, minutes=minute)
+
+
+class SnapshotScheduler:
+    """
+    Gera snapshots em segundo plano (uma thread daemon por processo).
+
+    Modo diário: em `at` (horário local de `timezone`) nos dias de `weekdays`
+    (0 = segunda). Com `interval` (segundos), gera a cada intervalo.
+    Ao iniciar, gera na hora se o snapshot atual já estiver vencido.
+    `build` é chamado sem argumentos e deve gravar o snapshot (ex.: build_snapshot).
+    """
+
+    def __init__(self, build, at=DEFAULT_AT, interval=None, timezone=MARKET_TIMEZONE,
+                 weekdays=(0, 1, 2, 3, 4), root=SNAPSHOT_DIR):
+        self.build = build
+        self.at = _parse_at(at)
+        self.interval = float(interval) if interval else None
+        self.timezone = timezone
+        self.weekdays = set(weekdays)
+        self.root = root
+        self.status = {"running": False, "last_started": None, "last_finished": None,
+                       "last_version": None, "last_error": None}
+        self._build_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------- calendário ----------
+    def _scheduled(self, now, step):
+        """Primeiro horário agendado a partir de `now` andando `step` dias (1 = próximo, -1 = último)"""
+        local = now.tz_convert(self.timezone).tz_localize(None)
+        day = local.normalize()
+        while True:
+            candidate = day + self.at
+            if candidate.weekday() in self.weekdays and (candidate > local if step > 0 else candidate <= local):
+                return candidate.tz_localize(self.timezone, nonexistent="shift_forward", ambiguous=False)
+            day += pd.Timedelta(days=step)
+
+    def next_run(self, now=None):
+        """Próxima execução (Timestamp com fuso)"""
+        now = now if now is not None else pd.Timestamp.now(tz="UTC")
+        if self.interval:
+            last = self.status["last_finished"] or self._latest_created_at()
+            if last is None:
+                return now
+            return max(now, pd.Timestamp(last, unit="s", tz="UTC") + pd.Timedelta(seconds=self.interval))
+        return self._scheduled(now, 1)
+
+    def last_slot(self, now=None):
+        """
+        Último horário agendado até `now` (com `interval`, now - interval): o que foi
+        gerado antes dele está vencido (snapshot, painel mapeado).
+        """
+        now = now if now is not None else pd.Timestamp.now(tz="UTC")
+        if self.interval:
+            return now - pd.Timedelta(seconds=self.interval)
+        return self._scheduled(now, -1)
+
+    def is_stale(self, now=None):
+        """O snapshot mais recente é anterior ao último horário agendado (ou não existe)"""
+        now = now if now is not None else pd.Timestamp.now(tz="UTC")
+        created_at = self._latest_created_at()
+        if created_at is None:
+            return True
+        if self.interval:
+            return now.timestamp() - created_at >= self.interval
+        return created_at < self.last_slot(now).timestamp()
+
+    def _latest_created_at(self):
+        # Só o .json: is_stale/next_run rodam a cada rerun e não precisam dos resultados
+        meta = load_meta(root=self.root)
+        return meta.get("created_at") if meta is not None else None
+
+    # ---------- execução ----------
+    def run_now(self):
+        """
+        Gera um snapshot agora; se já houver um em andamento (neste ou em outro processo),
+        não faz nada e retorna None.
+        """
+        if not self._build_lock.acquire(blocking=False):
+            return None
+        try:
+            self.status.update(running=True, last_started=time.time(), last_error=None)
+            meta = self.build()
+            # build() None = outro processo gerou: a versão vigente é a de LATEST
+            self.status["last_version"] = (meta or {}).get("version") or latest_version(self.root)
+            return meta
+        except Exception as e:
+            self.status["last_error"] = f"{type(e).__name__}: {e}"
+            return None
+        finally:
+            self.status.update(running=False, last_finished=time.time())
+            self._build_lock.release()
+
+    def trigger(self):
+        """Dispara run_now em outra thread (não bloqueia quem chamou, ex.: a UI)"""
+        threading.Thread(target=self.run_now, name="snapshot-build", daemon=True).start()
+
+    def _loop(self):
+        if self.is_stale():
+            self.run_now()
+        while not self._stop.is_set():
+            wait = (self.next_run() - pd.Timestamp.now(tz="UTC")).total_seconds()
+            if self._stop.wait(timeout=max(1.0, wait)):
+                break
+            if self.is_stale():
+                self.run_now()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="snapshot-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def scheduler_options_from_env():
+    """
+    Configuração do agendador por variáveis de ambiente:
+    SCANNER_SNAPSHOT_AT (HH:MM, padrão 16:30), SCANNER_SNAPSHOT_INTERVAL (segundos; substitui o horário)
+    e SCANNER_SNAPSHOT_TZ (padrão America/New_York).
+    """
+    return {
+        "at": os.environ.get("SCANNER_SNAPSHOT_AT", DEFAULT_AT),
+        "interval": os.environ.get("SCANNER_SNAPSHOT_INTERVAL") or None,
+        "timezone": os.environ.get("SCANNER_SNAPSHOT_TZ", MARKET_TIMEZONE),
+    }
@@ -0,0 +1,249 @@
+"""Armazenamento local de OHLCV em Parquet (um arquivo por símbolo) com refresh incremental"""
+import logging
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from scanner.fetch import download_universe, failure_reason
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+DATA_DIR = os.environ.get(
+    "SCANNER_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+)
+OHLCV_DIR = os.path.join(DATA_DIR, "ohlcv")
+
+# Diferença relativa na abertura da barra em comum que indica histórico reajustado
+ADJUSTMENT_TOLERANCE = 0.005
+# Histórico cuja última barra é mais antiga que isso é baixado de novo por inteiro
+FULL_REFRESH_DAYS = 30
+PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# LEITURA / ESCRITA
+# =========================
+def store_path(symbol, root=OHLCV_DIR):
+    """Caminho do arquivo Parquet de um símbolo"""
+    safe = str(symbol).replace("/", "_").replace("\\", "_")
+    return os.path.join(root, f"{safe}.parquet")
+
+
+def load_symbol(symbol, root=OHLCV_DIR):
+    """Lê o histórico salvo de um símbolo (None se não existir)"""
+    path = store_path(symbol, root)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+    except Exception:
+        return None
+    return df if not df.empty else None
+
+
+def save_symbol(symbol, df, root=OHLCV_DIR):
+    """Grava o histórico de um símbolo de forma atômica (arquivo temporário + rename)"""
+    os.makedirs(root, exist_ok=True)
+    path = store_path(symbol, root)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    df.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def acquire_lock(path, blocking=True):
+    """
+    Trava exclusiva entre processos (flock) no arquivo `path`.
+
+    Devolve o arquivo aberto (fechá-lo solta a trava); com blocking=False, None se
+    outro processo já estiver com ela.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handle = open(path, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except OSError:
+            handle.close()
+            if blocking:
+                raise
+            return None
+    return handle
+
+
+def new_version():
+    """Versão ordenável pelo nome: horário UTC com milissegundos (snapshots, painel mapeado)"""
+    now = time.time()
+    return time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"{int(now * 1000) % 1000:03d}Z"
+
+
+def load_universe(symbols, root=OHLCV_DIR):
+    """Carrega do disco todos os símbolos disponíveis"""
+    data = {}
+    for symbol in symbols:
+        df = load_symbol(symbol, root)
+        if df is not None:
+            data[symbol] = df
+    return data
+
+
+def append_bars(stored, new):
+    """Anexa barras novas; barras com a mesma data substituem as antigas (barra parcial do dia)"""
+    if stored is None or stored.empty:
+        return new.sort_index()
+    if new is None or new.empty:
+        return stored
+    new = new[[c for c in stored.columns if c in new.columns]]
+    merged = pd.concat([stored[stored.index < new.index.min()], new])
+    merged = merged[~merged.index.duplicated(keep="last")]
+    return merged.sort_index()
+
+
+def period_start(period, now=None):
+    """Primeira data coberta por um período do Yahoo ('5d', '6mo', '2y', 'ytd'); None para 'max'"""
+    now = pd.Timestamp(now if now is not None else pd.Timestamp.now()).normalize()
+    if period == "ytd":
+        return now.replace(month=1, day=1)
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", str(period))
+    if match is None:
+        return None
+    return now - pd.DateOffset(**{PERIOD_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def trim_history(df, period, now=None):
+    """Descarta as barras anteriores ao período (o arquivo não cresce sem limite)"""
+    start = period_start(period, now)
+    if df is None or start is None:
+        return df
+    return df[df.index >= start]
+
+
+def bars_match(stored, new, tolerance=ADJUSTMENT_TOLERANCE):
+    """
+    As barras que o download repetiu (a partir da última data gravada) batem com as salvas?
+
+    O OHLC do Yahoo é ajustado por desdobramentos: depois de um split, todo o histórico
+    muda de escala e anexar barras novas ao arquivo antigo misturaria as duas escalas.
+    Compara só a abertura, que não muda depois do início do pregão (a última barra
+    salva pode ter sido parcial).
+    """
+    common = stored.index.intersection(new.index)
+    if common.empty or "Open" not in new.columns:
+        return False
+    old = stored.loc[common, "Open"].to_numpy(dtype=np.float64)
+    fresh = new.loc[common, "Open"].to_numpy(dtype=np.float64)
+    return bool(np.allclose(fresh, old, rtol=tolerance, equal_nan=True))
+
+
+# =========================
+# REFRESH INCREMENTAL
+# =========================
+def is_fresh(symbol, max_age, root=OHLCV_DIR):
+    """Verifica se o arquivo do símbolo foi atualizado há menos de max_age segundos"""
+    path = store_path(symbol, root)
+    return os.path.exists(path) and (time.time() - os.path.getmtime(path)) < max_age
+
+
+def refresh_store(symbols, period="2y", interval="1d", max_age=3600, root=OHLCV_DIR,
+                  chunk_size=100, max_workers=4, downloader=None, on_chunk=None, telemetry=None,
+                  full_refresh_days=FULL_REFRESH_DAYS):
+    """
+    Atualiza o armazenamento local e retorna (data, report).
+
+    - Símbolos atualizados há menos de max_age segundos são lidos direto do disco
+    - Símbolos já salvos baixam apenas as barras a partir da última data gravada
+    - Símbolos sem histórico, com a última barra há mais de `full_refresh_days` dias ou
+      cuja barra repetida não bate com a salva (split/reajuste) baixam o período completo
+    - O histórico gravado é cortado em `period`
+
+    Com `telemetry`, registra hit/miss do armazenamento, tempo de cada lote e as falhas
+    (de download e de gravação).
+    """
+    symbols = list(dict.fromkeys(s for s in symbols if s))
+    data = {}
+    report = []
+    today = pd.Timestamp.now().normalize()
+    stale_before = today - pd.Timedelta(days=full_refresh_days)
+
+    # Agrupa os símbolos pela data de início do download (None = período completo)
+    pending = {}
+    for symbol in symbols:
+        stored = load_symbol(symbol, root)
+        if stored is not None and is_fresh(symbol, max_age, root):
+            data[symbol] = stored
+            continue
+        last = stored.index.max() if stored is not None else None
+        start = last.strftime("%Y-%m-%d") if last is not None and last >= stale_before else None
+        pending.setdefault(start, []).append((symbol, stored))
+
+    if telemetry is not None:
+        telemetry.cache("store", hits=len(data), misses=sum(len(items) for items in pending.values()))
+
+    def download(start, group):
+        fetched, group_report = download_universe(
+            group,
+            period=period,
+            interval=interval,
+            start=start,
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+            downloader=downloader,
+            on_chunk=on_chunk
+        )
+        report.extend(group_report)
+        if telemetry is not None:
+            for entry in group_report:
+                telemetry.record(
+                    "fetch", f"lote {entry['chunk']} ({entry['symbols']} símbolos)", entry["seconds"], accumulate=False
+                )
+                for symbol in entry["failed"]:
+                    telemetry.error("fetch", symbol, failure_reason(entry, symbol))
+        return fetched
+
+    def store(symbol, df):
+        df = trim_history(df, period, today)
+        try:
+            save_symbol(symbol, df, root)
+        except (OSError, ValueError, TypeError) as e:
+            # Disco cheio, pasta só de leitura, erro do pyarrow: o scan segue com os dados em memória
+            logger.warning("Falha ao gravar %s no armazenamento: %s", symbol, e)
+            if telemetry is not None:
+                telemetry.error("store", symbol, e)
+        data[symbol] = df
+
+    rebuild = []
+    for start, items in pending.items():
+        fetched = download(start, [symbol for symbol, _ in items])
+        for symbol, stored in items:
+            new = fetched.get(symbol)
+            if new is None:
+                # Falha no download: mantém o que já estava salvo
+                if stored is not None:
+                    data[symbol] = stored
+                continue
+            if start is not None and not bars_match(stored, new):
+                rebuild.append((symbol, stored))
+                continue
+            store(symbol, append_bars(stored, new))
+
+    if rebuild:
+        if telemetry is not None:
+            telemetry.info["store_rebuilt"] = [symbol for symbol, _ in rebuild]
+        fetched = download(None, [symbol for symbol, _ in rebuild])
+        for symbol, stored in rebuild:
+            new = fetched.get(symbol)
+            if new is None:
+                # Sem o período completo, o histórico antigo (coerente entre si) continua valendo
+                data[symbol] = stored
+                continue
+            store(symbol, new.sort_index())
+
+    return data, report
@@ -0,0 +1,111 @@
+"""Instrumentação por estágio do scan: tempo, contagens, cache hit/miss, erros e símbolos mais lentos"""
+import heapq
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ["fetch", "normalize", "resample", "detect", "render"]
+
+
+class Telemetry:
+    """
+    Coletor de métricas de um scan.
+
+    - stage(): cronometra um bloco (tempo de parede, chamadas, itens)
+    - record(): tempo de um símbolo em um estágio (mantém os `top_n` mais lentos)
+    - cache(): hit/miss por cache (store em disco, st.cache_data, BarCache)
+    - error(): erro por símbolo, em vez de descartar em silêncio
+    - info: dados livres do scan (ex.: pegada de memória do cache)
+    - finish(): marca o fim do scan (o tempo de parede não cresce depois disso)
+    """
+
+    def __init__(self, top_n=10):
+        self.top_n = top_n
+        self.started = time.time()
+        self.finished = None
+        self.stages = {}
+        self.caches = {}
+        self.errors = []
+        self.info = {}
+        self._slowest = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "count": 0})
+
+    @contextmanager
+    def stage(self, name, count=0):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started, count)
+
+    def add_time(self, name, seconds, count=0):
+        with self._lock:
+            stage = self._stage(name)
+            stage["seconds"] += seconds
+            stage["calls"] += 1
+            stage["count"] += count
+
+    def record(self, name, symbol, seconds, accumulate=True):
+        """
+        Tempo gasto com um símbolo em um estágio.
+
+        accumulate=False só entra no ranking dos mais lentos (para itens que rodam em
+        paralelo e cujo tempo total já é medido por stage()).
+        """
+        with self._lock:
+            stage = self._stage(name)
+            if accumulate:
+                stage["seconds"] += seconds
+                stage["count"] += 1
+            heap = self._slowest.setdefault(name, [])
+            item = (seconds, symbol)
+            if len(heap) < self.top_n:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    def cache(self, name, hits=0, misses=0):
+        with self._lock:
+            entry = self.caches.setdefault(name, {"hits": 0, "misses": 0})
+            entry["hits"] += hits
+            entry["misses"] += misses
+
+    def error(self, stage, symbol, error):
+        with self._lock:
+            self.errors.append({"stage": stage, "symbol": symbol, "error": str(error)})
+
+    def finish(self):
+        """Marca o fim do scan; chamadas seguintes não mudam a marca"""
+        if self.finished is None:
+            self.finished = time.time()
+
+    def slowest(self, name):
+        """Símbolos mais lentos de um estágio, do mais lento para o mais rápido"""
+        return [{"symbol": s, "seconds": round(t, 6)} for t, s in sorted(self._slowest.get(name, []), reverse=True)]
+
+    def to_dict(self):
+        caches = {}
+        for name, entry in self.caches.items():
+            total = entry["hits"] + entry["misses"]
+            caches[name] = dict(entry, hit_ratio=round(entry["hits"] / total, 4) if total else None)
+        errors_by_stage = {}
+        for err in self.errors:
+            errors_by_stage[err["stage"]] = errors_by_stage.get(err["stage"], 0) + 1
+        return {
+            "started": self.started,
+            "finished": self.finished,
+            # Scan ainda em andamento: tempo até agora
+            "wall_seconds": round((self.finished or time.time()) - self.started, 4),
+            "stages": {name: dict(stage, seconds=round(stage["seconds"], 6)) for name, stage in self.stages.items()},
+            "caches": caches,
+            "errors": {"count": len(self.errors), "by_stage": errors_by_stage, "items": self.errors},
+            "slowest": {name: self.slowest(name) for name in self._slowest},
+            "info": self.info,
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False, default=str)
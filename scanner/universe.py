@@ -0,0 +1,211 @@
+"""Universo de símbolos (symbols.csv) sem dependência do Streamlit"""
+import os
+import pickle
+
+import pandas as pd
+
+from scanner.store import DATA_DIR
+
+SYMBOLS_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "symbols.csv")
+COMPILED_DIR = os.path.join(DATA_DIR, "compiled")
+COMPILED_FORMAT = 1  # muda quando o layout do SymbolIndex muda (invalida os binários antigos)
+
+
+# =========================
+# FILTROS (aplicados antes do download)
+# =========================
+FILTER_COLUMNS = {
+    "sector_spdr": "📌 Setor",
+    "tags": "🏷️ Tag",
+    "exchange": "🏛️ Exchange",
+    "tradingview_sector": "🧭 Setor TradingView",
+    "tradingview_industry": "🏭 Indústria TradingView",
+}
+
+
+# =========================
+# ÍNDICE DE METADADOS
+# =========================
+_SIGNATURES = {}
+
+
+def file_signature(path=SYMBOLS_CSV):
+    """
+    Assinatura (mtime_ns, tamanho, sha1) do arquivo.
+
+    O sha1 só é recalculado quando mtime/tamanho mudam, então chamar a cada rerun custa um stat.
+    """
+    import hashlib
+
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _SIGNATURES.get(path)
+    if cached is None or cached[:2] != key:
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        cached = _SIGNATURES[path] = key + (digest,)
+    return cached
+
+
+class SymbolIndex:
+    """
+    Índice do symbols.csv montado uma vez: símbolo -> registro e, para cada coluna
+    de FILTER_COLUMNS, valor -> conjunto de símbolos.
+
+    Filtros viram interseções de conjuntos e o enriquecimento dos hits vira lookup
+    em dict, sem varrer a tabela de símbolos.
+    """
+
+    def __init__(self, df_symbols, signature=None):
+        df_symbols = df_symbols.copy()
+        df_symbols.columns = df_symbols.columns.str.strip().str.lower()
+        self.frame = df_symbols
+        self.signature = signature
+
+        unique = df_symbols.dropna(subset=["symbols"]).drop_duplicates("symbols")
+        self.symbols = unique["symbols"].tolist()
+        self.records = dict(zip(self.symbols, unique.to_dict("records")))
+        # Uma coluna -> dict símbolo -> valor, montado na primeira vez que a coluna é pedida
+        self._column_maps = {}
+
+        self.inverted = {}
+        for column in FILTER_COLUMNS:
+            if column not in df_symbols.columns:
+                continue
+            values = df_symbols[["symbols", column]].dropna()
+            groups = {}
+            for symbol, value in zip(values["symbols"], values[column].astype(str)):
+                groups.setdefault(value, set()).add(symbol)
+            self.inverted[column] = groups
+
+    @classmethod
+    def from_csv(cls, path=SYMBOLS_CSV):
+        signature = file_signature(path)
+        return cls(pd.read_csv(path), signature=signature)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.records
+
+    def lookup(self, symbol, column=None):
+        """Registro do símbolo (ou só uma coluna); None se não existir"""
+        record = self.records.get(symbol)
+        if record is None or column is None:
+            return record
+        return record.get(column)
+
+    def options(self, column):
+        """Valores distintos de uma coluna de filtro, ordenados (vazio se a coluna não existir)"""
+        return sorted(self.inverted.get(column, {}))
+
+    def select(self, filters=None):
+        """
+        Símbolos após os filtros, na ordem do symbols.csv (sem duplicados).
+
+        `filters` mapeia coluna -> lista de valores aceitos; lista vazia (ou None) não filtra.
+        Valores da mesma coluna combinam com OU, colunas diferentes com E.
+        """
+        selected = None
+        for column, values in (filters or {}).items():
+            if not values or column not in self.inverted:
+                continue
+            groups = self.inverted[column]
+            matched = set().union(*(groups.get(str(v), ()) for v in values))
+            selected = matched if selected is None else selected & matched
+        if selected is None:
+            return list(self.symbols)
+        return [s for s in self.symbols if s in selected]
+
+    def enrich(self, results, columns=("sector_spdr", "tags")):
+        """Acrescenta colunas de metadados aos hits por lookup no registro de cada símbolo"""
+        columns = [col for col in columns if col in self.frame.columns]
+        if results.empty or not columns:
+            return results
+        results = results.copy()
+        for column in columns:
+            if column not in self._column_maps:
+                self._column_maps[column] = {s: r[column] for s, r in self.records.items()}
+            results[column] = results["symbol"].map(self._column_maps[column])
+        return results
+
+
+# =========================
+# UNIVERSO PRÉ-COMPILADO
+# =========================
+def compiled_path(path=SYMBOLS_CSV, root=COMPILED_DIR):
+    """Arquivo binário do índice de um csv (um por caminho absoluto do csv)"""
+    import hashlib
+
+    absolute = os.path.abspath(path)
+    tag = hashlib.sha1(absolute.encode()).hexdigest()[:10]
+    return os.path.join(root, f"{os.path.basename(absolute)}-{tag}.idx")
+
+
+def compile_symbol_index(path=SYMBOLS_CSV, root=COMPILED_DIR):
+    """
+    Monta o SymbolIndex do csv e grava a versão binária (pickle) com o sha1 do csv.
+
+    Falhas de gravação (ex.: disco só de leitura) não impedem o uso do índice.
+    """
+    index = SymbolIndex.from_csv(path)
+    target = compiled_path(path, root)
+    tmp_path = f"{target}.tmp-{os.getpid()}"
+    try:
+        os.makedirs(root, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"format": COMPILED_FORMAT, "sha1": index.signature[2], "index": index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, target)
+    except OSError:
+        pass
+    return index
+
+
+def read_compiled_index(path=SYMBOLS_CSV, root=COMPILED_DIR):
+    """
+    Índice binário do csv, se ainda corresponder a ele (mesmo sha1); None se faltar ou estiver velho.
+
+    Sem o csv, devolve a última versão compilada (o universo conhecido mais recente).
+    Qualquer falha ao ler o binário vale como "faltando": o chamador recompila.
+    """
+    try:
+        with open(compiled_path(path, root), "rb") as f:
+            compiled = pickle.load(f)
+        if compiled.get("format") != COMPILED_FORMAT:
+            return None
+        index = compiled["index"]
+    except Exception:
+        # Arquivo truncado, módulo renomeado, pandas de outra versão (ImportError, TypeError, ValueError...)
+        return None
+    if not os.path.exists(path):
+        return index
+    signature = file_signature(path)
+    if compiled["sha1"] != signature[2]:
+        return None
+    index.signature = signature
+    return index
+
+
+def compiled_symbol_index(path=SYMBOLS_CSV, root=COMPILED_DIR):
+    """SymbolIndex do binário pré-compilado; recompila quando o csv muda (ou quando não há binário)"""
+    index = read_compiled_index(path, root)
+    if index is None and os.path.exists(path):
+        index = compile_symbol_index(path, root)
+    return index
+
+
+_INDEXES = {}
+
+
+def load_symbol_index(path=SYMBOLS_CSV):
+    """
+    SymbolIndex do arquivo, reaproveitado entre chamadas (e sessões do Streamlit,
+    por ser um cache do processo) até o mtime ou o hash do arquivo mudarem.
+    Num processo novo, vem do binário pré-compilado em vez de reler o csv.
+    """
+    signature = file_signature(path)
+    index = _INDEXES.get(path)
+    if index is None or index.signature != signature:
+        index = _INDEXES[path] = compiled_symbol_index(path)
+    return index
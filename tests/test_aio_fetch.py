@@ -0,0 +1,147 @@
+"""Pipeline assíncrono contra um servidor HTTP local que imita o endpoint de chart"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scanner.aio_fetch import async_downloader, fetch_universe, failure_report
+from scanner.fetch import download_universe, summarize_report
+from scanner.store import refresh_store
+from scanner.telemetry import Telemetry
+
+TIMESTAMPS = [1760535000, 1760621400, 1760707800]
+
+
+def chart(symbol):
+    prices = [10.0, 11.0, 12.0]
+    return {"chart": {"result": [{
+        "meta": {"symbol": symbol, "exchangeTimezoneName": "America/New_York"},
+        "timestamp": TIMESTAMPS,
+        "indicators": {"quote": [{"open": prices, "high": prices, "low": prices, "close": prices, "volume": [100, 200, 300]}]},
+    }], "error": None}}
+
+
+class ChartHandler(BaseHTTPRequestHandler):
+    """
+    MISSING -> 404; THROTTLED -> 429 na primeira chamada; DOWN -> 503 sempre; EMPTY -> sem barras;
+    SLOW -> demora SLOW_SECONDS só na primeira chamada; STALLED -> demora sempre
+    """
+
+    hits = {}
+    arrivals = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        symbol = self.path.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+        with self.lock:
+            self.hits[symbol] = self.hits.get(symbol, 0) + 1
+            count = self.hits[symbol]
+            self.arrivals.append(time.monotonic())
+        if symbol == "STALLED" or (symbol == "SLOW" and count == 1):
+            time.sleep(SLOW_SECONDS)
+        if symbol == "MISSING":
+            return self._send(404, {"chart": {"result": None, "error": {"code": "Not Found"}}})
+        if symbol == "THROTTLED" and count == 1:
+            return self._send(429, {}, {"Retry-After": "0"})
+        if symbol == "DOWN":
+            return self._send(503, {})
+        if symbol == "EMPTY":
+            return self._send(200, {"chart": {"result": [{"meta": {}, "timestamp": []}], "error": None}})
+        return self._send(200, chart(symbol))
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    ChartHandler.hits = {}
+    ChartHandler.arrivals = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ChartHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/chart"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+SLOW_SECONDS = 0.5
+# Taxa alta, mas passando pelo TokenBucket (rate=0 o desligaria)
+OPTIONS = {"retries": 2, "backoff": 0.001, "max_backoff": 0.01, "rate": 500, "timeout": 5}
+
+
+def test_fetch_universe_retries_and_reports(server):
+    data, report = fetch_universe(["AAA", "THROTTLED", "MISSING", "DOWN", "EMPTY"], base_url=server, **OPTIONS)
+
+    assert sorted(data) == ["AAA", "THROTTLED"]
+    assert list(data["AAA"]["Close"]) == [10.0, 11.0, 12.0]
+    records = {r["symbol"]: r for r in report}
+    assert records["THROTTLED"]["attempts"] == 2 and records["THROTTLED"]["status"] == 200
+    assert records["MISSING"]["attempts"] == 1 and records["MISSING"]["status"] == 404
+    assert records["DOWN"]["attempts"] == 3 and records["DOWN"]["status"] == 503
+    assert [r["symbol"] for r in failure_report(report)] == ["MISSING", "DOWN", "EMPTY"]
+
+
+def test_chunk_report_carries_reasons(server):
+    downloader = async_downloader(base_url=server, **OPTIONS)
+    data, report = download_universe(["AAA", "MISSING", "DOWN", "EMPTY", "THROTTLED"], chunk_size=2, downloader=downloader)
+
+    assert sorted(data) == ["AAA", "THROTTLED"]
+    reasons = summarize_report(report)["reasons"]
+    assert set(reasons) == {"MISSING", "DOWN", "EMPTY"}
+    assert "404" in reasons["MISSING"] and "1 tentativa" in reasons["MISSING"]
+    assert "503" in reasons["DOWN"] and "3 tentativa" in reasons["DOWN"]
+    assert reasons["EMPTY"].startswith("sem dados")
+    assert all(entry["error"] is None for entry in report)
+
+
+def test_refresh_store_records_reasons(server, tmp_path):
+    telemetry = Telemetry()
+    downloader = async_downloader(base_url=server, **OPTIONS)
+    data, _ = refresh_store(["AAA", "MISSING"], max_age=0, root=tmp_path, downloader=downloader, telemetry=telemetry)
+
+    assert list(data) == ["AAA"]
+    (error,) = telemetry.errors
+    assert error["stage"] == "fetch" and error["symbol"] == "MISSING" and "404" in error["error"]
+
+
+def test_timeout_is_retried(server):
+    data, report = fetch_universe(["SLOW"], base_url=server, **{**OPTIONS, "timeout": SLOW_SECONDS / 5})
+
+    assert list(data) == ["SLOW"]
+    (record,) = report
+    assert record["attempts"] == 2 and record["status"] == 200 and record["error"] is None
+    assert ChartHandler.hits["SLOW"] == 2
+
+
+def test_timeout_exhausts_retries(server):
+    data, report = fetch_universe(["STALLED"], base_url=server, **{**OPTIONS, "retries": 1, "timeout": SLOW_SECONDS / 5})
+
+    assert data == {}
+    (record,) = report
+    assert record["attempts"] == 2 and record["status"] == 408 and record["error"] == "timeout"
+
+
+def test_token_bucket_spaces_requests(server):
+    rate = 20
+    symbols = [f"S{i}" for i in range(8)]
+    data, _ = fetch_universe(symbols, base_url=server, **{**OPTIONS, "rate": rate, "burst": 1})
+
+    assert sorted(data) == symbols
+    gaps = [b - a for a, b in zip(ChartHandler.arrivals, ChartHandler.arrivals[1:])]
+    assert len(gaps) == len(symbols) - 1
+    # Cada token leva 1/rate s para voltar; folga para o escalonador
+    assert min(gaps) > 0.7 / rate
+    assert ChartHandler.arrivals[-1] - ChartHandler.arrivals[0] > 0.9 * (len(symbols) - 1) / rate
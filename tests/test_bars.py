@@ -0,0 +1,63 @@
+"""BarCache incremental: anexo, histórico reescrito (split) e janela móvel dão as mesmas barras de uma remontagem"""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_universe
+from scanner.bars import BarCache, normalize_columns, resample_ohlc
+
+RULES = {"Weekly": "W", "Monthly": "M", "Quarterly": "Q"}
+
+
+@pytest.fixture
+def daily():
+    (df,) = synthetic_universe(1, 520, seed=3, end="2026-10-16").values()
+    return normalize_columns(df)
+
+
+def assert_same_as_rebuild(bars, daily, timeframe):
+    pd.testing.assert_frame_equal(bars, resample_ohlc(daily, RULES[timeframe]), check_freq=False)
+
+
+@pytest.mark.parametrize("timeframe", list(RULES))
+def test_append_recomputes_only_the_tail(daily, timeframe):
+    cache = BarCache()
+    cache.get("AAA", daily.iloc[:-10], timeframe)
+    for stop in range(len(daily) - 9, len(daily) + 1):
+        assert_same_as_rebuild(cache.get("AAA", daily.iloc[:stop], timeframe), daily.iloc[:stop], timeframe)
+    assert cache.stats == {"hits": 0, "incremental": 10, "full": 1}
+    cache.get("AAA", daily, timeframe)
+    assert cache.stats["hits"] == 1
+
+
+@pytest.mark.parametrize("timeframe", list(RULES))
+def test_rewritten_history_is_rebuilt(daily, timeframe):
+    cache = BarCache()
+    cache.get("AAA", daily.iloc[:-1], timeframe)
+    # Split 4:1 re-baixado: mesma primeira data, todo o histórico em outra escala
+    adjusted = daily.copy()
+    adjusted[["open", "high", "low", "close"]] *= 0.25
+
+    assert_same_as_rebuild(cache.get("AAA", adjusted, timeframe), adjusted, timeframe)
+    assert cache.stats["full"] == 2 and cache.stats["incremental"] == 0
+
+
+@pytest.mark.parametrize("timeframe", list(RULES))
+def test_sliding_window_drops_leading_periods(daily, timeframe):
+    cache = BarCache()
+    window = 400
+    cache.get("AAA", daily.iloc[:window], timeframe)
+    # Um dia a mais no fim e um a menos no começo (como o corte no período do armazenamento)
+    for start in range(1, 60):
+        current = daily.iloc[start:start + window]
+        assert_same_as_rebuild(cache.get("AAA", current, timeframe), current, timeframe)
+    assert cache.stats["full"] == 1 and cache.stats["incremental"] == 59
+
+
+def test_edited_old_bar_forces_rebuild(daily):
+    cache = BarCache()
+    cache.get("AAA", daily.iloc[:-1], "Weekly")
+    edited = daily.copy()
+    edited.iloc[100, edited.columns.get_loc("high")] += 50
+
+    assert_same_as_rebuild(cache.get("AAA", edited, "Weekly"), edited, "Weekly")
+    assert cache.stats["full"] == 2
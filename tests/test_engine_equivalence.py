@@ -0,0 +1,74 @@
+"""Motor vetorizado (registro de setups) x detectores originais, símbolo a símbolo"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_universe
+from scanner.bars import TIMEFRAME_RULES, normalize_columns, resample_ohlc
+from scanner.compact import compact_universe
+from scanner.core import scan_universe
+from scanner.detectors import (
+    detect_2down_green_3m, detect_2down_green_monthly, detect_double_inside_bar, detect_inside_bar
+)
+
+N_SYMBOLS = 250
+N_BARS = 504
+
+
+def _bars(df, timeframe):
+    df = normalize_columns(df)
+    rule = TIMEFRAME_RULES[timeframe]
+    return df if rule is None else resample_ohlc(df, rule)
+
+
+# combinação -> detector original sobre o histórico diário
+LEGACY = {
+    ("Daily", "Inside Bar"): lambda df: detect_inside_bar(_bars(df, "Daily")),
+    ("Weekly", "Inside Bar"): lambda df: detect_inside_bar(_bars(df, "Weekly")),
+    ("Monthly", "Inside Bar"): lambda df: detect_inside_bar(_bars(df, "Monthly")),
+    ("Quarterly", "Inside Bar"): lambda df: detect_inside_bar(_bars(df, "Quarterly")),
+    ("Daily", "Double Inside Bar"): lambda df: detect_double_inside_bar(_bars(df, "Daily")),
+    ("Weekly", "Double Inside Bar"): lambda df: detect_double_inside_bar(_bars(df, "Weekly")),
+    ("Monthly", "2Down Green Monthly"): detect_2down_green_monthly,
+    ("Quarterly", "2Down Green 3M"): detect_2down_green_3m,
+}
+
+
+def legacy_hits(frames):
+    rows = []
+    for combo, detect in LEGACY.items():
+        for symbol, df in frames.items():
+            found, info = detect(df)
+            if found:
+                rows.append((*combo, symbol, info["price"], info["valid"]))
+    return pd.DataFrame(rows, columns=["timeframe", "setup", "symbol", "price", "valid"])
+
+
+@pytest.fixture(scope="module")
+def frames():
+    # Candles inconsistentes frequentes para exercitar o fix_candle (valid = Adjusted)
+    return synthetic_universe(N_SYMBOLS, N_BARS, seed=7, bad_candle_rate=0.15)
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["dataframe", "compact"])
+def test_vectorized_engine_matches_legacy_detectors(frames, compact):
+    data = compact_universe(frames) if compact else frames
+    # Os detectores originais leem exatamente os mesmos valores (float32 no compacto)
+    legacy_input = {s: c.to_frame() for s, c in data.items()} if compact else frames
+
+    engine = scan_universe(data, list(LEGACY))
+    legacy = legacy_hits(legacy_input)
+
+    key = ["timeframe", "setup", "symbol"]
+    merged = engine.merge(legacy, on=key, how="outer", suffixes=("_engine", "_legacy"), indicator=True)
+    assert (merged["_merge"] == "both").all(), merged[merged["_merge"] != "both"].head(10)
+    assert len(merged) > 100
+
+    assert (merged["valid_engine"] == merged["valid_legacy"]).all()
+    assert set(merged["valid_engine"]) == {"OK", "Adjusted"}
+    assert np.allclose(merged["price_engine"].astype(float), merged["price_legacy"].astype(float), rtol=1e-6)
+
+    # 2Down Green mensal/trimestral: preço arredondado em 2 casas como no detector original
+    two_down = merged[merged["setup"].str.startswith("2Down")]
+    assert not two_down.empty
+    assert np.allclose(two_down["price_engine"].astype(float), two_down["price_engine"].astype(float).round(2))
@@ -0,0 +1,77 @@
+"""download_universe com um downloader local no lugar do Yahoo"""
+import threading
+
+import pandas as pd
+
+from scanner.fetch import download_universe, summarize_report
+
+
+def bars(symbol, n=5):
+    index = pd.date_range("2026-01-05", periods=n, freq="B", tz="America/New_York", name="Date")
+    base = float(len(symbol))
+    return pd.DataFrame({
+        "Open": base, "High": base + 1, "Low": base - 1, "Close": base, "Volume": 1000,
+    }, index=index)
+
+
+def fake_downloader(fail_chunk_with=None, missing=(), calls=None):
+    """Lote com `fail_chunk_with` levanta erro; símbolos em `missing` voltam sem dados"""
+    lock = threading.Lock()
+
+    def downloader(symbols, period="2y", interval="1d", start=None):
+        if calls is not None:
+            with lock:
+                calls.append({"symbols": list(symbols), "period": period, "start": start})
+        if fail_chunk_with in symbols:
+            raise RuntimeError("HTTP 503")
+        return {s: bars(s) for s in symbols if s not in missing}
+
+    return downloader
+
+
+def test_chunks_and_dedup():
+    calls = []
+    symbols = ["A", "BB", "A", "CCC", "", "DDDD", "EEEEE"]
+    data, report = download_universe(symbols, chunk_size=2, max_workers=3, downloader=fake_downloader(calls=calls))
+
+    assert sorted(data) == ["A", "BB", "CCC", "DDDD", "EEEEE"]
+    assert sorted(len(c["symbols"]) for c in calls) == [1, 2, 2]
+    assert [e["chunk"] for e in report] == [0, 1, 2]
+    assert [e["symbols"] for e in report] == [2, 2, 1]
+    assert all(e["failed"] == [] and e["error"] is None for e in report)
+    # Índice sem timezone, como o resto do scanner espera
+    assert all(df.index.tz is None for df in data.values())
+
+
+def test_chunk_failure_is_isolated():
+    seen = []
+    data, report = download_universe(
+        ["A", "BB", "CCC", "DDDD", "EEEEE"], chunk_size=2, max_workers=2,
+        downloader=fake_downloader(fail_chunk_with="CCC"), on_chunk=seen.append
+    )
+
+    assert sorted(data) == ["A", "BB", "EEEEE"]
+    failed = report[1]
+    assert failed["failed"] == ["CCC", "DDDD"]
+    assert failed["error"] == "HTTP 503"
+    assert report[0]["error"] is None and report[2]["error"] is None
+    assert sorted(e["chunk"] for e in seen) == [0, 1, 2]
+    assert summarize_report(report)["failed"] == ["CCC", "DDDD"]
+
+
+def test_missing_symbols_are_reported():
+    data, report = download_universe(["A", "BB", "CCC"], chunk_size=10, downloader=fake_downloader(missing={"BB"}))
+
+    assert sorted(data) == ["A", "CCC"]
+    assert report == [dict(report[0], failed=["BB"], error=None)]
+    assert report[0]["symbols"] == 3 and report[0]["seconds"] >= 0
+
+
+def test_start_and_period_are_forwarded():
+    calls = []
+    download_universe(["A"], period="5d", start="2026-01-02", downloader=fake_downloader(calls=calls))
+    assert calls == [{"symbols": ["A"], "period": "5d", "start": "2026-01-02"}]
+
+
+def test_empty_universe():
+    assert download_universe([], downloader=fake_downloader()) == ({}, [])
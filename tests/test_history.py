@@ -0,0 +1,99 @@
+"""Histórico: gravação concorrente, sequências, diff entre datas e o comando history"""
+import threading
+
+import pandas as pd
+
+from scanner.__main__ import main
+from scanner.history import ResultsHistory, record_results
+
+COMBO = ("Daily", "Inside Bar")
+
+
+def hits(symbol):
+    return pd.DataFrame({"timeframe": [COMBO[0]], "setup": [COMBO[1]], "symbol": [symbol], "price": [1.0], "valid": ["OK"]})
+
+
+def test_concurrent_records_keep_every_row(tmp_path):
+    symbols = [f"S{i:02d}" for i in range(16)]
+    barrier = threading.Barrier(len(symbols))
+
+    def record(symbol):
+        barrier.wait()
+        record_results(hits(symbol), date="2026-10-16", combos=[COMBO], symbols=[symbol], root=str(tmp_path))
+
+    threads = [threading.Thread(target=record, args=(symbol,)) for symbol in symbols]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    day = ResultsHistory(str(tmp_path)).reload().day("2026-10-16")
+    assert sorted(day["symbol"]) == symbols
+
+
+def test_rescan_replaces_only_covered_symbols(tmp_path):
+    root = str(tmp_path)
+    record_results(pd.concat([hits("AAA"), hits("BBB")]), date="2026-10-16", root=root)
+    record_results(hits("CCC"), date="2026-10-16", combos=[COMBO], symbols=["AAA", "CCC"], root=root)
+
+    day = ResultsHistory(root).reload().day("2026-10-16")
+    assert sorted(day["symbol"]) == ["BBB", "CCC"]
+
+
+def history_of(tmp_path, days):
+    root = str(tmp_path)
+    for date, symbols in days.items():
+        record_results(pd.concat([hits(symbol) for symbol in symbols]) if symbols else hits("AAA").iloc[:0],
+                       date=date, combos=[COMBO], symbols=["AAA", "BBB", "CCC"], root=root)
+    return ResultsHistory(root).reload()
+
+
+DAYS = {
+    "2026-10-12": ["AAA"],
+    "2026-10-13": ["AAA", "BBB"],
+    "2026-10-14": ["BBB", "CCC"],
+    "2026-10-15": [],
+    "2026-10-16": ["AAA", "BBB"],
+}
+
+
+def test_streaks_count_consecutive_recorded_dates(tmp_path):
+    history = history_of(tmp_path, DAYS)
+
+    def streaks(date):
+        return {key[2]: streak for key, streak in history.streaks(date).items()}
+
+    assert streaks("2026-10-13") == {"AAA": 2, "BBB": 1}
+    assert streaks("2026-10-14") == {"BBB": 2, "CCC": 1}
+    assert streaks("2026-10-15") == {}
+    # Uma data gravada sem o hit quebra a sequência
+    assert streaks("2026-10-16") == {"AAA": 1, "BBB": 1}
+    # Datas sem partição (fim de semana) não quebram: vale a última gravada
+    assert streaks("2026-10-18") == streaks("2026-10-16")
+
+
+def test_diff_statuses(tmp_path):
+    history = history_of(tmp_path, DAYS)
+
+    diff = history.diff("2026-10-14", combos=[COMBO])
+    assert list(diff.columns) == ["timeframe", "setup", "symbol", "status", "price", "valid", "streak"]
+    rows = {row.symbol: (row.status, row.streak) for row in diff.itertuples()}
+    assert rows == {"CCC": ("new", 1), "AAA": ("dropped", 0), "BBB": ("persisting", 2)}
+    assert list(diff["status"]) == ["new", "dropped", "persisting"]
+
+    vs_first = history.diff("2026-10-16", previous="2026-10-12")
+    assert {row.symbol: row.status for row in vs_first.itertuples()} == {"BBB": "new", "AAA": "persisting"}
+    assert history.diff("2026-10-16", symbols=["AAA"])["status"].tolist() == ["new"]
+    assert history.diff("2026-10-01").empty
+
+
+def test_cli_history_rejects_date_before_first_recorded(tmp_path, capsys):
+    history_of(tmp_path, DAYS)
+    output = str(tmp_path / "diff.json")
+    args = ["history", "--history-dir", str(tmp_path), "--output", output]
+
+    assert main(args + ["--date", "2026-10-01"]) == 2
+    assert "2026-10-01" in capsys.readouterr().err
+    assert main(args + ["--previous", "2026-10-01"]) == 2
+    assert main(args + ["--date", "2026-10-14", "--status", "new,persisting"]) == 0
+    assert sorted(pd.read_json(output)["symbol"]) == ["BBB", "CCC"]
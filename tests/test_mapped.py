@@ -0,0 +1,104 @@
+"""Painel mapeado: alinhamento no calendário comum, leitura sem cópia e troca de CURRENT"""
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scanner import mapped
+from scanner.mapped import CURRENT, PanelReader, current_version, open_panel, pack_panel, prune_panels, write_panel
+
+
+def frame(dates, start):
+    closes = np.arange(start, start + len(dates), dtype=float)
+    return pd.DataFrame(
+        {"Open": closes, "High": closes + 1, "Low": closes - 1, "Close": closes, "Volume": np.arange(len(dates)) + 10},
+        index=pd.DatetimeIndex(dates, name="Date"),
+    )
+
+
+DATES = pd.bdate_range("2026-10-05", periods=6)
+DATA = {
+    "AAA": frame(DATES, 100),                        # todas as datas
+    "BBB": frame(DATES[2:5], 200),                   # intervalo menor, sem buracos
+    "CCC": frame(DATES[[0, 1, 4]], 300),             # buracos no meio
+}
+
+
+@pytest.fixture(autouse=True)
+def versions(monkeypatch):
+    # Versões distintas mesmo quando duas gravações caem no mesmo milissegundo
+    counter = itertools.count(1)
+    monkeypatch.setattr(mapped, "new_version", lambda: f"20261016T2030{next(counter):05d}Z")
+
+
+def test_pack_panel_aligns_rows_with_symbols():
+    symbols, arrays = pack_panel(DATA)
+
+    assert symbols == ["AAA", "BBB", "CCC"]
+    assert (arrays["dates"] == DATES.values).all()
+    assert arrays["prices"].shape == (3, 6, 4) and arrays["volume"].shape == (3, 6)
+    expected_present = [[True] * 6, [False, False, True, True, True, False], [True, True, False, False, True, False]]
+    assert arrays["present"].tolist() == expected_present
+    for i, symbol in enumerate(symbols):
+        mask = arrays["present"][i]
+        df = DATA[symbol]
+        assert arrays["prices"][i, mask, 3].tolist() == df["Close"].tolist()
+        assert arrays["volume"][i, mask].tolist() == df["Volume"].tolist()
+        assert np.isnan(arrays["prices"][i, ~mask]).all() and (arrays["volume"][i, ~mask] == 0).all()
+
+
+def test_dense_get_is_a_view_and_sparse_get_skips_holes(tmp_path):
+    write_panel(DATA, root=str(tmp_path))
+    panel = open_panel(root=str(tmp_path))
+
+    for symbol in ("AAA", "BBB"):
+        compact = panel.get(symbol)
+        df = DATA[symbol]
+        assert (compact.dates == df.index.values).all()
+        assert compact.prices[:, 3].tolist() == df["Close"].tolist()
+        assert np.shares_memory(compact.prices, panel.prices)
+
+    sparse = panel.get("CCC")
+    assert (sparse.dates == DATA["CCC"].index.values).all()
+    assert sparse.prices[:, 3].tolist() == DATA["CCC"]["Close"].tolist()
+    assert sparse.volume.tolist() == DATA["CCC"]["Volume"].tolist()
+    assert not np.shares_memory(sparse.prices, panel.prices)
+
+    assert panel.get("ZZZ") is None
+    assert sorted(panel.universe(["CCC", "ZZZ", "AAA"])) == ["AAA", "CCC"]
+
+
+def test_reader_switches_only_after_current_is_swapped(tmp_path):
+    root = str(tmp_path)
+    first = write_panel({"AAA": DATA["AAA"]}, root=root)
+    reader = PanelReader(root)
+    old = reader.current()
+    assert old.version == first["version"] and old.symbols == ["AAA"]
+
+    # Pasta de outro escritor ainda em andamento: CURRENT não aponta para ela
+    os.makedirs(os.path.join(root, "20991231T235959999Z.tmp-1"))
+    assert reader.current() is old
+
+    second = write_panel(DATA, root=root)
+    new = reader.current()
+    assert new.version == second["version"] == current_version(root)
+    assert new.symbols == ["AAA", "BBB", "CCC"]
+    assert reader.current() is new
+    # Quem ainda segura a versão anterior continua lendo dela
+    assert old.get("AAA").prices[:, 3].tolist() == DATA["AAA"]["Close"].tolist()
+
+
+def test_prune_keeps_the_current_version(tmp_path):
+    root = str(tmp_path)
+    written = [write_panel({"AAA": DATA["AAA"]}, root=root, keep=0)["version"] for _ in range(4)]
+
+    # CURRENT de volta para a mais antiga (ex.: outro processo trocou no meio do prune)
+    with open(os.path.join(root, CURRENT), "w") as f:
+        f.write(written[0])
+    prune_panels(root, keep=1)
+
+    remaining = sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+    assert remaining == [written[0], written[-1]]
+    assert open_panel(root=root).version == written[0]
@@ -0,0 +1,175 @@
+"""Exportação em lote para o Google Sheets contra uma planilha em memória"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scanner.sheets import SheetsExporter, export_scan, frame_to_values
+
+
+class LocalWorksheet:
+    def __init__(self, sheet_id, title, rows, cols):
+        self.id = sheet_id
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.cells = {}
+
+    def frame(self):
+        """Conteúdo da aba como DataFrame (primeira linha = cabeçalho)"""
+        grid = [[self.cells.get((r, c), "") for c in range(self.col_count)] for r in range(self.row_count)]
+        return pd.DataFrame(grid[1:], columns=grid[0]) if grid else pd.DataFrame()
+
+
+class LocalSpreadsheet:
+    """
+    Planilha em memória com a interface que o SheetsExporter usa (worksheets,
+    add_worksheet, batch_update, values_batch_update).
+
+    Respeita os limites do grid como a API (escrever fora dele é erro) e registra
+    cada chamada em `calls`. `failures` é uma lista de exceções levantadas, uma por
+    chamada, antes de atender as seguintes (simula 429/5xx).
+    """
+
+    def __init__(self, failures=None):
+        self.sheets = {}
+        self.calls = []
+        self.failures = list(failures or [])
+
+    def _record(self, name):
+        self.calls.append(name)
+        if self.failures:
+            raise self.failures.pop(0)
+
+    def worksheets(self):
+        self._record("worksheets")
+        return list(self.sheets.values())
+
+    def worksheet(self, title):
+        return self.sheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        self._record("add_worksheet")
+        worksheet = self.sheets[title] = LocalWorksheet(len(self.sheets), title, rows, cols)
+        return worksheet
+
+    def batch_update(self, body):
+        self._record("batch_update")
+        by_id = {worksheet.id: worksheet for worksheet in self.sheets.values()}
+        for request in body["requests"]:
+            properties = request["updateSheetProperties"]["properties"]
+            worksheet = by_id[properties["sheetId"]]
+            worksheet.row_count = properties["gridProperties"]["rowCount"]
+            worksheet.col_count = properties["gridProperties"]["columnCount"]
+            worksheet.cells = {
+                (r, c): value for (r, c), value in worksheet.cells.items()
+                if r < worksheet.row_count and c < worksheet.col_count
+            }
+
+    def values_batch_update(self, body):
+        self._record("values_batch_update")
+        for item in body["data"]:
+            sheet_part, _, cell = item["range"].rpartition("!")
+            worksheet = self.sheets[sheet_part[1:-1].replace("''", "'")]
+            start = int(cell[1:]) - 1
+            for r, row in enumerate(item["values"], start):
+                if r >= worksheet.row_count or len(row) > worksheet.col_count:
+                    raise ValueError(f"Intervalo {item['range']} excede o grid da aba")
+                for c, value in enumerate(row):
+                    worksheet.cells[(r, c)] = value
+        return {"totalUpdatedCells": sum(len(row) for item in body["data"] for row in item["values"])}
+
+
+class HttpError(Exception):
+    """Erro com o formato do requests/gspread: status em response.status_code"""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.response = type("Response", (), {"status_code": status, "headers": {"Retry-After": retry_after} if retry_after else {}})()
+
+
+def results(n):
+    return pd.DataFrame({
+        "timeframe": ["Daily"] * n,
+        "setup": ["Inside Bar"] * n,
+        "symbol": [f"S{i:04d}" for i in range(n)],
+        "price": np.round(np.linspace(1, 100, n), 2),
+        "valid": ["OK"] * n,
+    })
+
+
+def test_export_writes_every_cell_in_few_requests():
+    spreadsheet = LocalSpreadsheet()
+    df = results(5000)
+    summary = SheetsExporter(spreadsheet, max_cells=10000, sleep=lambda s: None).export({"Resultados": df})
+
+    # 5001 linhas x 5 colunas em blocos de até 10000 células
+    assert summary["requests"] == 3
+    assert spreadsheet.calls == ["worksheets", "add_worksheet"] + ["values_batch_update"] * 3
+    written = spreadsheet.worksheet("Resultados").frame()
+    assert written.shape == df.shape
+    assert written["symbol"].tolist() == df["symbol"].tolist()
+    assert written["price"].tolist() == df["price"].tolist()
+
+
+def test_second_export_shrinks_the_sheet():
+    spreadsheet = LocalSpreadsheet()
+    SheetsExporter(spreadsheet).export({"Resultados": results(50)})
+    SheetsExporter(spreadsheet).export({"Resultados": results(10)})
+
+    assert spreadsheet.calls.count("batch_update") == 1
+    assert len(spreadsheet.worksheet("Resultados").frame()) == 10
+
+
+def test_export_scan_tabs():
+    spreadsheet = LocalSpreadsheet()
+    diagnostics = {"stages": {"fetch": {"seconds": 1.5, "count": 3}}, "errors": {"by_stage": {"fetch": 2}}}
+    summary = export_scan(spreadsheet, results(3), diagnostics=diagnostics, history=results(2))
+
+    assert summary["sheets"] == ["Resultados", "Diagnóstico", "Histórico"]
+    assert spreadsheet.worksheet("Diagnóstico").frame()["name"].tolist() == ["fetch", "fetch", "fetch"]
+
+
+def test_quota_errors_are_retried_with_retry_after():
+    delays = []
+    spreadsheet = LocalSpreadsheet(failures=[HttpError(429, "7"), ConnectionError("reset")])
+    summary = SheetsExporter(spreadsheet, backoff=0.01, sleep=delays.append).export({"Resultados": results(5)})
+
+    assert summary["retries"] == 2
+    assert delays[0] >= 7
+    assert spreadsheet.calls[:3] == ["worksheets"] * 3
+    assert len(spreadsheet.worksheet("Resultados").frame()) == 5
+
+
+def test_client_errors_are_not_retried():
+    spreadsheet = LocalSpreadsheet(failures=[HttpError(400)])
+    with pytest.raises(HttpError):
+        SheetsExporter(spreadsheet, sleep=lambda s: None).export({"Resultados": results(5)})
+    assert spreadsheet.calls == ["worksheets"]
+
+
+def test_retries_are_bounded():
+    spreadsheet = LocalSpreadsheet(failures=[HttpError(503)] * 3)
+    with pytest.raises(HttpError):
+        SheetsExporter(spreadsheet, retries=2, sleep=lambda s: None).export({"Resultados": results(5)})
+    assert spreadsheet.calls == ["worksheets"] * 3
+
+
+def test_gspread_api_error_is_retried():
+    gspread = pytest.importorskip("gspread")
+    requests = pytest.importorskip("requests")
+    response = requests.Response()
+    response.status_code = 429
+    response.headers["Retry-After"] = "2"
+    response._content = json.dumps({"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}}).encode()
+    delays = []
+    spreadsheet = LocalSpreadsheet(failures=[gspread.exceptions.APIError(response)])
+
+    SheetsExporter(spreadsheet, backoff=0.01, sleep=delays.append).export({"Resultados": results(2)})
+    assert len(delays) == 1 and delays[0] >= 2
+
+
+def test_values_are_json_safe():
+    df = pd.DataFrame({"a": [np.int64(1), np.nan], "b": [pd.Timestamp("2026-10-16"), None]})
+    assert frame_to_values(df) == [["a", "b"], [1.0, "2026-10-16T00:00:00"], ["", ""]]
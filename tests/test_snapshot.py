@@ -0,0 +1,66 @@
+"""Geração de snapshots: um build por vez entre processos"""
+import json
+import os
+
+import pandas as pd
+
+from scanner.snapshot import LOCK, SnapshotScheduler, build_snapshot, latest_version
+from scanner.store import acquire_lock
+
+
+def test_build_is_skipped_while_another_process_holds_the_lock(tmp_path):
+    calls = []
+
+    def downloader(symbols, **kwargs):
+        calls.append(symbols)
+        return {}
+
+    holder = acquire_lock(os.path.join(tmp_path, LOCK))
+    try:
+        assert build_snapshot(["AAA"], root=str(tmp_path), data_dir=str(tmp_path / "ohlcv"), downloader=downloader,
+                              panel_root=None, history_root=None) is None
+    finally:
+        holder.close()
+    assert calls == []
+    assert latest_version(str(tmp_path)) is None
+
+    meta = build_snapshot(["AAA"], root=str(tmp_path), data_dir=str(tmp_path / "ohlcv"), downloader=downloader,
+                          panel_root=None, history_root=None)
+    assert calls == [["AAA"]]
+    assert latest_version(str(tmp_path)) == meta["version"]
+
+
+def test_scheduler_reports_latest_when_build_is_skipped(tmp_path):
+    with open(os.path.join(tmp_path, "LATEST"), "w") as f:
+        f.write("20261016T203000000Z")
+    scheduler = SnapshotScheduler(lambda: None, root=str(tmp_path))
+    assert scheduler.run_now() is None
+    assert scheduler.status["last_version"] == "20261016T203000000Z"
+    assert scheduler.status["last_error"] is None
+
+
+def test_last_slot_is_the_previous_scheduled_close():
+    scheduler = SnapshotScheduler(None, at="16:30")
+    # Sábado de manhã: o último horário agendado é o de sexta
+    now = pd.Timestamp("2026-10-17 14:00", tz="UTC")
+    assert scheduler.last_slot(now) == pd.Timestamp("2026-10-16 16:30", tz="America/New_York")
+    assert SnapshotScheduler(None, interval=600).last_slot(now) == now - pd.Timedelta(minutes=10)
+
+
+def test_staleness_reads_only_the_metadata(tmp_path, monkeypatch):
+    version = "20261016T203000000Z"
+    created_at = pd.Timestamp("2026-10-16 20:30", tz="UTC").timestamp()
+    with open(os.path.join(tmp_path, f"{version}.json"), "w") as f:
+        json.dump({"version": version, "created_at": created_at}, f)
+    with open(os.path.join(tmp_path, "LATEST"), "w") as f:
+        f.write(version)
+
+    def read_parquet(*args, **kwargs):
+        raise AssertionError("is_stale/next_run não devem ler o parquet")
+
+    monkeypatch.setattr(pd, "read_parquet", read_parquet)
+    scheduler = SnapshotScheduler(None, interval=600, root=str(tmp_path))
+    now = pd.Timestamp("2026-10-16 20:35", tz="UTC")
+    assert not scheduler.is_stale(now)
+    assert scheduler.is_stale(now + pd.Timedelta(minutes=10))
+    assert scheduler.next_run(now) == pd.Timestamp("2026-10-16 20:40", tz="UTC")
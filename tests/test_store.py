@@ -0,0 +1,101 @@
+"""refresh_store incremental: anexo, split (reajuste do histórico), corte no período e falhas de gravação"""
+import numpy as np
+import pandas as pd
+
+from scanner import store
+from scanner.store import bars_match, load_symbol, period_start, refresh_store, save_symbol
+from scanner.telemetry import Telemetry
+
+
+def history(end, periods, scale=1.0):
+    index = pd.bdate_range(end=end, periods=periods, name="Date")
+    close = np.arange(100.0, 100.0 + periods) * scale
+    return pd.DataFrame({
+        "Open": close, "High": close + scale, "Low": close - scale, "Close": close, "Volume": 1000.0,
+    }, index=index)
+
+
+class Source:
+    """Downloader local: fatia uma série 'verdadeira' por símbolo a partir de `start`"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.calls = []
+
+    def __call__(self, symbols, period="2y", interval="1d", start=None):
+        self.calls.append((tuple(symbols), start))
+        out = {}
+        for symbol in symbols:
+            df = self.frames[symbol]
+            out[symbol] = df if start is None else df[df.index >= pd.Timestamp(start)]
+        return out
+
+
+def test_incremental_append(tmp_path):
+    today = pd.Timestamp.now().normalize()
+    full = history(today, 60)
+    save_symbol("AAA", full.iloc[:-3], tmp_path)
+    source = Source({"AAA": full})
+
+    data, _ = refresh_store(["AAA"], max_age=0, root=tmp_path, downloader=source)
+
+    assert source.calls == [(("AAA",), full.index[-4].strftime("%Y-%m-%d"))]
+    pd.testing.assert_frame_equal(data["AAA"], full, check_freq=False)
+    pd.testing.assert_frame_equal(load_symbol("AAA", tmp_path), full, check_freq=False)
+
+
+def test_split_triggers_full_refetch(tmp_path):
+    today = pd.Timestamp.now().normalize()
+    before_split = history(today, 60).iloc[:-3]
+    save_symbol("AAA", before_split, tmp_path)
+    # Split 4:1: o Yahoo devolve todo o histórico na nova escala
+    adjusted = history(today, 60, scale=0.25)
+    source = Source({"AAA": adjusted})
+    telemetry = Telemetry()
+
+    data, _ = refresh_store(["AAA"], max_age=0, root=tmp_path, downloader=source, telemetry=telemetry)
+
+    assert [start for _, start in source.calls] == [before_split.index[-1].strftime("%Y-%m-%d"), None]
+    pd.testing.assert_frame_equal(data["AAA"], adjusted, check_freq=False)
+    assert telemetry.info["store_rebuilt"] == ["AAA"]
+
+
+def test_stale_history_downloads_full_period(tmp_path):
+    today = pd.Timestamp.now().normalize()
+    save_symbol("AAA", history(today - pd.Timedelta(days=90), 20), tmp_path)
+    source = Source({"AAA": history(today, 60)})
+
+    refresh_store(["AAA"], max_age=0, root=tmp_path, downloader=source)
+
+    assert source.calls == [(("AAA",), None)]
+
+
+def test_history_is_trimmed_to_period(tmp_path):
+    today = pd.Timestamp.now().normalize()
+    source = Source({"AAA": history(today, 400)})
+
+    data, _ = refresh_store(["AAA"], period="6mo", max_age=0, root=tmp_path, downloader=source)
+
+    assert data["AAA"].index.min() >= period_start("6mo", today)
+    assert len(load_symbol("AAA", tmp_path)) == len(data["AAA"]) < 400
+
+
+def test_save_failure_is_reported(tmp_path, monkeypatch):
+    def full_disk(symbol, df, root):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(store, "save_symbol", full_disk)
+    telemetry = Telemetry()
+    today = pd.Timestamp.now().normalize()
+
+    data, _ = refresh_store(["AAA"], max_age=0, root=tmp_path, downloader=Source({"AAA": history(today, 10)}), telemetry=telemetry)
+
+    assert "AAA" in data
+    assert [(e["stage"], e["symbol"]) for e in telemetry.errors] == [("store", "AAA")]
+
+
+def test_bars_match_tolerance():
+    stored = history("2026-10-16", 5)
+    assert bars_match(stored, stored.iloc[-1:] * [1.001, 1, 1, 1, 1])
+    assert not bars_match(stored, stored.iloc[-1:] * 0.5)
+    assert not bars_match(stored, history("2026-10-30", 1))
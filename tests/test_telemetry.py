@@ -0,0 +1,14 @@
+"""Tempo de parede da telemetria congelado no fim do scan"""
+import time
+
+from scanner.telemetry import Telemetry
+
+
+def test_wall_seconds_stops_at_finish():
+    telemetry = Telemetry()
+    telemetry.finish()
+    first = telemetry.to_dict()["wall_seconds"]
+    time.sleep(0.02)
+    telemetry.finish()
+    assert telemetry.to_dict()["wall_seconds"] == first
+    assert telemetry.to_dict()["finished"] == telemetry.finished
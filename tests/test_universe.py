@@ -0,0 +1,37 @@
+"""Índice de símbolos pré-compilado: binário inválido é recompilado em vez de derrubar a partida"""
+import pickle
+
+import pytest
+
+from scanner.universe import compiled_path, compiled_symbol_index, read_compiled_index
+
+
+@pytest.fixture
+def csv(tmp_path):
+    path = tmp_path / "symbols.csv"
+    path.write_text("Symbols,Sector_SPDR\nAAA,XLK\nBBB,XLE\nAAA,XLK\n")
+    return str(path)
+
+
+class Unloadable:
+    def __reduce__(self):
+        # Ao carregar, importa um módulo que não existe mais
+        return (__import__, ("scanner_module_that_was_renamed",))
+
+
+@pytest.mark.parametrize("payload", [
+    b"not a pickle",
+    pickle.dumps(Unloadable()),
+    pickle.dumps(["not", "a", "dict"]),
+    pickle.dumps({"format": 1}),
+])
+def test_broken_binary_is_recompiled(csv, tmp_path, payload):
+    root = str(tmp_path / "compiled")
+    compiled_symbol_index(csv, root)
+    with open(compiled_path(csv, root), "wb") as f:
+        f.write(payload)
+
+    assert read_compiled_index(csv, root) is None
+    index = compiled_symbol_index(csv, root)
+    assert len(index) == 2
+    assert read_compiled_index(csv, root).symbols == ["AAA", "BBB"]